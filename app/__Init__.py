@@ -3,27 +3,43 @@ from .config import Config
 from .models import db
 from flask_login import LoginManager
 from .models import User
+from . import autograder, cache, database, dates, extraction, idempotency, migrations, ratelimit, replica, loading, profiler, metrics, similarity, versioning
 import os
 
 login_manager = LoginManager()
 
-def create_app():
+def create_app(config_class=Config):
     template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'templates'))
     app = Flask(__name__, template_folder=template_dir, instance_relative_config=False)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
 
     # Init extensions
+    database.configure(app)
     db.init_app(app)
+    replica.init_app(app)
+    database.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"  # Redirect to login if not authenticated
+    cache.init_app(app)
+    ratelimit.init_app(app)
 
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
 
-    # Create database tables
+    # Create database tables and bring older databases up to the current schema
     with app.app_context():
         db.create_all()
+        migrations.upgrade()
+    dates.init_app(app)
+    versioning.init_app(app)
+    idempotency.init_app(app)
+    autograder.init_app(app)
+    similarity.init_app(app)
+    extraction.init_app(app)
+    loading.init_app(app)
+    profiler.init_app(app)
+    metrics.init_app(app)
 
     # Blueprints
     from .auth.routes import bp as auth_bp
@@ -0,0 +1,87 @@
+"""
+Upcoming-deadlines agenda for the home page.
+
+Instead of every assignment a user's courses ever had, the agenda holds the
+next AGENDA_SIZE deadlines and, for students, up to AGENDA_SIZE recently
+overdue assignments they have not submitted. Both lists are LIMIT queries over
+the (course_id, due_date) index. For students an anti-join (NOT EXISTS) against
+Submission drops work they have already handed in. The result is cached per
+user under the user's and courses' version scopes. Creating an assignment or
+submitting work invalidates it, and the entry expires when the next deadline
+passes and the lists would change.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+
+from .cache import course_scope, get_cache, user_scope, versioned_key
+from .models import db, Assignment, Course, Submission
+
+
+def _items(query):
+    return [
+        {
+            "id": assignment_id,
+            "title": title,
+            "description": description,
+            "due_date": due_date.isoformat(),
+            "course_id": course_id,
+            "course_title": course_title,
+        }
+        for assignment_id, title, description, due_date, course_id, course_title in query
+    ]
+
+
+def build(user, course_ids, now=None):
+    """{"upcoming": [...], "overdue": [...]} straight from the database"""
+    now = now or datetime.now(timezone.utc)
+    size = current_app.config.get("AGENDA_SIZE", 5)
+    agenda = {"upcoming": [], "overdue": []}
+    if not course_ids:
+        return agenda
+
+    query = (db.session.query(Assignment.id, Assignment.title, Assignment.description, Assignment.due_date,
+                              Course.id, Course.title)
+             .join(Course, Course.id == Assignment.course_id)
+             .filter(Assignment.course_id.in_(course_ids)))
+    if user.role == "student":
+        submitted = (db.session.query(Submission.id)
+                     .filter(Submission.student_id == user.id, Submission.assignment_id == Assignment.id))
+        query = query.filter(~submitted.exists())
+
+    agenda["upcoming"] = _items(query.filter(Assignment.due_date >= now)
+                                .order_by(Assignment.due_date.asc()).limit(size))
+    if user.role == "student":
+        since = now - timedelta(days=current_app.config.get("AGENDA_OVERDUE_DAYS", 14))
+        agenda["overdue"] = _items(query.filter(Assignment.due_date < now, Assignment.due_date >= since)
+                                   .order_by(Assignment.due_date.desc()).limit(size))
+    return agenda
+
+
+def _expires_in(agenda, now):
+    """Seconds until the lists change on their own: a deadline passes or leaves the overdue window"""
+    timeout = current_app.config.get("CACHE_DEFAULT_TIMEOUT", 300)
+    changes = [datetime.fromisoformat(item["due_date"]) for item in agenda["upcoming"][:1]]
+    window = timedelta(days=current_app.config.get("AGENDA_OVERDUE_DAYS", 14))
+    changes += [datetime.fromisoformat(item["due_date"]) + window for item in agenda["overdue"][-1:]]
+    for moment in changes:
+        timeout = min(timeout, (moment - now).total_seconds())
+    return max(1, int(timeout))
+
+
+def for_user(user, course_ids):
+    """The user's agenda, from the cache when nothing it depends on has changed"""
+    cache = get_cache()
+    key = versioned_key(f"agenda:{user.id}", [user_scope(user.id)] + [course_scope(cid) for cid in course_ids])
+    cached = cache.get(key)
+    if cached is not None:
+        agenda = json.loads(cached)
+    else:
+        now = datetime.now(timezone.utc)
+        agenda = build(user, course_ids, now)
+        cache.set(key, json.dumps(agenda), _expires_in(agenda, now))
+    for items in agenda.values():
+        for item in items:
+            item["due_date"] = datetime.fromisoformat(item["due_date"])
+    return agenda
@@ -0,0 +1,276 @@
+"""
+Autograding: run an instructor's test harness against submissions in a process pool.
+
+An instructor attaches a harness, a Python script, to an assignment. Each run
+gets a fresh temporary directory containing:
+- the submitted file, under its original name and also as submission.<ext>;
+- the submission notes, as notes.txt;
+- the harness, as harness.py.
+
+The harness is executed with the current Python interpreter. It can compile and
+run the submission itself (javac, gcc, python ...). It reports the result by
+printing a line "SCORE: <0-100>". Its output becomes the submission feedback.
+
+Jobs are rows in autograde_job. Submitting to an autograded assignment queues
+one job, and "regrade all" queues one per submission with a single INSERT ...
+SELECT. `flask autograde` claims queued jobs with one conditional UPDATE, so
+several workers can share the queue. It runs them in a ProcessPoolExecutor
+sized to the CPU count, and writes the results back in one transaction. The
+pool workers never touch the database: everything a run needs is in a
+picklable spec. A job left "running" by a worker that was killed, or whose
+pool broke, is claimed again once it has been running longer than any batch
+could take (stale_after()).
+
+Each harness process gets rlimits set before exec: CPU seconds, address space,
+file size and process count. There is also a wall-clock timeout, a scrubbed
+environment and its own session, so a runaway harness can be killed together
+with everything it started. rlimits need a POSIX system; elsewhere only the
+wall-clock timeout applies. This is resource containment, not a security
+boundary: run workers as an unprivileged user (or in a container) when
+harnesses or submissions are untrusted.
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import func
+
+from .cache import bump_version, grades_scope, user_scope
+from .models import db, Assignment, AutogradeJob, Submission, SubmissionVersion
+
+try:
+    import resource
+except ImportError:  # Windows: wall-clock timeout only
+    resource = None
+
+SCORE_LINE = re.compile(r"^SCORE:\s*(-?\d+(?:\.\d+)?)\s*$", re.MULTILINE)
+BATCH_PER_WORKER = 4  # jobs claimed per pool process at a time
+STALE_MARGIN_SECONDS = 60
+
+
+def limits(config):
+    """Resource limits for one run, from the AUTOGRADER_* settings"""
+    return {
+        "cpu_seconds": config.get("AUTOGRADER_CPU_SECONDS", 10),
+        "memory_mb": config.get("AUTOGRADER_MEMORY_MB", 512),
+        "wall_seconds": config.get("AUTOGRADER_WALL_SECONDS", 30),
+        "max_processes": config.get("AUTOGRADER_MAX_PROCESSES", 64),
+        "file_size_mb": config.get("AUTOGRADER_FILE_SIZE_MB", 16),
+        "output_bytes": config.get("AUTOGRADER_OUTPUT_BYTES", 10000),
+    }
+
+
+def _apply_rlimits(limit):
+    def preexec():
+        cpu = limit["cpu_seconds"]
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+        memory = limit["memory_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        size = limit["file_size_mb"] * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_FSIZE, (size, size))
+        if hasattr(resource, "RLIMIT_NPROC"):
+            resource.setrlimit(resource.RLIMIT_NPROC, (limit["max_processes"],) * 2)
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    return preexec
+
+
+def run_one(spec):
+    """Run one harness in an isolated temp dir; returns {"job_id", "status", "score", "output", "seconds"}.
+
+    Executed in a pool worker: spec holds everything needed and no database access happens here.
+    """
+    limit = spec["limits"]
+    started = time.perf_counter()
+    workdir = tempfile.mkdtemp(prefix="autograde-")
+    try:
+        if spec["file_path"] and os.path.exists(spec["file_path"]):
+            name = os.path.basename(spec["file_name"] or spec["file_path"])
+            shutil.copyfile(spec["file_path"], os.path.join(workdir, name))
+            extension = os.path.splitext(name)[1]
+            if name != f"submission{extension}":
+                shutil.copyfile(spec["file_path"], os.path.join(workdir, f"submission{extension}"))
+        with open(os.path.join(workdir, "notes.txt"), "w", encoding="utf-8") as notes:
+            notes.write(spec["content"] or "")
+        with open(os.path.join(workdir, "harness.py"), "w", encoding="utf-8") as harness:
+            harness.write(spec["harness"])
+
+        env = {"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": workdir, "TMPDIR": workdir,
+               "LANG": "C.UTF-8", "PYTHONDONTWRITEBYTECODE": "1"}
+        process = subprocess.Popen(
+            [sys.executable, "-I", "harness.py"], cwd=workdir, env=env,
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            preexec_fn=_apply_rlimits(limit) if resource is not None else None,
+            start_new_session=os.name == "posix",
+        )
+        try:
+            raw, _ = process.communicate(timeout=limit["wall_seconds"])
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            _kill(process)
+            raw, _ = process.communicate()
+            timed_out = True
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = raw[-limit["output_bytes"]:].decode("utf-8", "replace")
+    result = {"job_id": spec["job_id"], "score": None, "output": output,
+              "seconds": round(time.perf_counter() - started, 3)}
+    match = SCORE_LINE.findall(output)
+    if timed_out:
+        result["status"] = "error"
+        result["output"] = f"Timed out after {limit['wall_seconds']} s\n{output}"
+    elif process.returncode < 0:
+        result["status"] = "error"  # killed by a signal, e.g. SIGXCPU or SIGKILL at the CPU limit
+        result["output"] = f"Killed by signal {-process.returncode}\n{output}"
+    elif not match:
+        result["status"] = "error"
+        result["output"] = f"Harness exited with {process.returncode} without a SCORE line\n{output}"
+    else:
+        result["status"] = "done"
+        result["score"] = min(max(float(match[-1]), 0.0), 100.0)
+    return result
+
+
+def _kill(process):
+    if os.name == "posix":
+        try:
+            os.killpg(process.pid, 9)  # the harness and anything it started
+            return
+        except ProcessLookupError:
+            return
+    process.kill()
+
+
+def enqueue(assignment_id, submission_ids=None):
+    """Queue a job per submission of the assignment (or only submission_ids); one INSERT ... SELECT.
+
+    Submissions that already have a queued job are skipped. Flushed, not committed; returns the count.
+    """
+    waiting = db.select(AutogradeJob.id).where(AutogradeJob.submission_id == Submission.id,
+                                               AutogradeJob.status == "queued")
+    select = (db.select(Submission.id, db.literal("queued"), db.literal(datetime.utcnow()))
+              .where(Submission.assignment_id == assignment_id, ~waiting.exists()))
+    if submission_ids is not None:
+        select = select.where(Submission.id.in_(submission_ids))
+    result = db.session.execute(
+        db.insert(AutogradeJob).from_select(["submission_id", "status", "created_at"], select))
+    return result.rowcount
+
+
+def stale_after(config):
+    """Seconds after which a running job is taken as abandoned: a whole batch run one after another, plus a margin"""
+    return BATCH_PER_WORKER * config.get("AUTOGRADER_WALL_SECONDS", 30) + STALE_MARGIN_SECONDS
+
+
+def claim(limit, now=None):
+    """Mark up to limit queued (or abandoned running) jobs as running and return their ids (one conditional UPDATE)"""
+    now = now or datetime.utcnow()
+    abandoned = now - timedelta(seconds=stale_after(current_app.config))
+    claimable = db.or_(AutogradeJob.status == "queued",
+                       db.and_(AutogradeJob.status == "running", AutogradeJob.started_at < abandoned))
+    batch = (db.select(AutogradeJob.id).where(claimable)
+             .order_by(AutogradeJob.id).limit(limit).scalar_subquery())
+    rows = db.session.execute(
+        db.update(AutogradeJob)
+        .where(AutogradeJob.id.in_(batch), claimable)
+        .values(status="running", started_at=now)
+        .returning(AutogradeJob.id)
+        .execution_options(synchronize_session=False))
+    return [job_id for (job_id,) in rows]
+
+
+def _specs(job_ids):
+    """Picklable run descriptions for the pool: file paths, notes, harness and limits"""
+    config = current_app.config
+    limit = limits(config)
+    rows = db.session.execute(
+        db.select(AutogradeJob.id, Submission.file_path, SubmissionVersion.file_name, Submission.content,
+                  Assignment.autograde_harness)
+        .join(Submission, Submission.id == AutogradeJob.submission_id)
+        .join(Assignment, Assignment.id == Submission.assignment_id)
+        .outerjoin(SubmissionVersion, SubmissionVersion.id == Submission.latest_version_id)
+        .where(AutogradeJob.id.in_(job_ids))
+        .order_by(AutogradeJob.id))
+    return [{
+        "job_id": job_id,
+        "file_path": os.path.join(config["UPLOAD_FOLDER"], file_path) if file_path else None,
+        "file_name": file_name,
+        "content": content,
+        "harness": harness or "",
+        "limits": limit,
+    } for job_id, file_path, file_name, content, harness in rows]
+
+
+def _save(results):
+    """Write job results, and grade/feedback of successful runs, in one transaction"""
+    now = datetime.utcnow()
+    by_job = {result["job_id"]: result for result in results}
+    for job in AutogradeJob.query.filter(AutogradeJob.id.in_(list(by_job))):
+        result = by_job[job.id]
+        job.status, job.score, job.output, job.finished_at = result["status"], result["score"], result["output"], now
+        if result["status"] == "done":
+            db.session.execute(db.update(Submission).where(Submission.id == job.submission_id).values(
+                grade=result["score"], feedback=f"Autograder: {result['score']:g}/100\n{result['output']}"))
+    db.session.commit()
+
+
+def run_pending(workers=None, batch_size=None):
+    """Run queued jobs until none are left; returns the number of jobs finished.
+
+    Jobs are claimed batch_size at a time (default: BATCH_PER_WORKER per worker) and run in one
+    pool of `workers` processes (default AUTOGRADER_WORKERS, else the CPU count).
+    """
+    config = current_app.config
+    workers = workers or config.get("AUTOGRADER_WORKERS") or os.cpu_count() or 1
+    batch_size = batch_size or workers * BATCH_PER_WORKER
+    finished = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            job_ids = claim(batch_size)
+            db.session.commit()
+            if not job_ids:
+                return finished
+            results = list(pool.map(run_one, _specs(job_ids)))
+            _save(results)
+            finished += len(results)
+            scopes = set()
+            for student_id, course_id in db.session.execute(
+                    db.select(Submission.student_id, Assignment.course_id)
+                    .join(AutogradeJob, AutogradeJob.submission_id == Submission.id)
+                    .join(Assignment, Assignment.id == Submission.assignment_id)
+                    .where(AutogradeJob.id.in_(job_ids))):
+                scopes.update((user_scope(student_id), grades_scope(course_id)))
+            bump_version(*scopes)
+
+
+def status_counts(assignment_id):
+    """{status: count} of the assignment's autograde jobs in one GROUP BY query"""
+    return dict(db.session.execute(
+        db.select(AutogradeJob.status, func.count(AutogradeJob.id))
+        .join(Submission, Submission.id == AutogradeJob.submission_id)
+        .where(Submission.assignment_id == assignment_id)
+        .group_by(AutogradeJob.status)).all())
+
+
+def init_app(app):
+    @app.cli.command("autograde")
+    @click.option("--workers", type=int, help="pool size (default: AUTOGRADER_WORKERS or the CPU count)")
+    @click.option("--watch", is_flag=True, help="keep polling for new jobs")
+    @click.option("--interval", type=float, default=5.0, help="seconds between polls with --watch")
+    def autograde_command(workers, watch, interval):
+        """Run queued autograde jobs in a process pool"""
+        while True:
+            finished = run_pending(workers)
+            if finished:
+                click.echo(f"Finished {finished} autograde jobs")
+            if not watch:
+                return
+            time.sleep(interval)
@@ -0,0 +1,242 @@
+"""
+Rendered-page cache for read-only views.
+
+Pages are stored under a key built from (endpoint, user id, role, data version).
+The data version is made of small counters ("user:3", "course:7") that write
+routes bump through bump_version(), so a cached page goes stale as soon as the
+data behind it changes instead of waiting for the TTL to run out.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+
+
+class NullCache:
+    """Backend used when caching is disabled - never stores anything"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def clear(self):
+        pass
+
+    def get_versions(self, names):
+        return [0 for _ in names]
+
+    def bump_versions(self, names):
+        pass
+
+
+class LRUCache:
+    """In-memory LRU cache with per-entry TTL (one copy per process)"""
+
+    def __init__(self, max_entries=1024, default_timeout=300):
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._versions = {}  # kept apart from the entries so eviction never resets a counter
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_versions(self, names):
+        with self._lock:
+            return [self._versions.get(name, 0) for name in names]
+
+    def bump_versions(self, names):
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+
+class SQLiteCache:
+    """File-backed cache shared by every process pointing at the same file"""
+
+    def __init__(self, path, max_entries=1024, default_timeout=300):
+        self.path = path
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entry ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entry_expires ON cache_entry (expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_version ("
+                "name TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM cache_entry WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entry (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + timeout),
+            )
+            # Keep the file bounded: drop expired rows, then the soonest-to-expire overflow
+            conn.execute("DELETE FROM cache_entry WHERE expires_at < ?", (now,))
+            conn.execute(
+                "DELETE FROM cache_entry WHERE key IN ("
+                "SELECT key FROM cache_entry ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM cache_entry")
+
+    def get_versions(self, names):
+        if not names:
+            return []
+        placeholders = ",".join("?" for _ in names)
+        with self._connect() as conn:
+            rows = dict(conn.execute(
+                f"SELECT name, version FROM cache_version WHERE name IN ({placeholders})", list(names)
+            ).fetchall())
+        return [rows.get(name, 0) for name in names]
+
+    def bump_versions(self, names):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO cache_version (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                [(name,) for name in names],
+            )
+
+
+def init_app(app):
+    """Create the cache backend selected by CACHE_TYPE and attach it to the app"""
+    cache_type = app.config.get("CACHE_TYPE", "memory")
+    timeout = app.config.get("CACHE_DEFAULT_TIMEOUT", 300)
+    max_entries = app.config.get("CACHE_MAX_ENTRIES", 1024)
+
+    if cache_type == "memory":
+        backend = LRUCache(max_entries=max_entries, default_timeout=timeout)
+    elif cache_type == "sqlite":
+        path = app.config.get("CACHE_SQLITE_PATH") or os.path.join(app.instance_path, "page_cache.db")
+        backend = SQLiteCache(path, max_entries=max_entries, default_timeout=timeout)
+    elif cache_type == "null":
+        backend = NullCache()
+    else:
+        raise ValueError(f"Unknown CACHE_TYPE: {cache_type!r}")
+
+    app.extensions["page_cache"] = backend
+    return backend
+
+
+def get_cache():
+    return current_app.extensions.get("page_cache") or NullCache()
+
+
+def user_scope(user_id):
+    return f"user:{user_id}"
+
+
+def course_scope(course_id):
+    return f"course:{course_id}"
+
+
+def grades_scope(course_id):
+    """Bumped by every write of a grade (or grade weight) in the course"""
+    return f"grades:{course_id}"
+
+
+def bump_version(*scopes):
+    """Invalidate every cached page that depends on one of the given scopes"""
+    if scopes:
+        get_cache().bump_versions(list(scopes))
+
+
+def versioned_key(prefix, scopes):
+    """Cache key for data that depends on the given version scopes"""
+    names = sorted(set(scopes))
+    versions = get_cache().get_versions(names)
+    raw_key = ",".join(f"{name}={version}" for name, version in zip(names, versions))
+    return f"{prefix}:" + hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+
+def cached_page(scopes, timeout=None):
+    """Cache the rendered HTML of a GET view.
+
+    scopes is a callable receiving the view's keyword arguments and returning the
+    version scopes the page depends on. Must be applied below @login_required.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Pending flash messages are rendered into the page, so never serve or store it
+            if request.method != "GET" or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            cache = get_cache()
+            names = sorted(set(scopes(**kwargs)))
+            versions = cache.get_versions(names)
+
+            def make_key():
+                raw_key = "|".join([
+                    request.endpoint,
+                    str(current_user.get_id()),
+                    str(getattr(current_user, "role", None)),
+                    request.query_string.decode("utf-8", "replace"),
+                    str(session.get("csrf_token", "")),  # forms embed a per-session CSRF token
+                    ",".join(f"{name}={version}" for name, version in zip(names, versions)),
+                ])
+                return "page:" + hashlib.sha1(raw_key.encode("utf-8")).hexdigest()
+
+            cached = cache.get(make_key())
+            if cached is not None:
+                return cached
+
+            rv = view(*args, **kwargs)
+            # Redirects and error responses are not cached, nor pages that queued a flash.
+            # The key is rebuilt because rendering a form may have just created the CSRF token.
+            if isinstance(rv, str) and not session.get("_flashes"):
+                cache.set(make_key(), rv, timeout)
+            return rv
+        return wrapper
+    return decorator
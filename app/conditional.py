@@ -0,0 +1,109 @@
+"""
+HTTP conditional GET (ETag / Last-Modified) for read-only views.
+
+Each decorated view supplies a cheap fingerprint function - typically a few
+COUNT()/MAX(updated_at) aggregates over the tables the page reads. When the
+browser's If-None-Match matches, a 304 is returned before the view's own
+queries and template rendering run. Last-Modified is the newest timestamp in
+the fingerprint; it misses deletes and second-level races, so If-Modified-Since
+is only honoured from clients that send no If-None-Match.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import func
+
+from .models import db
+
+
+def table_stamp(model, *criteria, newest=None):
+    """(row count, newest change) for the rows of model matching criteria.
+
+    Uses MAX(updated_at) when the model tracks it, otherwise MAX(id), which still
+    catches inserts; the count catches deletes. newest names another column for
+    tables that have neither (e.g. ExtractedText.extracted_at).
+    """
+    if newest is None:
+        newest = model.updated_at if hasattr(model, "updated_at") else model.id
+    count, latest = db.session.query(func.count(), func.max(newest)).select_from(model).filter(*criteria).one()
+    return count, latest
+
+
+def newest_change(values):
+    """Latest datetime anywhere in the fingerprint, looking inside table_stamp tuples and lists"""
+    stamps = []
+    for value in values:
+        if isinstance(value, datetime):
+            stamps.append(value)
+        elif isinstance(value, (list, tuple)):
+            newest = newest_change(value)
+            if newest is not None:
+                stamps.append(newest)
+    return max(stamps) if stamps else None
+
+
+def _not_modified_since(last_modified):
+    """If-Modified-Since check, used only when the client sent no If-None-Match (RFC 9110 13.2.2)"""
+    since = request.if_modified_since
+    if since is None or last_modified is None or request.if_none_match:
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def compute_etag(parts):
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def conditional_view(fingerprint, csrf=False):
+    """Answer GET requests with 304 Not Modified when the fingerprint is unchanged.
+
+    fingerprint receives the view's keyword arguments and returns a list of
+    values describing the data the page reads. Pages that embed a CSRF token
+    pass csrf=True so the validator also rotates before the token expires.
+    Must be applied below @login_required.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Flash messages are rendered into the page, so a stored copy would drop them
+            if request.method != "GET" or session.get("_flashes"):
+                return view(*args, **kwargs)
+
+            values = list(fingerprint(**kwargs))
+            parts = [
+                current_app.config.get("ETAG_SALT", ""),
+                request.endpoint,
+                current_user.get_id(),
+                getattr(current_user, "role", None),
+                request.query_string,
+                values,
+            ]
+            if csrf:
+                time_limit = current_app.config.get("WTF_CSRF_TIME_LIMIT") or 3600
+                parts += [session.get("csrf_token"), int(time.time() // (time_limit / 2))]
+            etag = compute_etag(parts)
+            last_modified = newest_change(values)
+
+            if request.if_none_match.contains_weak(etag) or _not_modified_since(last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if session.get("_flashes"):  # the view queued a message for the next page
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Always revalidate, and never let a shared cache keep a per-user page
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        return wrapper
+    return decorator
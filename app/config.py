@@ -4,9 +4,116 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "dev-secret-change-me")
     SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "sqlite:///app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool for file/server databases (see app/database.py)
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "-1"))  # seconds; -1 never recycles
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "0") == "1"  # worth it for server databases
+
+    # Read/write routing (see app/replica.py): GET requests read from DB_READ_URL, or from a
+    # read-only pool on the primary SQLite file when DB_READ_ONLY_POOL is set
+    DB_READ_URL = os.environ.get("DATABASE_READ_URL")
+    DB_READ_ONLY_POOL = os.environ.get("DB_READ_ONLY_POOL", "0") == "1"
+    DB_READ_STICKY_SECONDS = 5  # after a write, keep that user on the primary this long
+
+    # Pragmas run on every new SQLite connection; None leaves SQLite's default
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE = -64000  # negative means KiB: 64 MB of page cache per connection
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+    # Due dates are stored in UTC; form input without a timezone and displayed times use this zone
+    TIMEZONE = os.environ.get("TIMEZONE", "UTC")
+
+    # Home page agenda (see app/agenda.py): at most this many items per list, and how
+    # long an unsubmitted assignment stays listed as overdue
+    AGENDA_SIZE = 5
+    AGENDA_OVERDUE_DAYS = 14
+
+    # Submission history (see app/versioning.py): versions kept per submission, an optional
+    # age limit for older versions (the latest is always kept), and history page size
+    SUBMISSION_VERSIONS_KEEP = 10
+    SUBMISSION_VERSIONS_MAX_AGE_DAYS = None
+    SUBMISSION_HISTORY_PER_PAGE = 10
+
+    # Idempotency keys of processed form posts are kept this long (see app/idempotency.py)
+    IDEMPOTENCY_KEY_MAX_AGE_HOURS = 24
+
+    # Grading queue (see app/grading.py): how long a grader holds a claimed submission
+    GRADING_LEASE_MINUTES = 15
+
+    # Autograder (see app/autograder.py): pool size (None = CPU count) and per-run limits
+    AUTOGRADER_WORKERS = int(os.environ["AUTOGRADER_WORKERS"]) if os.environ.get("AUTOGRADER_WORKERS") else None
+    AUTOGRADER_CPU_SECONDS = 10
+    AUTOGRADER_MEMORY_MB = 512
+    AUTOGRADER_WALL_SECONDS = 30
+    AUTOGRADER_MAX_PROCESSES = 64
+    AUTOGRADER_FILE_SIZE_MB = 16
+    AUTOGRADER_OUTPUT_BYTES = 10000
+
+    # Similarity report (see app/similarity.py): shingle length in tokens, MinHash size and LSH
+    # bands (changing either needs `flask index-similarity --all`), and the reported threshold
+    SIMILARITY_SHINGLE_SIZE = 5
+    SIMILARITY_PERMUTATIONS = 128
+    SIMILARITY_BANDS = 32
+    SIMILARITY_THRESHOLD = 0.5
+
+    # Text extraction of uploads (see app/extraction.py): pool size (None = CPU count) and text kept per file
+    EXTRACT_WORKERS = int(os.environ["EXTRACT_WORKERS"]) if os.environ.get("EXTRACT_WORKERS") else None
+    EXTRACT_MAX_CHARS = 200000
+    EXTRACT_MAX_PDF_MB = 16  # larger PDFs are not read into memory and get an error status
+    EXTRACT_STALE_MINUTES = 15  # a file running this long was abandoned by a dead worker and is claimed again
+
+    # Timed quizzes (see app/quizzes.py): answers posted this long after the time limit still count
+    QUIZ_GRACE_SECONDS = 30
+
+    # Final letter grades (see app/gradebook.py): (lowest percentage, letter), highest first
+    GRADE_SCALE = [(93, 'A'), (90, 'A-'), (87, 'B+'), (83, 'B'), (80, 'B-'), (77, 'C+'), (73, 'C'),
+                   (70, 'C-'), (67, 'D+'), (63, 'D'), (60, 'D-'), (0, 'F')]
+
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max file size
     SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = "Lax"
     PERMANENT_SESSION_LIFETIME = 1800  # 30 minutes
+
+    # Rendered-page cache for read-only views ("memory", "sqlite" or "null" to disable)
+    CACHE_TYPE = os.environ.get("CACHE_TYPE", "memory")
+    CACHE_DEFAULT_TIMEOUT = 300  # seconds; write routes invalidate entries long before this
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_SQLITE_PATH = os.environ.get("CACHE_SQLITE_PATH")  # defaults to instance/page_cache.db
+
+    # Token-bucket rate limits (see app/ratelimit.py). Only POSTs to these endpoints take a token.
+    # A bucket per "ip", logged-in "user" or "form:<field>" holds `burst` tokens and refills at `per_minute`.
+    RATELIMIT_ENABLED = os.environ.get("RATELIMIT_ENABLED", "1") == "1"
+    RATELIMIT_STORAGE = os.environ.get("RATELIMIT_STORAGE", "memory")  # "sqlite" to share limits across processes
+    RATELIMIT_SQLITE_PATH = os.environ.get("RATELIMIT_SQLITE_PATH")  # defaults to instance/rate_limits.db
+    RATELIMIT_MAX_BUCKETS = 100000  # memory storage only; least recently used buckets are dropped beyond this
+    RATELIMITS = {
+        "auth.login": [{"by": "ip", "burst": 20, "per_minute": 10},
+                       {"by": "form:username", "burst": 10, "per_minute": 2}],
+        "auth.register": [{"by": "ip", "burst": 5, "per_minute": 0.5}],
+        "auth.forgot_password": [{"by": "ip", "burst": 5, "per_minute": 1},
+                                 {"by": "form:email", "burst": 3, "per_minute": 0.2}],
+        "auth.reset_password": [{"by": "ip", "burst": 10, "per_minute": 2}],
+        "main.compose_message": [{"by": "user", "burst": 10, "per_minute": 5}],
+        "main.broadcast_message": [{"by": "user", "burst": 3, "per_minute": 1}],
+    }
+
+    # Mixed into every ETag so a deploy with changed templates invalidates browser copies
+    ETAG_SALT = os.environ.get("ETAG_SALT", "")
+
+    # Raise when a template triggers a lazy relationship load (tests turn this on; see app/loading.py)
+    RAISE_ON_TEMPLATE_LAZYLOAD = os.environ.get("RAISE_ON_TEMPLATE_LAZYLOAD", "0") == "1"
+
+    # Per-request SQL profiler (X-SQL-* headers, JSON log line, panel in base.html)
+    SQL_PROFILER_ENABLED = os.environ.get("SQL_PROFILER", "0") == "1"
+    SQL_PROFILER_N_PLUS_ONE = 5  # flag a statement shape run more than this many times
+
+    # Per-endpoint latency/DB/template/size histograms served at /metrics (Prometheus format).
+    # Off by default: the endpoint is unauthenticated, so only enable it behind a private scrape network.
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "0") == "1"
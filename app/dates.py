@@ -0,0 +1,63 @@
+"""
+Timezone-aware due dates.
+
+Due dates are stored as UTC in a DateTime column (naive, since SQLite has no
+timezone type) and come back as aware UTC datetimes, so SQL can compare and
+range-scan them against other UTC columns such as Submission.submitted_at.
+Input without a timezone (form fields, ISO strings, plain dates) is read in the
+app's TIMEZONE, and a plain date means the end of that day.
+"""
+from datetime import date, datetime, time, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app, has_app_context
+from sqlalchemy.types import DateTime, TypeDecorator
+
+END_OF_DAY = time(23, 59, 59)
+
+
+def app_timezone():
+    """The configured display/input timezone (UTC outside an app context)"""
+    name = current_app.config.get("TIMEZONE", "UTC") if has_app_context() else "UTC"
+    return ZoneInfo(name)
+
+
+def to_utc(value, tz=None):
+    """Aware UTC datetime for a datetime, date or ISO string; None stays None"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        value = date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, END_OF_DAY)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz or app_timezone())
+    return value.astimezone(timezone.utc)
+
+
+def localtime(value, fmt="%Y-%m-%d %H:%M %Z"):
+    """Jinja filter: format a UTC datetime in the app's timezone"""
+    if value is None:
+        return ""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(app_timezone()).strftime(fmt)
+
+
+class UTCDateTime(TypeDecorator):
+    """DateTime stored as naive UTC and loaded as aware UTC"""
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        value = to_utc(value)
+        return value.replace(tzinfo=None) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return value.replace(tzinfo=timezone.utc) if value is not None else None
+
+
+def init_app(app):
+    app.add_template_filter(localtime, "localtime")
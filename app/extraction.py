@@ -0,0 +1,198 @@
+"""
+Background text extraction of uploaded files.
+
+Uploads are content-addressed blobs (app/versioning.py), so text is extracted
+once per blob, not once per hand-in. A submit only queues a pending
+ExtractedText row with INSERT ... ON CONFLICT DO NOTHING, and no file is read
+during the request.
+
+`flask extract-text` claims pending rows with one conditional UPDATE and
+extracts them in a ProcessPoolExecutor sized to the CPU count. Source files are
+decoded incrementally in CHUNK-sized reads, and reading stops once
+EXTRACT_MAX_CHARS characters are in hand. PDFs up to EXTRACT_MAX_PDF_MB go
+through the stdlib-only extractor in app/pdftext.py. Any exception while
+extracting one file marks that file "error", so the rest of its batch is still
+saved. A row still running EXTRACT_STALE_MINUTES after it was claimed belongs
+to a worker that was killed, and is claimed again. Results are saved in one
+transaction. The similarity index (app/similarity.py) is then refreshed for the
+submissions whose latest version is one of those files.
+
+The stored text backs the file preview on the submissions page and the
+full-text view of a version.
+"""
+import codecs
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import func, or_
+
+from . import pdftext, similarity
+from .database import insert
+from .models import db, ExtractedText, Submission, SubmissionVersion
+
+TEXT_EXTENSIONS = (".txt", ".py", ".c", ".cpp", ".h", ".java")
+CHUNK = 64 * 1024
+
+
+def file_kind(file_name):
+    """"text", "pdf", or None for formats that are not extracted"""
+    name = (file_name or "").lower()
+    if name.endswith(TEXT_EXTENSIONS):
+        return "text"
+    if name.endswith(".pdf"):
+        return "pdf"
+    return None
+
+
+def enqueue(version):
+    """Queue the version's file for extraction unless its blob is already known (flushed, not committed)"""
+    if not version.file_sha256 or file_kind(version.file_name) is None:
+        return False
+    stmt = insert(ExtractedText).values(file_sha256=version.file_sha256, file_path=version.file_path,
+                                        file_name=version.file_name, status="pending",
+                                        created_at=datetime.utcnow())
+    return db.session.execute(stmt.on_conflict_do_nothing(index_elements=["file_sha256"])).rowcount == 1
+
+
+def backfill():
+    """Queue every stored blob of a supported format that has no ExtractedText row; returns the count"""
+    supported = or_(*(func.lower(SubmissionVersion.file_name).like(f"%{extension}")
+                      for extension in TEXT_EXTENSIONS + (".pdf",)))
+    select = (db.select(SubmissionVersion.file_sha256, func.min(SubmissionVersion.file_path),
+                        func.min(SubmissionVersion.file_name), db.literal("pending"), db.literal(datetime.utcnow()))
+              .where(SubmissionVersion.file_sha256.isnot(None), supported,
+                     ~db.select(ExtractedText.file_sha256)
+                     .where(ExtractedText.file_sha256 == SubmissionVersion.file_sha256).exists())
+              .group_by(SubmissionVersion.file_sha256))
+    result = db.session.execute(db.insert(ExtractedText).from_select(
+        ["file_sha256", "file_path", "file_name", "status", "created_at"], select))
+    db.session.commit()
+    return result.rowcount
+
+
+def _read_text(path, max_chars):
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    parts, chars = [], 0
+    with open(path, "rb") as upload:
+        for chunk in iter(lambda: upload.read(CHUNK), b""):
+            if not parts and b"\0" in chunk[:8192]:
+                raise ValueError("binary file")
+            parts.append(decoder.decode(chunk))
+            chars += len(parts[-1])
+            if chars > max_chars:
+                return "".join(parts)
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts)
+
+
+def extract_file(spec):
+    """Extract one blob; returns {"sha256", "status", "text", "truncated", "error"}.
+
+    Executed in a pool worker: spec holds everything needed and no database access happens here.
+    """
+    result = {"sha256": spec["sha256"], "status": "done", "text": None, "truncated": False, "error": None}
+    try:
+        if spec["kind"] == "pdf":
+            with open(spec["path"], "rb") as upload:
+                data = upload.read(spec["max_pdf_bytes"] + 1)
+            if len(data) > spec["max_pdf_bytes"]:
+                raise ValueError(f"PDF larger than {spec['max_pdf_bytes'] // (1024 * 1024)} MB")
+            text = pdftext.extract(data)
+        else:
+            text = _read_text(spec["path"], spec["max_chars"])
+    except Exception as exc:  # one malformed upload must not fail the rest of the pool batch
+        result.update(status="error", error=(str(exc) or type(exc).__name__)[:255])
+        return result
+    result["truncated"] = len(text) > spec["max_chars"]
+    result["text"] = text[:spec["max_chars"]]
+    return result
+
+
+def claim(limit, now=None):
+    """Mark up to limit pending (or abandoned running) files as running and return their hashes (one conditional UPDATE)"""
+    now = now or datetime.utcnow()
+    abandoned = now - timedelta(minutes=current_app.config.get("EXTRACT_STALE_MINUTES", 15))
+    claimable = or_(ExtractedText.status == "pending",
+                    db.and_(ExtractedText.status == "running",
+                            or_(ExtractedText.claimed_at.is_(None), ExtractedText.claimed_at < abandoned)))
+    batch = (db.select(ExtractedText.file_sha256).where(claimable)
+             .order_by(ExtractedText.created_at).limit(limit).scalar_subquery())
+    rows = db.session.execute(
+        db.update(ExtractedText)
+        .where(ExtractedText.file_sha256.in_(batch), claimable)
+        .values(status="running", claimed_at=now)
+        .returning(ExtractedText.file_sha256)
+        .execution_options(synchronize_session=False))
+    return [sha256 for (sha256,) in rows]
+
+
+def _specs(hashes):
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    max_chars = current_app.config.get("EXTRACT_MAX_CHARS", 200000)
+    max_pdf_bytes = current_app.config.get("EXTRACT_MAX_PDF_MB", 16) * 1024 * 1024
+    rows = db.session.execute(db.select(ExtractedText.file_sha256, ExtractedText.file_path, ExtractedText.file_name)
+                              .where(ExtractedText.file_sha256.in_(hashes)))
+    return [{"sha256": sha256, "path": os.path.join(upload_folder, file_path), "kind": file_kind(file_name),
+             "max_chars": max_chars, "max_pdf_bytes": max_pdf_bytes}
+            for sha256, file_path, file_name in rows]
+
+
+def _save(results):
+    """Store results in one transaction, then re-index the submissions showing those files"""
+    now = datetime.utcnow()
+    db.session.execute(db.update(ExtractedText), [
+        {"file_sha256": result["sha256"], "status": result["status"], "text": result["text"],
+         "chars": len(result["text"]) if result["text"] is not None else None,
+         "truncated": result["truncated"], "error": result["error"], "extracted_at": now}
+        for result in results])
+    done = [result["sha256"] for result in results if result["status"] == "done"]
+    if done:
+        submission_ids = db.session.execute(
+            db.select(Submission.id)
+            .join(SubmissionVersion, SubmissionVersion.id == Submission.latest_version_id)
+            .where(SubmissionVersion.file_sha256.in_(done))).scalars().all()
+        similarity.index_submissions(submission_ids)
+    db.session.commit()
+
+
+def run_pending(workers=None, batch_size=None):
+    """Extract pending files until none are left; returns the number processed.
+
+    Files are claimed batch_size at a time (default: 4 per worker) and extracted in one
+    pool of `workers` processes (default EXTRACT_WORKERS, else the CPU count).
+    """
+    workers = workers or current_app.config.get("EXTRACT_WORKERS") or os.cpu_count() or 1
+    batch_size = batch_size or workers * 4
+    processed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            hashes = claim(batch_size)
+            db.session.commit()
+            if not hashes:
+                return processed
+            results = list(pool.map(extract_file, _specs(hashes)))
+            _save(results)
+            processed += len(results)
+
+
+def init_app(app):
+    @app.cli.command("extract-text")
+    @click.option("--workers", type=int, help="pool size (default: EXTRACT_WORKERS or the CPU count)")
+    @click.option("--backfill", "queue_existing", is_flag=True, help="first queue files uploaded before extraction")
+    @click.option("--watch", is_flag=True, help="keep polling for new files")
+    @click.option("--interval", type=float, default=5.0, help="seconds between polls with --watch")
+    def extract_command(workers, queue_existing, watch, interval):
+        """Extract the text of uploaded files in a process pool"""
+        if queue_existing:
+            click.echo(f"Queued {backfill()} files")
+        while True:
+            processed = run_pending(workers)
+            if processed:
+                click.echo(f"Extracted {processed} files")
+            if not watch:
+                return
+            time.sleep(interval)
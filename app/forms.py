@@ -1,8 +1,10 @@
+import secrets
+
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
-from wtforms import EmailField, PasswordField, SubmitField, StringField, RadioField, SelectField, TextAreaField, FloatField
-from wtforms.fields import DateField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError, NumberRange
+from wtforms import EmailField, HiddenField, IntegerField, PasswordField, SubmitField, StringField, RadioField, SelectField, TextAreaField, FloatField
+from wtforms.fields import DateTimeLocalField
+from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError, NumberRange, Optional, InputRequired
 from app.models import User
 
 class LoginForm(FlaskForm): # Login form for users
@@ -27,10 +29,21 @@ class ResetPasswordForm(FlaskForm): # Form to reset password
     password_confirm = PasswordField("Confirm Password", validators=[DataRequired(), EqualTo("password", message="Passwords must match")])
     submit = SubmitField("Reset Password")
 
+class DueDateField(DateTimeLocalField):
+    """datetime-local input in the app's TIMEZONE; a bare date means the end of that day"""
+    def process_formdata(self, valuelist):
+        if valuelist and len(valuelist[0].strip()) == 10:
+            valuelist = [valuelist[0].strip() + "T23:59:59"]
+        super().process_formdata(valuelist)
+
+class IdempotentForm(FlaskForm):
+    """Renders a fresh key per page so a repeated POST can be recognised (see app/idempotency.py)"""
+    idempotency_key = HiddenField(default=lambda: secrets.token_urlsafe(16))
+
 class CreateAssignmentForm(FlaskForm): # Form to create a new assignment
     title = StringField("Assignment Title", validators=[DataRequired(), Length(max=128)])
     description = StringField("Description", validators=[DataRequired(), Length(max=512)])
-    due_date = DateField("Due Date", format="%Y-%m-%d", validators=[DataRequired()])
+    due_date = DueDateField("Due Date", format=["%Y-%m-%dT%H:%M", "%Y-%m-%dT%H:%M:%S"], validators=[DataRequired()])
     assignment_type = SelectField("Type", choices=[('homework', 'Homework'), ('quiz', 'Quiz'), ('exam', 'Exam')], validators=[DataRequired()])
     course_id = SelectField("Course", coerce=int, validators=[DataRequired()])
     submit = SubmitField("Create Assignment")
@@ -42,11 +55,11 @@ class CreateCourseForm(FlaskForm): # Form to create a new course
     image_url = StringField("Course Image URL (optional)", validators=[Length(max=255)])
     submit = SubmitField("Create Course")
 
-class EnrollStudentForm(FlaskForm): # Form to enroll a student in a course
+class EnrollStudentForm(IdempotentForm): # Form to enroll a student in a course
     student_identifier = StringField("Student Username or Email", validators=[DataRequired(), Length(min=3, max=120)])
     submit = SubmitField("Add Student")
 
-class SubmitAssignmentForm(FlaskForm):# Form to submit an assignment
+class SubmitAssignmentForm(IdempotentForm):# Form to submit an assignment
     content = TextAreaField("Submission Notes (optional)")
     file = FileField("Upload File", validators=[FileAllowed(['pdf', 'doc', 'docx', 'txt', 'zip', 'py', 'java', 'cpp', 'c'], 'Only documents and code files allowed!')])
     submit = SubmitField("Submit Assignment")
@@ -57,13 +70,19 @@ class ComposeMessageForm(FlaskForm): # Form to compose a message
     body = TextAreaField("Message", validators=[DataRequired()])
     submit = SubmitField("Send Message")
 
+class BroadcastMessageForm(FlaskForm): # Form to message every student in a course
+    course_id = SelectField("Course", coerce=int, validators=[DataRequired()])
+    subject = StringField("Subject", validators=[DataRequired(), Length(max=128)])
+    body = TextAreaField("Message", validators=[DataRequired()])
+    submit = SubmitField("Send to All Students")
+
 class AnnouncementForm(FlaskForm): # Form to post an announcement
     course_id = SelectField("Course", coerce=int, validators=[DataRequired()])
     title = StringField("Title", validators=[DataRequired(), Length(max=128)])
     content = TextAreaField("Announcement", validators=[DataRequired()])
     submit = SubmitField("Post Announcement")
 
-class AssignTAForm(FlaskForm): # Form to assign a TA to a course
+class AssignTAForm(IdempotentForm): # Form to assign a TA to a course
     ta_id = SelectField("Teaching Assistant", coerce=int, validators=[DataRequired()])
     course_id = SelectField("Course", coerce=int, validators=[DataRequired()])
     submit = SubmitField("Assign TA")
@@ -72,3 +91,46 @@ class GradeSubmissionForm(FlaskForm): # Form to grade a submission
     grade = FloatField("Grade", validators=[DataRequired(), NumberRange(min=0, max=100, message="Grade must be between 0 and 100")])
     feedback = TextAreaField("Feedback (optional)")
     submit = SubmitField("Save Grade")
+
+class AutograderForm(FlaskForm): # Form to attach a test harness to an assignment
+    harness = TextAreaField("Test Harness (Python; prints \"SCORE: <0-100>\")", validators=[Length(max=100000)])
+    submit = SubmitField("Save Harness")
+
+class QuizQuestionForm(FlaskForm): # Form to add or correct a quiz question
+    kind = SelectField("Type", choices=[('choice', 'Multiple choice'), ('numeric', 'Numeric')], validators=[DataRequired()])
+    prompt = TextAreaField("Question", validators=[DataRequired(), Length(max=2000)])
+    choices = TextAreaField("Choices (one per line, multiple choice only)", validators=[Length(max=2000)])
+    answer = FloatField("Answer (number of the correct choice, or the numeric answer)", validators=[InputRequired(message="Enter the answer as a number")])
+    tolerance = FloatField("Tolerance (numeric only)", default=0, validators=[Optional(), NumberRange(min=0)])
+    points = FloatField("Points", default=1, validators=[DataRequired(), NumberRange(min=0.01)])
+    submit = SubmitField("Save Question")
+
+    def validate_answer(self, answer):
+        if self.kind.data == 'choice':
+            count = len([line for line in (self.choices.data or "").splitlines() if line.strip()])
+            if count < 2:
+                raise ValidationError("Give at least two choices, one per line.")
+            if answer.data is None or answer.data != int(answer.data) or not 1 <= answer.data <= count:
+                raise ValidationError(f"The answer must be a choice number from 1 to {count}.")
+
+class QuizSettingsForm(FlaskForm): # Form to set a quiz's time limit
+    time_limit_minutes = IntegerField("Time limit in minutes (empty for untimed)", validators=[Optional(), NumberRange(min=1, max=1440)])
+    submit = SubmitField("Save Settings")
+
+class GradeWeightsForm(FlaskForm): # Form to set a course's category weights and drop-lowest rules
+    homework_weight = FloatField("Homework weight", validators=[InputRequired(), NumberRange(min=0, max=100)], default=0)
+    homework_drop = IntegerField("Drop lowest homework", validators=[InputRequired(), NumberRange(min=0, max=20)], default=0)
+    quiz_weight = FloatField("Quiz weight", validators=[InputRequired(), NumberRange(min=0, max=100)], default=0)
+    quiz_drop = IntegerField("Drop lowest quizzes", validators=[InputRequired(), NumberRange(min=0, max=20)], default=0)
+    exam_weight = FloatField("Exam weight", validators=[InputRequired(), NumberRange(min=0, max=100)], default=0)
+    exam_drop = IntegerField("Drop lowest exams", validators=[InputRequired(), NumberRange(min=0, max=20)], default=0)
+    submit = SubmitField("Save Weights")
+
+class GradeNextForm(FlaskForm): # CSRF-protected button that leases the next submission in the grading queue
+    submit = SubmitField("Grade Next")
+
+class RemoveQuizQuestionForm(FlaskForm): # CSRF-protected remove button on the quiz editor
+    submit = SubmitField("Remove")
+
+class QuizAttemptForm(FlaskForm): # CSRF-protected start and submit buttons; answers are read from q<position> fields
+    submit = SubmitField("Submit Quiz")
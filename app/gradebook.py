@@ -0,0 +1,256 @@
+"""
+Weighted course grades, computed for a whole class at once.
+
+A course can weight its assignment types (homework, quiz, exam) with
+GradeCategory rows, and drop each student's lowest n grades of a type. A course
+without rows uses the plain mean of each student's graded work in that course.
+
+Grades are loaded into a students x assignments array, with NaN where work is
+missing or not graded yet, using one query per table. Then each category is
+reduced for every student at once: sort each row (NaN sorts last), mask the
+lowest n graded entries and average the rest. The category averages are
+combined with the weights, renormalized over the categories the student has
+grades in. The result is a current grade that ungraded work does not pull down.
+Letters come from GRADE_SCALE with a vectorized searchsorted. Nothing is
+stored, so after a weight change the next page view uses the new weights.
+
+The instructor's distribution report (distribution()) is built from the same
+grid: percentiles and standard deviations of every assignment come from
+nan-aware reductions along the student axis, and all histograms from a
+single bincount. Standings come from searchsorted over the sorted course
+grades. The report is cached as JSON under grades_scope(course_id), which
+every write of a grade or weight in the course bumps.
+"""
+import json
+from typing import NamedTuple
+
+import numpy as np
+from flask import current_app
+
+from .cache import course_scope, get_cache, grades_scope, versioned_key
+from .models import db, Assignment, Enrollment, GradeCategory, Submission, User
+
+TYPES = ("homework", "quiz", "exam")
+UNWEIGHTED = "all work"  # the single category of a course without GradeCategory rows
+
+
+class CourseGrades(NamedTuple):
+    course_id: int
+    student_ids: list
+    assignments: list  # (id, title, assignment_type) rows in column order
+    grades: np.ndarray  # students x assignments, NaN where not graded
+    categories: list  # (assignment_type, weight, drop_lowest), or [(UNWEIGHTED, 1.0, 0)]
+    category_means: np.ndarray  # students x categories, NaN where the student has no grade in it
+    final: np.ndarray  # weighted course grade per student, NaN with no grades at all
+    letters: list  # letter per student, None with no grades at all
+
+    def index(self, student_id):
+        return self.student_ids.index(student_id)
+
+
+def policies(course_ids):
+    """{course_id: [(assignment_type, weight, drop_lowest)]} for courses with weights, in TYPES order"""
+    order = {assignment_type: n for n, assignment_type in enumerate(TYPES)}
+    result = {}
+    rows = db.session.execute(
+        db.select(GradeCategory.course_id, GradeCategory.assignment_type, GradeCategory.weight,
+                  GradeCategory.drop_lowest)
+        .where(GradeCategory.course_id.in_(course_ids), GradeCategory.weight > 0))
+    for course_id, assignment_type, weight, drop_lowest in rows:
+        result.setdefault(course_id, []).append((assignment_type, weight, drop_lowest))
+    for categories in result.values():
+        categories.sort(key=lambda category: order.get(category[0], len(order)))
+    return result
+
+
+def category_means(grades, drop_lowest=0):
+    """Mean of each row's graded entries after dropping its drop_lowest lowest; at least one grade is kept"""
+    if grades.shape[1] == 0:
+        return np.full(len(grades), np.nan)
+    ordered = np.sort(grades, axis=1)  # NaN last
+    graded = (~np.isnan(grades)).sum(axis=1)
+    dropped = np.minimum(drop_lowest, np.maximum(graded - 1, 0))
+    column = np.arange(grades.shape[1])
+    keep = (column >= dropped[:, None]) & (column < graded[:, None])
+    kept = keep.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(kept > 0, np.where(keep, ordered, 0.0).sum(axis=1) / kept, np.nan)
+
+
+def weighted(means, weights):
+    """Weighted mean of each row of category means, renormalized over the categories that are not NaN"""
+    present = ~np.isnan(means)
+    total = present @ weights
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, np.where(present, means, 0.0) @ weights / total, np.nan)
+
+
+def letters(final, scale=None):
+    """Letter of each grade under scale [(lowest percentage, letter)]; None for NaN"""
+    scale = sorted(scale or current_app.config["GRADE_SCALE"])
+    thresholds = np.array([lowest for lowest, _ in scale], dtype=float)
+    positions = np.searchsorted(thresholds, np.round(final, 6), side="right") - 1
+    return [None if np.isnan(value) else scale[max(position, 0)][1]
+            for value, position in zip(final.tolist(), positions.tolist())]
+
+
+def compute(grades, column_types, categories):
+    """(category means, final grades) of a students x assignments array"""
+    column_types = np.array(column_types, dtype=object)
+    means = np.column_stack([
+        category_means(grades if name == UNWEIGHTED else grades[:, column_types == name], drop_lowest)
+        for name, _, drop_lowest in categories]) if categories else np.empty((len(grades), 0))
+    return means, weighted(means, np.array([weight for _, weight, _ in categories], dtype=float))
+
+
+def course_grades(course_ids, student_ids=None):
+    """{course_id: CourseGrades} for the given courses, of every enrolled student or only student_ids.
+
+    Four queries however many courses, students and assignments there are.
+    """
+    course_ids = list(course_ids)
+    if not course_ids:
+        return {}
+    columns = {course_id: [] for course_id in course_ids}
+    for row in db.session.execute(
+            db.select(Assignment.id, Assignment.title, Assignment.assignment_type, Assignment.course_id)
+            .where(Assignment.course_id.in_(course_ids)).order_by(Assignment.due_date, Assignment.id)):
+        columns[row.course_id].append((row.id, row.title, row.assignment_type))
+
+    rows = {course_id: list(student_ids) for course_id in course_ids} if student_ids is not None else None
+    if rows is None:
+        rows = {course_id: [] for course_id in course_ids}
+        for student_id, course_id in db.session.execute(
+                db.select(Enrollment.student_id, Enrollment.course_id)
+                .where(Enrollment.course_id.in_(course_ids)).order_by(Enrollment.student_id)):
+            rows[course_id].append(student_id)
+
+    stmt = (db.select(Assignment.course_id, Submission.student_id, Submission.assignment_id, Submission.grade)
+            .join(Assignment, Assignment.id == Submission.assignment_id)
+            .where(Assignment.course_id.in_(course_ids), Submission.grade.isnot(None)))
+    if student_ids is not None:
+        stmt = stmt.where(Submission.student_id.in_(list(student_ids)))
+    cells = {course_id: ([], [], []) for course_id in course_ids}
+    row_index = {course_id: {student_id: n for n, student_id in enumerate(rows[course_id])} for course_id in course_ids}
+    column_index = {course_id: {column[0]: n for n, column in enumerate(columns[course_id])}
+                    for course_id in course_ids}
+    for course_id, student_id, assignment_id, grade in db.session.execute(stmt):
+        row = row_index[course_id].get(student_id)
+        if row is not None:
+            cells[course_id][0].append(row)
+            cells[course_id][1].append(column_index[course_id][assignment_id])
+            cells[course_id][2].append(grade)
+
+    weights = policies(course_ids)
+    result = {}
+    for course_id in course_ids:
+        grades = np.full((len(rows[course_id]), len(columns[course_id])), np.nan)
+        row, column, value = cells[course_id]
+        grades[row, column] = value
+        categories = weights.get(course_id) or [(UNWEIGHTED, 1.0, 0)]
+        means, final = compute(grades, [column[2] for column in columns[course_id]], categories)
+        result[course_id] = CourseGrades(course_id, rows[course_id], columns[course_id], grades, categories,
+                                         means, final, letters(final))
+    return result
+
+
+def save_policy(course_id, categories):
+    """Replace the course's weights; categories maps assignment_type to (weight, drop_lowest).
+
+    Types with weight 0 get no row, so all zeros restore the plain mean. Flushed, not committed.
+    """
+    db.session.execute(db.delete(GradeCategory).where(GradeCategory.course_id == course_id))
+    rows = [{"course_id": course_id, "assignment_type": assignment_type, "weight": weight,
+             "drop_lowest": drop_lowest}
+            for assignment_type, (weight, drop_lowest) in categories.items() if weight > 0]
+    if rows:
+        db.session.execute(db.insert(GradeCategory), rows)
+
+
+BIN_WIDTH = 10  # histogram bins 0-9, 10-19 ... 90-100; 100 joins the last bin
+BINS = 100 // BIN_WIDTH
+PERCENTILES = (25, 50, 75, 90)
+
+
+def histograms(grades):
+    """Per-column counts of grades in each bin, as a columns x BINS array (one bincount)"""
+    graded = ~np.isnan(grades)
+    bins = np.clip(np.floor(grades[graded] / BIN_WIDTH), 0, BINS - 1).astype(np.int64)
+    columns = np.nonzero(graded)[1]
+    return np.bincount(columns * BINS + bins, minlength=grades.shape[1] * BINS).reshape(grades.shape[1], BINS)
+
+
+def column_stats(grades):
+    """[{"graded", "mean", "std", "min", "p25", "median", "p75", "p90", "max", "histogram"}] per column"""
+    count = (~np.isnan(grades)).sum(axis=0)
+    columns = grades[:, count > 0]
+    stats = np.full((len(PERCENTILES) + 4, grades.shape[1]), np.nan)
+    if columns.size:
+        stats[:, count > 0] = np.vstack([
+            np.nanmean(columns, axis=0), np.nanstd(columns, axis=0), np.nanmin(columns, axis=0),
+            np.nanpercentile(columns, PERCENTILES, axis=0), np.nanmax(columns, axis=0)])
+    names = ("mean", "std", "min") + tuple(f"p{p}" for p in PERCENTILES) + ("max",)
+    result = []
+    for n, histogram in enumerate(histograms(grades).tolist()):
+        item = {"graded": int(count[n]), "histogram": histogram}
+        item.update({name: _number(value) for name, value in zip(names, stats[:, n].tolist())})
+        item["median"] = item.pop("p50")
+        result.append(item)
+    return result
+
+
+def standing(final):
+    """(rank, percentile) of each grade among the non-NaN ones: rank 1 is best and ties share a rank;
+    the percentile counts grades below plus half of the ties"""
+    ordered = np.sort(final[~np.isnan(final)])
+    below = np.searchsorted(ordered, final, side="left")
+    at_or_below = np.searchsorted(ordered, final, side="right")
+    rank = len(ordered) - at_or_below + 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        percentile = 100.0 * (below + 0.5 * (at_or_below - below)) / len(ordered)
+    return rank, percentile
+
+
+def _number(value):
+    return None if value != value else round(value, 2)
+
+
+def build_distribution(course_id):
+    """The course's grade distribution report as plain JSON-ready data, from one load of the grade grid"""
+    result = course_grades([course_id])[course_id]
+    usernames = dict(db.session.execute(db.select(User.id, User.username)
+                                        .where(User.id.in_(result.student_ids))).all())
+    assignments = column_stats(result.grades)
+    for item, (assignment_id, title, assignment_type) in zip(assignments, result.assignments):
+        item.update(id=assignment_id, title=title, assignment_type=assignment_type)
+    course = column_stats(result.final[:, None])[0]
+    course["letters"] = {}
+    for letter in result.letters:
+        if letter is not None:
+            course["letters"][letter] = course["letters"].get(letter, 0) + 1
+    rank, percentile = standing(result.final)
+    students = [{"id": student_id, "username": usernames.get(student_id), "final": _number(final), "letter": letter,
+                 "rank": int(place) if letter else None, "percentile": _number(share) if letter else None}
+                for student_id, final, letter, place, share
+                in zip(result.student_ids, result.final.tolist(), result.letters, rank.tolist(), percentile.tolist())]
+    students.sort(key=lambda student: (student["rank"] is None, student["rank"] or 0, student["username"] or ""))
+    return {
+        "bins": [f"{low}-{low + BIN_WIDTH - 1}" if low + BIN_WIDTH < 100 else f"{low}-100"
+                 for low in range(0, 100, BIN_WIDTH)],
+        "weighted": result.categories[0][0] != UNWEIGHTED,
+        "course": course,
+        "assignments": assignments,
+        "students": students,
+    }
+
+
+def distribution(course_id):
+    """The report, from the cache until the course's next grade, weight, roster or assignment change"""
+    cache = get_cache()
+    key = versioned_key(f"grade_report:{course_id}", [grades_scope(course_id), course_scope(course_id)])
+    cached = cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+    report = build_distribution(course_id)
+    cache.set(key, json.dumps(report))
+    return report
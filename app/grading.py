@@ -0,0 +1,94 @@
+"""
+Grading queue: hands each grader the next ungraded submission under a lease.
+
+claim_next() is one conditional UPDATE. It picks the oldest ungraded submission
+of the assignment that nobody else holds, and sets claimed_by and
+lease_expires_at. The WHERE clause repeats the availability check, so if two
+graders race for the same row only one UPDATE matches. The loser retries with
+the next row. Graders never load the full submission list, and they never get
+a submission someone else is grading.
+
+A grader who asks again before their lease runs out gets the same submission
+back with a renewed lease. Saving a grade or releasing ends the lease, and
+when a lease simply expires the submission becomes available to others.
+Claiming only happens on a POST; the grade-next page reads the grader's lease
+with current_claim(), so reloading it or a prefetch never takes a submission.
+progress() counts graded, claimed and remaining submissions in one aggregate.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, func, or_
+
+from .models import db, Submission
+
+CLAIM_ATTEMPTS = 5
+
+
+def _available(grader_id, now):
+    """Ungraded and not leased to anyone else"""
+    return db.and_(Submission.grade.is_(None),
+                   or_(Submission.lease_expires_at.is_(None), Submission.lease_expires_at < now,
+                       Submission.claimed_by == grader_id))
+
+
+def claim_next(assignment_id, grader_id, now=None, lease_minutes=None):
+    """Lease the grader's next submission and return its id, or None when nothing is left.
+
+    The grader's own unexpired claim comes first, then the oldest hand-in. Flushed,
+    not committed.
+    """
+    now = now or datetime.utcnow()
+    if lease_minutes is None:
+        lease_minutes = current_app.config.get("GRADING_LEASE_MINUTES", 15)
+    own_claim = case((db.and_(Submission.claimed_by == grader_id, Submission.lease_expires_at >= now), 0), else_=1)
+    candidate = (db.select(Submission.id)
+                 .where(Submission.assignment_id == assignment_id, _available(grader_id, now))
+                 .order_by(own_claim, Submission.submitted_at, Submission.id)
+                 .limit(1).scalar_subquery())
+    claim = (db.update(Submission)
+             .where(Submission.id == candidate, _available(grader_id, now))
+             .values(claimed_by=grader_id, lease_expires_at=now + timedelta(minutes=lease_minutes))
+             .returning(Submission.id)
+             .execution_options(synchronize_session=False))
+    for _ in range(CLAIM_ATTEMPTS):
+        claimed = db.session.execute(claim).scalar()
+        if claimed is not None:
+            return claimed
+        # Nothing matched: either the queue is empty or another grader took the row first
+        remaining = db.session.execute(db.select(Submission.id).where(
+            Submission.assignment_id == assignment_id, _available(grader_id, now)).limit(1)).scalar()
+        if remaining is None:
+            return None
+    return None
+
+
+def current_claim(assignment_id, grader_id, now=None):
+    """Id of the submission the grader holds an unexpired lease on, or None; reads only"""
+    now = now or datetime.utcnow()
+    return db.session.execute(
+        db.select(Submission.id)
+        .where(Submission.assignment_id == assignment_id, Submission.claimed_by == grader_id,
+               Submission.grade.is_(None), Submission.lease_expires_at >= now)
+        .order_by(Submission.lease_expires_at.desc()).limit(1)
+    ).scalar()
+
+
+def release(submission_id, grader_id):
+    """End the grader's lease on a submission (after grading, or to hand it back); flushed"""
+    db.session.execute(db.update(Submission)
+                       .where(Submission.id == submission_id, Submission.claimed_by == grader_id)
+                       .values(claimed_by=None, lease_expires_at=None)
+                       .execution_options(synchronize_session=False))
+
+
+def progress(assignment_id, now=None):
+    """{"total", "graded", "claimed", "remaining"} for one assignment in a single aggregate query"""
+    now = now or datetime.utcnow()
+    ungraded = Submission.grade.is_(None)
+    leased = db.and_(ungraded, Submission.lease_expires_at >= now)
+    total, graded, claimed = db.session.execute(
+        db.select(func.count(Submission.id), func.count(Submission.grade), func.count(case((leased, 1))))
+        .where(Submission.assignment_id == assignment_id)
+    ).one()
+    return {"total": total, "graded": graded, "claimed": claimed, "remaining": total - graded - claimed}
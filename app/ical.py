@@ -0,0 +1,60 @@
+"""
+Minimal iCalendar (RFC 5545) writer for the deadline feed.
+
+feed() is a generator that yields the calendar a few lines at a time, so a
+response can stream events as the database rows arrive instead of building
+the whole document in memory.
+"""
+from datetime import timezone
+
+PRODID = "-//cs131 LMS//Deadlines//EN"
+
+
+def escape(text):
+    """Escape a TEXT value: backslash, semicolon, comma and newlines"""
+    return (str(text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces joined by CRLF + space"""
+    data = line.encode("utf-8")
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:  # never split a UTF-8 sequence
+            end -= 1
+        parts.append(data[start:end].decode("utf-8"))
+        start, limit = end, 74  # continuation lines start with a space
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def utc_stamp(value):
+    """DATE-TIME in UTC form, e.g. 20251231T235959Z; naive values are taken as UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def event(uid, start, summary, stamp, description=None, url=None):
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{utc_stamp(stamp)}", f"DTSTART:{utc_stamp(start)}",
+             f"SUMMARY:{escape(summary)}"]
+    if description:
+        lines.append(f"DESCRIPTION:{escape(description)}")
+    if url:
+        lines.append(f"URL:{url}")
+    lines.append("END:VEVENT")
+    return "".join(fold(line) for line in lines)
+
+
+def feed(events, name):
+    """Yield a VCALENDAR around an iterable of event() strings"""
+    yield "".join(fold(line) for line in [
+        "BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN", "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape(name)}",
+    ])
+    for item in events:
+        yield item
+    yield fold("END:VCALENDAR")
@@ -0,0 +1,62 @@
+"""
+Idempotency keys for forms that create rows.
+
+Forms built on IdempotentForm render a random hidden key. The view calls
+claim() before writing. claim() inserts a digest of the user, endpoint, key
+and the row being targeted, using INSERT ... ON CONFLICT DO NOTHING, in the
+same transaction as the write. A double-click or a replayed POST finds the
+digest already taken, so the view skips the write. The target is part of the
+digest because a cached page can hand the same key to several different posts,
+for example enrolling two different students.
+
+Posts without a key (API clients, older pages) are always processed; the
+unique constraints and upserts in the views keep those from duplicating rows.
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app, request
+from flask_login import current_user
+
+from .database import insert
+from .models import db, IdempotencyKey
+
+
+def digest(user_id, endpoint, key, *target):
+    parts = [str(user_id), endpoint or "", key, *(str(part) for part in target)]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def claim(key, *target):
+    """True if this post should be processed; False if the same post was already claimed.
+
+    Flushed, not committed: commit together with the write it guards.
+    """
+    if not key:
+        return True
+    stmt = insert(IdempotencyKey).values(
+        key=digest(current_user.id, request.endpoint, key, *target),
+        user_id=current_user.id,
+        created_at=datetime.utcnow(),
+    ).on_conflict_do_nothing(index_elements=["key"])
+    return db.session.execute(stmt).rowcount == 1
+
+
+def prune(max_age_hours=None, now=None):
+    """Delete keys older than IDEMPOTENCY_KEY_MAX_AGE_HOURS; commits and returns how many"""
+    if max_age_hours is None:
+        max_age_hours = current_app.config.get("IDEMPOTENCY_KEY_MAX_AGE_HOURS", 24)
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=max_age_hours)
+    removed = (db.session.query(IdempotencyKey).filter(IdempotencyKey.created_at < cutoff)
+               .delete(synchronize_session=False))
+    db.session.commit()
+    return removed
+
+
+def init_app(app):
+    @app.cli.command("prune-idempotency-keys")
+    @click.option("--max-age-hours", type=int, help="keep keys newer than this")
+    def prune_command(max_age_hours):
+        """Forget idempotency keys past their retention period"""
+        click.echo(f"Removed {prune(max_age_hours)} idempotency keys")
@@ -0,0 +1,57 @@
+"""
+Guard against lazy relationship loads while a template renders.
+
+Routes load what their templates traverse with selectinload/joinedload
+options. With RAISE_ON_TEMPLATE_LAZYLOAD set (the test suite turns it on), a
+relationship load that would run SQL during rendering raises instead, the way
+raiseload() does, so a missing eager-load option fails loudly rather than
+turning into one query per row. Loads satisfied from the identity map (e.g.
+assignment.course for a course the view already loaded) run no SQL and pass.
+"""
+from flask import current_app, g, has_app_context, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+from .replica import RoutingSession
+
+
+def _rendering():
+    if has_app_context():
+        return g.get("rendering_templates")
+    return None
+
+
+def _before_render(sender, template, context, **extra):
+    g.setdefault("rendering_templates", []).append(template.name)
+
+
+def _after_render(sender, template, context, **extra):
+    stack = g.get("rendering_templates")
+    if stack:
+        stack.pop()
+
+
+def _check_lazy_load(orm_execute_state):
+    templates = _rendering()
+    if not templates or not orm_execute_state.is_relationship_load:
+        return
+    if not current_app.config.get("RAISE_ON_TEMPLATE_LAZYLOAD"):
+        return
+    path = orm_execute_state.loader_strategy_path
+    relationship = f"{path[-2].class_.__name__}.{path[-1].key}" if path is not None and len(path) >= 2 else "a relationship"
+    raise InvalidRequestError(
+        f"{relationship} was lazy-loaded while rendering {templates[-1]}; "
+        f"eager-load it in the route query (selectinload/joinedload)"
+    )
+
+
+def init_app(app):
+    """Track template rendering and check every ORM execution against it"""
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    if not event.contains(RoutingSession, "do_orm_execute", _check_lazy_load):
+        event.listen(RoutingSession, "do_orm_execute", _check_lazy_load)
+
+    @app.teardown_request
+    def reset_rendering(exc):
+        g.pop("rendering_templates", None)  # a template that raised never signals completion
@@ -1,14 +1,153 @@
 
-from flask import Blueprint, render_template, flash, redirect, url_for, current_app, send_from_directory, request
+from flask import Blueprint, render_template, flash, redirect, url_for, current_app, send_from_directory, request, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
-from ..forms import CreateAssignmentForm, CreateCourseForm, EnrollStudentForm, SubmitAssignmentForm, ComposeMessageForm, AnnouncementForm, AssignTAForm, GradeSubmissionForm
-from ..models import db, Assignment, Course, User, Enrollment, Submission, Message, Announcement, TAAssignment
+from sqlalchemy.orm import joinedload, undefer
+from ..forms import CreateAssignmentForm, CreateCourseForm, EnrollStudentForm, SubmitAssignmentForm, ComposeMessageForm, BroadcastMessageForm, AnnouncementForm, AssignTAForm, GradeSubmissionForm, AutograderForm, QuizQuestionForm, QuizSettingsForm, QuizAttemptForm, GradeWeightsForm, GradeNextForm, RemoveQuizQuestionForm
+from ..models import db, Assignment, Course, User, Enrollment, Submission, SubmissionVersion, ExtractedText, Message, Announcement, TAAssignment, QuizQuestion, GradeCategory
+from ..cache import cached_page, bump_version, user_scope, course_scope, grades_scope
+from ..conditional import conditional_view, table_stamp
+from .. import agenda, autograder, extraction, gradebook, grading, ical, idempotency, quizzes, readmodels, reports, similarity, versioning
+from ..database import insert
 
 bp = Blueprint("main", __name__, template_folder=os.path.join(os.path.dirname(__file__), 'templates'))
 
+def member_course_ids(user):
+    """Ids of the courses a user teaches, is enrolled in, or is a TA for"""
+    if user.role == 'student':
+        query = db.session.query(Enrollment.course_id).filter(Enrollment.student_id == user.id)
+    elif user.role == 'instructor':
+        query = db.session.query(Course.id).filter(Course.teacher == user.id)
+    else:  # TA
+        query = db.session.query(TAAssignment.course_id).filter(TAAssignment.ta_id == user.id)
+    return [course_id for (course_id,) in query]
+
+def calendar_course_ids(user_id):
+    """Courses a user takes, teaches or TAs as one subquery, so no role lookup is needed"""
+    return db.union(
+        db.select(Enrollment.course_id).where(Enrollment.student_id == user_id),
+        db.select(Course.id).where(Course.teacher == user_id),
+        db.select(TAAssignment.course_id).where(TAAssignment.ta_id == user_id),
+    )
+
+# Version scopes for cached pages (see app/cache.py)
+def _own_scope(**kwargs):
+    return [user_scope(current_user.id)]
+
+def _announcement_scopes(**kwargs):
+    return [user_scope(current_user.id)] + [course_scope(cid) for cid in member_course_ids(current_user)]
+
+def _course_scopes(course_id, **kwargs):
+    return [user_scope(current_user.id), course_scope(course_id)]
+
+# Fingerprints for conditional GET (see app/conditional.py): counts and newest
+# change of every table the page reads, scoped to the current user's courses
+def _home_fingerprint(**kwargs):
+    return [agenda.for_user(current_user, member_course_ids(current_user))]  # cached; the view reuses it
+
+def _courses_fingerprint(**kwargs):
+    course_ids = member_course_ids(current_user)
+    values = [course_ids, table_stamp(Course, Course.id.in_(course_ids))]
+    if current_user.role == 'student':
+        values.append(table_stamp(Submission, Submission.student_id == current_user.id))
+    return values
+
+def _grades_fingerprint(**kwargs):
+    values = _courses_fingerprint()
+    if current_user.role == 'student':
+        values.append(table_stamp(GradeCategory, GradeCategory.course_id.in_(values[0])))
+    return values
+
+def _assignments_fingerprint(**kwargs):
+    if current_user.role == 'student':
+        course_ids = member_course_ids(current_user)
+        return [
+            course_ids,
+            table_stamp(Assignment, Assignment.course_id.in_(course_ids)),
+            table_stamp(Course, Course.id.in_(course_ids)),
+            table_stamp(Submission, Submission.student_id == current_user.id),
+        ]
+    return [table_stamp(Assignment), table_stamp(Course), table_stamp(Submission)]
+
+def _analytics_fingerprint(**kwargs):
+    if current_user.role != 'student':
+        return []
+    course_ids = member_course_ids(current_user)
+    assignment_ids = db.session.query(Assignment.id).filter(Assignment.course_id.in_(course_ids))
+    return [
+        course_ids,
+        table_stamp(Assignment, Assignment.course_id.in_(course_ids)),
+        table_stamp(Submission, Submission.assignment_id.in_(assignment_ids)),
+    ]
+
+def _teacher_portal_fingerprint(**kwargs):
+    course_ids = member_course_ids(current_user)
+    return [
+        table_stamp(User, User.role == 'student'),
+        table_stamp(Course, Course.id.in_(course_ids)),
+        table_stamp(Enrollment, Enrollment.course_id.in_(course_ids)),
+    ]
+
+def _view_course_fingerprint(course_id, **kwargs):
+    return [
+        table_stamp(Course, Course.id == course_id),
+        table_stamp(Enrollment, Enrollment.course_id == course_id),
+        table_stamp(Assignment, Assignment.course_id == course_id),
+    ]
+
+def _deadline_report_fingerprint(course_id, **kwargs):
+    assignment_ids = db.session.query(Assignment.id).filter(Assignment.course_id == course_id)
+    return [
+        table_stamp(Course, Course.id == course_id),
+        table_stamp(Assignment, Assignment.course_id == course_id),
+        table_stamp(Submission, Submission.assignment_id.in_(assignment_ids)),
+    ]
+
+def _submissions_fingerprint(assignment_id, **kwargs):
+    # File previews change when the extraction worker finishes, not on any write to these tables
+    latest_files = (db.select(SubmissionVersion.file_sha256)
+                    .join(Submission, Submission.latest_version_id == SubmissionVersion.id)
+                    .where(Submission.assignment_id == assignment_id))
+    return [
+        member_course_ids(current_user),
+        table_stamp(Assignment, Assignment.id == assignment_id),
+        table_stamp(Submission, Submission.assignment_id == assignment_id),
+        table_stamp(ExtractedText, ExtractedText.file_sha256.in_(latest_files), newest=ExtractedText.extracted_at),
+    ]
+
+def _inbox_fingerprint(**kwargs):
+    return [
+        table_stamp(Message, Message.recipient_id == current_user.id),
+        Message.query.filter_by(recipient_id=current_user.id, read=False).count(),
+    ]
+
+def _sent_fingerprint(**kwargs):
+    return [
+        table_stamp(Message, Message.sender_id == current_user.id),
+        Message.query.filter_by(sender_id=current_user.id, read=False).count(),
+    ]
+
+def _announcements_fingerprint(**kwargs):
+    course_ids = member_course_ids(current_user)
+    return [course_ids, table_stamp(Announcement, Announcement.course_id.in_(course_ids))]
+
+def _calendar_fingerprint(token, **kwargs):
+    # One indexed aggregate; polls from calendar apps usually stop here with a 304
+    user_id = User.calendar_token_user_id(token)
+    if user_id is None:
+        abort(404)
+    return [user_id, table_stamp(Assignment, Assignment.course_id.in_(calendar_course_ids(user_id)))]
+
+def _course_grades_fingerprint(course_id, **kwargs):
+    return [
+        table_stamp(Course, Course.id == course_id),
+        table_stamp(Assignment, Assignment.course_id == course_id),
+        table_stamp(Submission, Submission.student_id == current_user.id),
+        table_stamp(GradeCategory, GradeCategory.course_id == course_id),
+    ]
+
 @bp.route("/")
 @login_required
 def default():
@@ -16,58 +155,68 @@ def default():
 
 @bp.route("/home")
 @login_required
+@conditional_view(_home_fingerprint)
 def index():
-    if current_user.role == 'student':
-        # Get course IDs the student is enrolled in
-        enrolled_course_ids = [enrollment.course_id for enrollment in current_user.courses_enrolled]
-        # Filter assignments to only those courses
-        assignments = Assignment.query.filter(Assignment.course_id.in_(enrolled_course_ids)).order_by(Assignment.due_date).all()
-    elif current_user.role == 'instructor':
-        # Instructors see assignments from courses they teach
-        taught_course_ids = [course.id for course in current_user.courses_taught]
-        assignments = Assignment.query.filter(Assignment.course_id.in_(taught_course_ids)).order_by(Assignment.due_date).all()
-    else:  # TA
-        # TAs see assignments from courses they are assigned to
-        ta_course_ids = [ta_assignment.course_id for ta_assignment in current_user.ta_assignments]
-        assignments = Assignment.query.filter(Assignment.course_id.in_(ta_course_ids)).order_by(Assignment.due_date).all()
-    
-    return render_template("main/home.html", assignments=assignments)
+    # Next deadlines (and, for students, overdue work not yet submitted) in the user's courses
+    items = agenda.for_user(current_user, member_course_ids(current_user))
+    return render_template("main/home.html", agenda=items)
+
+@bp.route("/calendar/<token>.ics")
+@conditional_view(_calendar_fingerprint)
+def calendar_feed(token):
+    """iCalendar feed of every deadline in the token owner's courses, streamed as rows arrive"""
+    user = db.session.get(User, User.calendar_token_user_id(token))
+    if user is None:
+        abort(404)
+    rows = (db.session.query(Assignment.id, Assignment.title, Assignment.description, Assignment.due_date,
+                             Assignment.updated_at, Course.code)
+            .join(Course, Course.id == Assignment.course_id)
+            .filter(Assignment.course_id.in_(calendar_course_ids(user.id)))
+            .order_by(Assignment.due_date)
+            .execution_options(yield_per=200))
+    host = request.host.split(":")[0]
+
+    def events():
+        for assignment_id, title, description, due_date, updated_at, code in rows:
+            yield ical.event(
+                uid=f"assignment-{assignment_id}@{host}",
+                start=due_date,
+                summary=f"{code}: {title}",
+                stamp=updated_at or due_date,
+                description=description,
+                url=url_for("main.submit_assignment", assignment_id=assignment_id, _external=True),
+            )
+
+    return Response(stream_with_context(ical.feed(events(), f"{user.username} deadlines")),
+                    mimetype="text/calendar",
+                    headers={"Content-Disposition": "inline; filename=deadlines.ics"})
 
 @bp.route("/grades")
 @login_required
+@conditional_view(_grades_fingerprint)
+@cached_page(_own_scope)
 def grades():
     if current_user.role == "instructor":
         # Show courses taught by this instructor
-        courses = Course.query.filter_by(teacher=current_user.id).all()
+        courses = Course.query.options(joinedload(Course.instructor)).filter_by(teacher=current_user.id).all()
         course_averages = {}
     elif current_user.role == "student":
         # Show courses enrolled by this student
-        enrollments = Enrollment.query.filter_by(student_id=current_user.id).all()
+        enrollments = Enrollment.query.options(
+            joinedload(Enrollment.course).joinedload(Course.instructor)
+        ).filter_by(student_id=current_user.id).all()
         courses = [e.course for e in enrollments]
-        
-        # Calculate average grade for each course
+
+        # Weighted grade for each course (see app/gradebook.py), all courses in one pass
         course_averages = {}
-        for course in courses:
-            # Get all assignments for this course
-            assignments = Assignment.query.filter_by(course_id=course.id).all()
-            assignment_ids = [a.id for a in assignments]
-            
-            # Get student's graded submissions for this course
-            graded_submissions = Submission.query.filter(
-                Submission.student_id == current_user.id,
-                Submission.assignment_id.in_(assignment_ids),
-                Submission.grade.isnot(None)
-            ).all()
-            
-            if graded_submissions:
-                total = sum(sub.grade for sub in graded_submissions)
-                average = round(total / len(graded_submissions), 1)
-                course_averages[course.id] = average
-            else:
-                course_averages[course.id] = None
+        for course_id, result in gradebook.course_grades([c.id for c in courses], [current_user.id]).items():
+            if result.letters[0] is not None:
+                course_averages[course_id] = round(float(result.final[0]), 1)
     else:  # TA
         # Show courses the TA is assigned to
-        ta_assignments = TAAssignment.query.filter_by(ta_id=current_user.id).all()
+        ta_assignments = TAAssignment.query.options(
+            joinedload(TAAssignment.course).joinedload(Course.instructor)
+        ).filter_by(ta_id=current_user.id).all()
         courses = [ta_assignment.course for ta_assignment in ta_assignments]
         course_averages = {}
     
@@ -75,66 +224,59 @@ def grades():
 
 @bp.route("/classes")
 @login_required
+@conditional_view(_courses_fingerprint)
+@cached_page(_own_scope)
 def classes():
     if current_user.role == "instructor":
         # Show courses taught by this instructor
-        courses = Course.query.filter_by(teacher=current_user.id).all()
+        courses = Course.query.options(joinedload(Course.instructor)).filter_by(teacher=current_user.id).all()
     elif current_user.role == "student":
         # Show courses enrolled by this student
-        enrollments = Enrollment.query.filter_by(student_id=current_user.id).all()
+        enrollments = Enrollment.query.options(
+            joinedload(Enrollment.course).joinedload(Course.instructor)
+        ).filter_by(student_id=current_user.id).all()
         courses = [e.course for e in enrollments]
     else:  # TA
         # Show courses the TA is assigned to
-        ta_assignments = TAAssignment.query.filter_by(ta_id=current_user.id).all()
+        ta_assignments = TAAssignment.query.options(
+            joinedload(TAAssignment.course).joinedload(Course.instructor)
+        ).filter_by(ta_id=current_user.id).all()
         courses = [ta_assignment.course for ta_assignment in ta_assignments]
     return render_template("main/classes.html", courses=courses)
 
 @bp.route("/assignments")
 @login_required
+@conditional_view(_assignments_fingerprint)
 def assignments():
     # Server-side sorting support via query params: ?sort=due_date|course&order=asc|desc
     sort = request.args.get("sort")
     order = request.args.get("order", "asc")
 
-    q = Assignment.query
     # If the current user is an authenticated student, only show assignments
     # for courses they are enrolled in. Instructors and anonymous users keep full view.
+    student_id = None
     if getattr(current_user, 'is_authenticated', False) and getattr(current_user, 'role', None) == 'student':
-        enrolled = Enrollment.query.filter_by(student_id=current_user.id).all()
-        enrolled_ids = [e.course_id for e in enrolled]
-        # if student isn't enrolled anywhere, return empty list quickly
-        if not enrolled_ids:
-            return render_template("main/assignments.html", assignments=[], sort=sort, order=order)
-        q = q.filter(Assignment.course_id.in_(enrolled_ids))
-    if sort == "due_date":
-        if order == "asc":
-            q = q.order_by(Assignment.due_date.asc())
-        else:
-            q = q.order_by(Assignment.due_date.desc())
-    elif sort == "course":
-        # outerjoin so unlinked assignments are included
-        q = q.outerjoin(Course)
-        if order == "asc":
-            q = q.order_by(Course.title.asc())
-        else:
-            q = q.order_by(Course.title.desc())
-    else:
-        # default order (newest first)
-        q = q.order_by(Assignment.id.desc())
-
-    assignments = q.all()
+        student_id = current_user.id
+    # Column projection with the course title joined in (app/readmodels.py)
+    assignments = readmodels.assignments(student_id, sort=sort, order=order)
     
     # For students, check which assignments have been submitted
     submission_status = {}
     if getattr(current_user, 'is_authenticated', False) and getattr(current_user, 'role', None) == 'student':
-        for assignment in assignments:
-            existing_submission = Submission.query.filter_by(
-                assignment_id=assignment.id,
-                student_id=current_user.id
-            ).first()
-            submission_status[assignment.id] = existing_submission is not None
+        # One query for the student's submitted assignment ids instead of one per assignment
+        submitted = {assignment_id for (assignment_id,) in db.session.query(Submission.assignment_id).filter(
+            Submission.student_id == current_user.id,
+            Submission.assignment_id.in_([a.id for a in assignments]),
+        )}
+        submission_status = {assignment.id: assignment.id in submitted for assignment in assignments}
+    
+    # Staff see how many students submitted and how many are graded, counted in one grouped query
+    submission_counts = {}
+    if getattr(current_user, 'role', None) in ('instructor', 'ta'):
+        submission_counts = Assignment.submission_counts([a.id for a in assignments])
     
-    return render_template("main/assignments.html", assignments=assignments, sort=sort, order=order, submission_status=submission_status)
+    return render_template("main/assignments.html", assignments=assignments, sort=sort, order=order,
+                           submission_status=submission_status, submission_counts=submission_counts)
 
 @bp.route("/create_assignment", methods=["GET", "POST"])
 @login_required
@@ -153,22 +295,16 @@ def create_assignment():
         flash("You don't have any courses yet. Create a course first.", "info")
 
     if form.validate_on_submit():
-        # convert date object to ISO string for storing in the String column
-        due_val = form.due_date.data
-        if hasattr(due_val, "strftime"):
-            due_str = due_val.strftime("%Y-%m-%d")
-        else:
-            due_str = due_val
-
         assignment = Assignment(
             title=form.title.data,
             description=form.description.data,
-            due_date=due_str,
+            due_date=form.due_date.data,  # local time in TIMEZONE, stored as UTC
             assignment_type=form.assignment_type.data,
             course_id=form.course_id.data
         )
         db.session.add(assignment)
         db.session.commit()
+        bump_version(course_scope(assignment.course_id))
         flash("Assignment created successfully!", "success")
         return redirect(url_for("main.assignments"))
     return render_template("main/create_assignment.html", form=form)
@@ -199,12 +335,14 @@ def create_course():
         )
         db.session.add(course)
         db.session.commit()
+        bump_version(user_scope(current_user.id))
         flash("Course created successfully!", "success")
         return redirect(url_for("main.classes"))
     return render_template("main/create_course.html", form=form)
 
 @bp.route("/analytics")
 @login_required
+@conditional_view(_analytics_fingerprint)
 def analytics():
     # Only students see personal analytics; others see a simple page
     if getattr(current_user, "role", None) != "student":
@@ -278,21 +416,24 @@ def analytics():
 
 @bp.route("/teacher_portal")
 @login_required
+@conditional_view(_teacher_portal_fingerprint, csrf=True)
 def teacher_portal():
     # Only allow instructors to view the teacher portal
     if getattr(current_user, "role", None) != "instructor":
         flash("Access denied: instructor only.", "danger")
         return redirect(url_for("main.index"))
     
-    # Get all students and courses taught by the instructor
-    students = User.query.filter_by(role="student").all()
-    courses = Course.query.filter_by(teacher=current_user.id).all()
+    # Get all students and courses taught by the instructor, as read-only rows
+    students = readmodels.students()
+    courses = readmodels.taught_courses(current_user.id)
     form = EnrollStudentForm()
     return render_template("main/teacher_portal.html", students=students, courses=courses, form=form)
 
 
 @bp.route("/course/<int:course_id>") #specific course details
 @login_required
+@conditional_view(_view_course_fingerprint, csrf=True)
+@cached_page(_course_scopes)
 def view_course(course_id):
     course = Course.query.get_or_404(course_id)
     
@@ -302,7 +443,7 @@ def view_course(course_id):
         return redirect(url_for("main.classes"))
     
     # Get all enrolled students
-    enrollments = Enrollment.query.filter_by(course_id=course_id).all()
+    enrollments = Enrollment.query.options(joinedload(Enrollment.student)).filter_by(course_id=course_id).all()
     students = [e.student for e in enrollments]
     assignments = Assignment.query.filter_by(course_id=course_id).all()
     
@@ -310,6 +451,59 @@ def view_course(course_id):
     return render_template("main/view_course.html", course=course, students=students, assignments=assignments, form=form)
 
 
+@bp.route("/course/<int:course_id>/deadline_report")
+@login_required
+@conditional_view(_deadline_report_fingerprint)
+def deadline_report(course_id):
+    """On-time/late counts, resubmissions and submission timing per assignment (course instructor only)"""
+    course = Course.query.get_or_404(course_id)
+    if course.teacher != current_user.id:
+        flash("You do not have permission to view this course.", "danger")
+        return redirect(url_for("main.classes"))
+    report = reports.deadline_report(course_id)
+    return render_template("main/deadline_report.html", course=course, report=report)
+
+@bp.route("/course/<int:course_id>/gradebook", methods=["GET", "POST"])
+@login_required
+def course_gradebook(course_id):
+    """Category weights, drop-lowest rules and every student's weighted grade (course instructor only)"""
+    course = Course.query.get_or_404(course_id)
+    if course.teacher != current_user.id:
+        flash("You do not have permission to view this course.", "danger")
+        return redirect(url_for("main.classes"))
+
+    form = GradeWeightsForm()
+    if form.validate_on_submit():
+        gradebook.save_policy(course_id, {
+            assignment_type: (form[f"{assignment_type}_weight"].data, form[f"{assignment_type}_drop"].data)
+            for assignment_type in gradebook.TYPES})
+        db.session.commit()
+        students = db.session.execute(db.select(Enrollment.student_id).filter_by(course_id=course_id)).scalars()
+        bump_version(course_scope(course_id), grades_scope(course_id), *(user_scope(student_id) for student_id in students))
+        flash("Grade weights saved.", "success")
+        return redirect(url_for("main.course_gradebook", course_id=course_id))
+    if request.method == "GET":
+        for category in GradeCategory.query.filter_by(course_id=course_id):
+            if category.assignment_type in gradebook.TYPES:
+                form[f"{category.assignment_type}_weight"].data = category.weight
+                form[f"{category.assignment_type}_drop"].data = category.drop_lowest
+
+    result = gradebook.course_grades([course_id])[course_id]
+    usernames = dict(db.session.execute(db.select(User.id, User.username).where(User.id.in_(result.student_ids))).all())
+    return render_template("main/gradebook.html", course=course, form=form, result=result, usernames=usernames)
+
+@bp.route("/course/<int:course_id>/grade_report")
+@login_required
+def grade_report(course_id):
+    """Grade distributions, percentiles and student standings (course instructor and TAs)"""
+    course = Course.query.get_or_404(course_id)
+    is_ta = TAAssignment.query.filter_by(course_id=course_id, ta_id=current_user.id).first() is not None
+    if course.teacher != current_user.id and not is_ta:
+        flash("You do not have permission to view this course.", "danger")
+        return redirect(url_for("main.classes"))
+    report = gradebook.distribution(course_id)
+    return render_template("main/grade_report.html", course=course, report=report)
+
 @bp.route("/course/<int:course_id>/enroll", methods=["POST"])
 @login_required
 def enroll_student(course_id):
@@ -333,16 +527,17 @@ def enroll_student(course_id):
             flash("User is not student/TA", "danger")
             return redirect(url_for("main.teacher_portal"))
         
-        # Check if student is already enrolled
-        existing = Enrollment.query.filter_by(student_id=student.id, course_id=course_id).first()
-        if existing:
+        # Enroll in one statement; a repeated POST or an existing enrollment inserts nothing
+        inserted = False
+        if idempotency.claim(form.idempotency_key.data, course_id, student.id):
+            result = db.session.execute(insert(Enrollment).values(student_id=student.id, course_id=course_id)
+                                        .on_conflict_do_nothing(index_elements=["student_id", "course_id"]))
+            inserted = result.rowcount == 1
+        db.session.commit()
+        if not inserted:
             flash(f"{student.username} is already enrolled in this course.", "info")
             return redirect(url_for("main.teacher_portal"))
-        
-        # Create enrollment
-        enrollment = Enrollment(student_id=student.id, course_id=course_id)
-        db.session.add(enrollment)
-        db.session.commit()
+        bump_version(user_scope(student.id), course_scope(course_id))
         flash(f"{student.username} has been added to the course.", "success")
         return redirect(url_for("main.teacher_portal"))
     
@@ -372,21 +567,23 @@ def manage_tas(course_id):
     form.course_id.data = course.id
     
     if form.validate_on_submit():
-        # Check if TA is already assigned
-        existing = TAAssignment.query.filter_by(ta_id=form.ta_id.data, course_id=course_id).first()
-        if existing:
+        # Assign in one statement; a repeated POST or an existing assignment inserts nothing
+        inserted = False
+        if idempotency.claim(form.idempotency_key.data, course_id, form.ta_id.data):
+            result = db.session.execute(insert(TAAssignment).values(ta_id=form.ta_id.data, course_id=course_id)
+                                        .on_conflict_do_nothing(index_elements=["ta_id", "course_id"]))
+            inserted = result.rowcount == 1
+        db.session.commit()
+        if not inserted:
             flash("This TA is already assigned to this course.", "info")
         else:
-            # Create TA assignment
-            ta_assignment = TAAssignment(ta_id=form.ta_id.data, course_id=course_id)
-            db.session.add(ta_assignment)
-            db.session.commit()
-            ta = User.query.get(form.ta_id.data)
-            flash(f"{ta.username} has been assigned as a TA for this course.", "success")
+            bump_version(user_scope(form.ta_id.data))
+            ta_name = dict(form.ta_id.choices)[form.ta_id.data]
+            flash(f"{ta_name} has been assigned as a TA for this course.", "success")
         return redirect(url_for("main.manage_tas", course_id=course_id))
     
     # Get currently assigned TAs
-    ta_assignments = TAAssignment.query.filter_by(course_id=course_id).all()
+    ta_assignments = TAAssignment.query.options(joinedload(TAAssignment.ta)).filter_by(course_id=course_id).all()
     assigned_tas = [ta_assignment.ta for ta_assignment in ta_assignments]
     
     return render_template("main/manage_tas.html", course=course, assigned_tas=assigned_tas, ta_assignments=ta_assignments, form=form)
@@ -411,6 +608,7 @@ def remove_ta(course_id, ta_id):
     if ta_assignment:
         db.session.delete(ta_assignment)
         db.session.commit()
+        bump_version(user_scope(ta_id))
         ta = User.query.get(ta_id)
         flash(f"{ta.username} has been removed as a TA from this course.", "success")
     else:
@@ -425,59 +623,36 @@ def submit_assignment(assignment_id):
     form = SubmitAssignmentForm()
     
     if form.validate_on_submit():
-        # Check if student already submitted
-        existing = Submission.query.filter_by(
-            assignment_id=assignment_id,
-            student_id=current_user.id
-        ).first()
-        
-        # Handle file upload
-        file_path = None
-        unique_filename = None
+        # Handle file upload: stored once per distinct content, older versions keep their files
+        blob = None
+        filename = None
         if form.file.data:
-            file = form.file.data
-            filename = secure_filename(file.filename)
-            # Create unique filename: userid_assignmentid_filename
-            unique_filename = f"{current_user.id}_{assignment_id}_{filename}"
-            
-            # Ensure upload folder exists
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            os.makedirs(upload_folder, exist_ok=True)
-            
-            file_path = os.path.join(upload_folder, unique_filename)
-            file.save(file_path)
-            
-            # Delete old file if resubmitting
-            if existing and existing.file_path:
-                old_file = os.path.join(upload_folder, existing.file_path)
-                if os.path.exists(old_file):
-                    os.remove(old_file)
+            filename = secure_filename(form.file.data.filename)
+            blob = versioning.store_blob(form.file.data)
         
-        if existing:
-            # Update existing submission (resubmit)
-            existing.content = form.content.data
-            if unique_filename:
-                existing.file_path = unique_filename
-            from datetime import datetime
-            existing.submitted_at = datetime.utcnow()
-            db.session.commit()
+        # A double-click or replayed POST of the same form changes nothing
+        if not idempotency.claim(form.idempotency_key.data, assignment_id):
+            flash("This submission was already received.", "info")
+            return redirect(url_for("main.assignments"))
+        
+        # Every hand-in upserts the submission row and appends a version
+        version = versioning.submit(assignment_id, current_user.id, form.content.data, blob, filename)
+        if assignment.autograde_harness:
+            autograder.enqueue(assignment_id, [version.submission_id])
+        extraction.enqueue(version)  # the file is read by `flask extract-text`, never in the request
+        similarity.index_submissions([version.submission_id])
+        db.session.commit()
+        versioning.prune([version.submission_id])
+        bump_version(user_scope(current_user.id))
+        if version.number > 1:
             flash("Assignment resubmitted successfully!", "success")
         else:
-            # Create new submission
-            submission = Submission(
-                assignment_id=assignment_id,
-                student_id=current_user.id,
-                content=form.content.data,
-                file_path=unique_filename if file_path else None
-            )
-            db.session.add(submission)
-            db.session.commit()
             flash("Assignment submitted successfully!", "success")
         
         return redirect(url_for("main.assignments"))
     
     # Check if student already has a submission
-    existing_submission = Submission.query.filter_by(
+    existing_submission = Submission.query.options(joinedload(Submission.latest_version)).filter_by(
         assignment_id=assignment_id,
         student_id=current_user.id
     ).first()
@@ -488,22 +663,178 @@ def submit_assignment(assignment_id):
     
     return render_template("main/submit_assignment.html", form=form, assignment=assignment, existing_submission=existing_submission)
 
-@bp.route("/download/<filename>")
+@bp.route("/download/<path:filename>")
 @login_required
 def download_file(filename):
     """Download submitted assignment file"""
     upload_folder = current_app.config['UPLOAD_FOLDER']
     return send_from_directory(upload_folder, filename, as_attachment=True)
 
+def _can_view_submission(submission):
+    """The student who submitted, the course instructor, or one of its TAs"""
+    if submission.student_id == current_user.id:
+        return True
+    course = submission.assignment.course
+    if current_user.role == 'instructor':
+        return course is not None and course.teacher == current_user.id
+    if current_user.role == 'ta':
+        return TAAssignment.query.filter_by(ta_id=current_user.id, course_id=submission.assignment.course_id).first() is not None
+    return False
+
+@bp.route("/submission/<int:submission_id>/history")
+@login_required
+def submission_history(submission_id):
+    """Every version of a submission, newest first, one page at a time"""
+    submission = Submission.query.options(
+        joinedload(Submission.assignment).joinedload(Assignment.course), joinedload(Submission.student)
+    ).get_or_404(submission_id)
+    if not _can_view_submission(submission):
+        flash("You do not have permission to view this submission.", "danger")
+        return redirect(url_for("main.assignments"))
+    page = versioning.history(submission_id, page=request.args.get("page", 1, type=int))
+    return render_template("main/submission_history.html", submission=submission, page=page)
+
+@bp.route("/submission_version/<int:version_id>/download")
+@login_required
+def download_version(version_id):
+    """Download the file of one submission version under the name it was uploaded with"""
+    version = SubmissionVersion.query.get_or_404(version_id)
+    if not version.file_path or not _can_view_submission(version.submission):
+        abort(404)
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], version.file_path, as_attachment=True,
+                               download_name=version.file_name or os.path.basename(version.file_path))
+
+@bp.route("/submission_version/<int:version_id>/text")
+@login_required
+def version_text(version_id):
+    """The extracted text of a version's file, read in the browser instead of downloading it"""
+    version = SubmissionVersion.query.options(
+        joinedload(SubmissionVersion.submission).joinedload(Submission.assignment).joinedload(Assignment.course),
+        joinedload(SubmissionVersion.submission).joinedload(Submission.student)
+    ).get_or_404(version_id)
+    if not version.file_sha256 or not _can_view_submission(version.submission):
+        abort(404)
+    extracted = db.session.get(ExtractedText, version.file_sha256, options=[undefer(ExtractedText.text)])
+    return render_template("main/version_text.html", version=version, extracted=extracted)
+
+def _can_grade(assignment):
+    """The course instructor or one of its TAs"""
+    if current_user.role == 'instructor':
+        return assignment.course is not None and assignment.course.teacher == current_user.id
+    if current_user.role == 'ta':
+        return TAAssignment.query.filter_by(ta_id=current_user.id, course_id=assignment.course_id).first() is not None
+    return False
+
+@bp.route("/assignment/<int:assignment_id>/grade_next/claim", methods=["POST"])
+@login_required
+def claim_next(assignment_id):
+    """Lease the next submission to the current grader; concurrent graders are each leased a different one"""
+    assignment = Assignment.query.options(joinedload(Assignment.course)).get_or_404(assignment_id)
+    if not _can_grade(assignment) or not GradeNextForm().validate_on_submit():
+        flash("You can only grade submissions for courses you teach or assist.", "danger")
+        return redirect(url_for("main.assignments"))
+    grading.claim_next(assignment_id, current_user.id)
+    db.session.commit()
+    return redirect(url_for("main.grade_next", assignment_id=assignment_id))
+
+@bp.route("/assignment/<int:assignment_id>/grade_next")
+@login_required
+def grade_next(assignment_id):
+    """Grade one submission at a time: shows the submission leased to the current grader, without claiming"""
+    assignment = Assignment.query.options(joinedload(Assignment.course)).get_or_404(assignment_id)
+    if not _can_grade(assignment):
+        flash("You can only grade submissions for courses you teach or assist.", "danger")
+        return redirect(url_for("main.assignments"))
+    
+    submission_id = grading.current_claim(assignment_id, current_user.id)
+    submission = None
+    if submission_id is not None:
+        submission = Submission.query.options(
+            joinedload(Submission.student), joinedload(Submission.latest_version), undefer(Submission.is_late)
+        ).filter_by(id=submission_id).one()
+    progress = grading.progress(assignment_id)
+    return render_template("main/grade_next.html", assignment=assignment, submission=submission,
+                           progress=progress, form=GradeSubmissionForm(), next_form=GradeNextForm())
+
+@bp.route("/submission/<int:submission_id>/release", methods=["POST"])
+@login_required
+def release_submission(submission_id):
+    """Hand a leased submission back to the grading queue"""
+    if not GradeNextForm().validate_on_submit():
+        abort(400)
+    submission = Submission.query.get_or_404(submission_id)
+    grading.release(submission.id, current_user.id)
+    db.session.commit()
+    flash("Submission returned to the grading queue.", "info")
+    return redirect(url_for("main.view_submissions", assignment_id=submission.assignment_id))
+
+def _own_assignment(assignment_id):
+    """The assignment if the current user is the instructor of its course, else None"""
+    assignment = Assignment.query.options(joinedload(Assignment.course)).get_or_404(assignment_id)
+    if current_user.role != 'instructor' or assignment.course is None or assignment.course.teacher != current_user.id:
+        return None
+    return assignment
+
+@bp.route("/assignment/<int:assignment_id>/autograder", methods=["GET", "POST"])
+@login_required
+def autograder_settings(assignment_id):
+    """Attach a test harness to an assignment and see the autograder queue (course instructor only)"""
+    assignment = _own_assignment(assignment_id)
+    if assignment is None:
+        flash("Only the course instructor can configure the autograder.", "danger")
+        return redirect(url_for("main.assignments"))
+    
+    form = AutograderForm()
+    if form.validate_on_submit():
+        assignment.autograde_harness = form.harness.data.strip() or None
+        db.session.commit()
+        flash("Autograder harness saved." if assignment.autograde_harness else "Autograder turned off.", "success")
+        return redirect(url_for("main.autograder_settings", assignment_id=assignment_id))
+    if not form.is_submitted():
+        form.harness.data = assignment.autograde_harness
+    
+    return render_template("main/autograder.html", assignment=assignment, form=form,
+                           counts=autograder.status_counts(assignment_id))
+
+@bp.route("/assignment/<int:assignment_id>/regrade", methods=["POST"])
+@login_required
+def regrade_assignment(assignment_id):
+    """Queue an autograder run for every submission of the assignment, as one batch"""
+    assignment = _own_assignment(assignment_id)
+    if assignment is None:
+        flash("Only the course instructor can regrade an assignment.", "danger")
+        return redirect(url_for("main.assignments"))
+    if not assignment.autograde_harness:
+        flash("Attach a test harness first.", "info")
+        return redirect(url_for("main.autograder_settings", assignment_id=assignment_id))
+    
+    queued = autograder.enqueue(assignment_id)
+    db.session.commit()
+    flash(f"Queued {queued} submissions for autograding.", "success")
+    return redirect(url_for("main.autograder_settings", assignment_id=assignment_id))
+
+@bp.route("/assignment/<int:assignment_id>/similarity")
+@login_required
+def similarity_report(assignment_id):
+    """Pairs of submissions that look copied from each other (instructor and TAs)"""
+    assignment = Assignment.query.options(joinedload(Assignment.course)).get_or_404(assignment_id)
+    if not _can_grade(assignment):
+        flash("You can only check submissions for courses you teach or assist.", "danger")
+        return redirect(url_for("main.assignments"))
+    threshold = current_app.config["SIMILARITY_THRESHOLD"]
+    pairs = similarity.suspicious_pairs(assignment_id, threshold)
+    return render_template("main/similarity_report.html", assignment=assignment, pairs=pairs, threshold=threshold)
+
 @bp.route("/view_submissions/<int:assignment_id>")
 @login_required
+@conditional_view(_submissions_fingerprint, csrf=True)
 def view_submissions(assignment_id):
     """View all submissions for an assignment (instructors and TAs only)"""
     if current_user.role not in ["instructor", "ta"]:
         flash("Access denied: instructors and TAs only.", "danger")
         return redirect(url_for("main.assignments"))
     
-    assignment = Assignment.query.get_or_404(assignment_id)
+    assignment = Assignment.query.options(joinedload(Assignment.course)).get_or_404(assignment_id)
     
     # Verify teacher owns this assignment's course or TA is assigned to this course
     if current_user.role == 'instructor':
@@ -516,27 +847,15 @@ def view_submissions(assignment_id):
             flash("You can only view submissions for courses you are assigned to.", "danger")
             return redirect(url_for("main.assignments"))
     
-    # Parse due date for late detection (stored as string yyyy-mm-dd)
-    due_dt = None
-    try:
-        due_dt = datetime.strptime(str(assignment.due_date), "%Y-%m-%d")
-    except Exception:
-        due_dt = None
-
-    # Get all submissions for this assignment with student info
-    submissions = Submission.query.filter_by(assignment_id=assignment_id).all()
-
-    submissions_with_status = []
-    for sub in submissions:
-        is_late = False
-        if due_dt and sub.submitted_at:
-            is_late = sub.submitted_at > due_dt
-        submissions_with_status.append({"submission": sub, "is_late": is_late})
+    # One row per submission with student, latest file, lateness and lease state; notes are cut in SQL
+    now = datetime.utcnow()
+    submissions = readmodels.submissions(assignment_id, now)
     
     # Create a form instance for CSRF protection
     form = GradeSubmissionForm()
     
-    return render_template("main/view_submissions.html", assignment=assignment, submissions=submissions_with_status, form=form)
+    return render_template("main/view_submissions.html", assignment=assignment, submissions=submissions,
+                           form=form, progress=grading.progress(assignment_id, now))
 
 @bp.route("/grade_submission/<int:submission_id>", methods=["GET", "POST"])
 @login_required
@@ -546,7 +865,9 @@ def grade_submission(submission_id):
         flash("Access denied: instructors and TAs only.", "danger")
         return redirect(url_for("main.assignments"))
     
-    submission = Submission.query.get_or_404(submission_id)
+    submission = Submission.query.options(
+        joinedload(Submission.assignment).joinedload(Assignment.course), joinedload(Submission.student)
+    ).get_or_404(submission_id)
     assignment = submission.assignment
     
     # Verify teacher owns this assignment's course or TA is assigned to this course
@@ -568,30 +889,190 @@ def grade_submission(submission_id):
             if 0 <= grade_value <= 100:
                 submission.grade = grade_value
                 submission.feedback = feedback if feedback else None
+                submission.claimed_by = submission.lease_expires_at = None  # graded work leaves the queue
                 db.session.commit()
+                bump_version(user_scope(submission.student_id), grades_scope(assignment.course_id))
                 flash(f"Grade {grade_value} saved for {submission.student.username}!", "success")
             else:
                 flash("Grade must be between 0 and 100.", "danger")
         except (ValueError, TypeError):
             flash("Invalid grade value.", "danger")
     
+    if request.form.get("next") == "queue":
+        grading.claim_next(assignment.id, current_user.id)  # this POST takes the next lease, not the page
+        db.session.commit()
+        return redirect(url_for("main.grade_next", assignment_id=assignment.id))
     return redirect(url_for("main.view_submissions", assignment_id=assignment.id))
 
+# ============= QUIZ ROUTES =============
+
+def _save_question(question, form):
+    question.kind = form.kind.data
+    question.prompt = form.prompt.data
+    if question.kind == 'choice':
+        question.choices = "\n".join(line.strip() for line in form.choices.data.splitlines() if line.strip())
+        question.answer = form.answer.data - 1  # stored as the index of the choice
+        question.tolerance = 0.0
+    else:
+        question.choices = None
+        question.answer = form.answer.data
+        question.tolerance = form.tolerance.data or 0.0
+    question.points = form.points.data
+
+@bp.route("/assignment/<int:assignment_id>/quiz/edit", methods=["GET", "POST"])
+@login_required
+def quiz_editor(assignment_id):
+    """Build a quiz's question bank (course instructor only)"""
+    assignment = _own_assignment(assignment_id)
+    if assignment is None:
+        flash("Only the course instructor can edit this quiz.", "danger")
+        return redirect(url_for("main.assignments"))
+    
+    form = QuizQuestionForm()
+    if form.validate_on_submit():
+        question = QuizQuestion(assignment_id=assignment_id, position=quizzes.next_position(assignment_id))
+        _save_question(question, form)
+        db.session.add(question)
+        db.session.commit()
+        flash("Question added.", "success")
+        return redirect(url_for("main.quiz_editor", assignment_id=assignment_id))
+    
+    settings = QuizSettingsForm(time_limit_minutes=assignment.time_limit_minutes)
+    return render_template("main/quiz_editor.html", assignment=assignment, questions=quizzes.questions(assignment_id),
+                           form=form, settings=settings, remove_form=RemoveQuizQuestionForm())
+
+@bp.route("/assignment/<int:assignment_id>/quiz/settings", methods=["POST"])
+@login_required
+def quiz_settings(assignment_id):
+    """Set or clear a quiz's time limit"""
+    assignment = _own_assignment(assignment_id)
+    if assignment is None:
+        flash("Only the course instructor can edit this quiz.", "danger")
+        return redirect(url_for("main.assignments"))
+    form = QuizSettingsForm()
+    if form.validate_on_submit():
+        assignment.time_limit_minutes = form.time_limit_minutes.data
+        db.session.commit()
+        flash("Quiz settings saved.", "success")
+    else:
+        flash("Time limit must be between 1 and 1440 minutes.", "danger")
+    return redirect(url_for("main.quiz_editor", assignment_id=assignment_id))
+
+@bp.route("/quiz_question/<int:question_id>/edit", methods=["GET", "POST"])
+@login_required
+def edit_quiz_question(question_id):
+    """Correct a question; every submitted attempt is re-scored against the new key"""
+    question = QuizQuestion.query.get_or_404(question_id)
+    assignment = _own_assignment(question.assignment_id)
+    if assignment is None:
+        flash("Only the course instructor can edit this quiz.", "danger")
+        return redirect(url_for("main.assignments"))
+    
+    form = QuizQuestionForm(obj=question)
+    if not form.is_submitted() and question.kind == 'choice':
+        form.answer.data = int(question.answer) + 1
+    if form.validate_on_submit():
+        _save_question(question, form)
+        db.session.flush()
+        rescored, scopes = quizzes.rescore(assignment.id)
+        db.session.commit()
+        bump_version(*scopes)
+        flash(f"Question saved; {rescored} attempts re-scored.", "success")
+        return redirect(url_for("main.quiz_editor", assignment_id=assignment.id))
+    return render_template("main/edit_quiz_question.html", assignment=assignment, question=question, form=form)
+
+@bp.route("/quiz_question/<int:question_id>/delete", methods=["POST"])
+@login_required
+def delete_quiz_question(question_id):
+    """Remove a question; its position is not reused and attempts are re-scored without it"""
+    if not RemoveQuizQuestionForm().validate_on_submit():
+        abort(400)
+    question = QuizQuestion.query.get_or_404(question_id)
+    assignment = _own_assignment(question.assignment_id)
+    if assignment is None:
+        flash("Only the course instructor can edit this quiz.", "danger")
+        return redirect(url_for("main.assignments"))
+    db.session.delete(question)
+    db.session.flush()
+    rescored, scopes = quizzes.rescore(assignment.id)
+    db.session.commit()
+    bump_version(*scopes)
+    flash(f"Question removed; {rescored} attempts re-scored.", "success")
+    return redirect(url_for("main.quiz_editor", assignment_id=assignment.id))
+
+def _quiz_for_student(assignment_id):
+    """The assignment if the current user is enrolled in its course, else None"""
+    assignment = Assignment.query.options(joinedload(Assignment.course)).get_or_404(assignment_id)
+    enrolled = Enrollment.query.filter_by(student_id=current_user.id, course_id=assignment.course_id).first()
+    return assignment if enrolled is not None else None
+
+@bp.route("/assignment/<int:assignment_id>/quiz")
+@login_required
+def take_quiz(assignment_id):
+    """Start page, the running attempt with its countdown, or the result"""
+    assignment = _quiz_for_student(assignment_id)
+    if assignment is None:
+        flash("You can only take quizzes in courses you are enrolled in.", "danger")
+        return redirect(url_for("main.assignments"))
+    quiz_questions = quizzes.questions(assignment_id)
+    if not quiz_questions:
+        return redirect(url_for("main.submit_assignment", assignment_id=assignment_id))
+    attempt = quizzes.attempt_for(assignment_id, current_user.id)
+    return render_template("main/take_quiz.html", assignment=assignment, questions=quiz_questions, attempt=attempt,
+                           form=QuizAttemptForm(), now=datetime.utcnow())
+
+@bp.route("/assignment/<int:assignment_id>/quiz/start", methods=["POST"])
+@login_required
+def start_quiz(assignment_id):
+    """Start the student's one attempt; the time limit runs from here"""
+    assignment = _quiz_for_student(assignment_id)
+    if assignment is None or not QuizAttemptForm().validate_on_submit():
+        flash("You can only take quizzes in courses you are enrolled in.", "danger")
+        return redirect(url_for("main.assignments"))
+    quizzes.start(assignment, current_user.id)
+    db.session.commit()
+    return redirect(url_for("main.take_quiz", assignment_id=assignment_id))
+
+@bp.route("/assignment/<int:assignment_id>/quiz/submit", methods=["POST"])
+@login_required
+def submit_quiz(assignment_id):
+    """Hand in the attempt; it is scored immediately"""
+    assignment = _quiz_for_student(assignment_id)
+    attempt = quizzes.attempt_for(assignment_id, current_user.id) if assignment is not None else None
+    if attempt is None or not QuizAttemptForm().validate_on_submit():
+        flash("Start the quiz before submitting it.", "danger")
+        return redirect(url_for("main.assignments"))
+    
+    values = quizzes.parse_answers(quizzes.questions(assignment_id), request.form)
+    on_time = quizzes.in_time(attempt)
+    scopes = quizzes.submit(attempt, values)
+    if scopes is None:
+        flash("This quiz was already submitted.", "info")
+    elif on_time:
+        flash("Quiz submitted!", "success")
+    else:
+        flash("The time limit had passed, so your answers were not accepted.", "danger")
+    db.session.commit()
+    bump_version(*(scopes or ()))
+    return redirect(url_for("main.take_quiz", assignment_id=assignment_id))
+
 # ============= MESSAGING & COMMUNICATION ROUTES =============
 
 @bp.route("/messages")
 @login_required
+@conditional_view(_inbox_fingerprint)
 def messages():
     """View inbox - all received messages"""
-    inbox = Message.query.filter_by(recipient_id=current_user.id).order_by(Message.timestamp.desc()).all()
+    inbox = readmodels.inbox(current_user.id)  # message bodies stay in the database
     unread_count = Message.query.filter_by(recipient_id=current_user.id, read=False).count()
     return render_template("main/messages.html", messages=inbox, unread_count=unread_count)
 
 @bp.route("/messages/sent")
 @login_required
+@conditional_view(_sent_fingerprint)
 def sent_messages():
     """View sent messages"""
-    sent = Message.query.filter_by(sender_id=current_user.id).order_by(Message.timestamp.desc()).all()
+    sent = readmodels.sent(current_user.id)
     return render_template("main/sent_messages.html", messages=sent)
 
 @bp.route("/messages/compose", methods=["GET", "POST"])
@@ -660,11 +1141,51 @@ def compose_message():
     
     return render_template("main/compose_message.html", form=form)
 
+@bp.route("/messages/broadcast", methods=["GET", "POST"])
+@login_required
+def broadcast_message():
+    """Send a private message to every student enrolled in a course (instructors and TAs only)"""
+    if current_user.role not in ['instructor', 'ta']:
+        flash("Only instructors and TAs can message a whole course.", "danger")
+        return redirect(url_for("main.messages"))
+    
+    form = BroadcastMessageForm()
+    
+    # Populate course choices
+    if current_user.role == 'instructor':
+        courses = Course.query.filter_by(teacher=current_user.id).all()
+    else:  # TA - only assigned courses
+        ta_course_ids = [ta_assignment.course_id for ta_assignment in current_user.ta_assignments]
+        courses = Course.query.filter(Course.id.in_(ta_course_ids)).all()
+    
+    form.course_id.choices = [(c.id, f"{c.title} ({c.code})") for c in courses]
+    
+    if not form.course_id.choices:
+        flash("You don't have any courses to message.", "info")
+        return redirect(url_for("main.messages"))
+    
+    if form.validate_on_submit():
+        # Only fetch the student ids, then write every copy in one INSERT/transaction
+        student_ids = [
+            student_id for (student_id,) in db.session.query(Enrollment.student_id)
+            .filter(Enrollment.course_id == form.course_id.data, Enrollment.student_id != current_user.id)
+            .distinct()
+        ]
+        sent = Message.broadcast(current_user.id, student_ids, form.subject.data, form.body.data)
+        db.session.commit()
+        if sent:
+            flash(f"Message sent to {sent} student(s)!", "success")
+        else:
+            flash("No students are enrolled in that course yet.", "info")
+        return redirect(url_for("main.sent_messages"))
+    
+    return render_template("main/broadcast_message.html", form=form)
+
 @bp.route("/messages/<int:message_id>")
 @login_required
 def view_message(message_id):
     """View a specific message"""
-    message = Message.query.get_or_404(message_id)
+    message = Message.query.options(joinedload(Message.sender), joinedload(Message.recipient)).get_or_404(message_id)
     
     # Ensure user is sender or recipient
     if message.sender_id != current_user.id and message.recipient_id != current_user.id:
@@ -680,26 +1201,22 @@ def view_message(message_id):
 
 @bp.route("/announcements")
 @login_required
+@conditional_view(_announcements_fingerprint)
+@cached_page(_announcement_scopes)
 def announcements():
     """View all announcements for user's courses"""
     if current_user.role == 'student':
         # Get announcements from enrolled courses
         enrolled_course_ids = [e.course_id for e in current_user.courses_enrolled]
-        announcements_list = Announcement.query.filter(
-            Announcement.course_id.in_(enrolled_course_ids)
-        ).order_by(Announcement.timestamp.desc()).all()
+        announcements_list = readmodels.announcements(enrolled_course_ids)
     elif current_user.role == 'instructor':
         # Get announcements from taught courses
         taught_course_ids = [c.id for c in current_user.courses_taught]
-        announcements_list = Announcement.query.filter(
-            Announcement.course_id.in_(taught_course_ids)
-        ).order_by(Announcement.timestamp.desc()).all()
+        announcements_list = readmodels.announcements(taught_course_ids)
     else:  # TA
         # TAs see announcements from their assigned courses only
         ta_course_ids = [ta_assignment.course_id for ta_assignment in current_user.ta_assignments]
-        announcements_list = Announcement.query.filter(
-            Announcement.course_id.in_(ta_course_ids)
-        ).order_by(Announcement.timestamp.desc()).all()
+        announcements_list = readmodels.announcements(ta_course_ids)
     
     return render_template("main/announcements.html", announcements=announcements_list)
 
@@ -735,6 +1252,7 @@ def create_announcement():
         )
         db.session.add(announcement)
         db.session.commit()
+        bump_version(course_scope(announcement.course_id))
         flash("Announcement posted successfully!", "success")
         return redirect(url_for("main.announcements"))
     
@@ -742,25 +1260,25 @@ def create_announcement():
 
 @bp.route("/<int:course_id>/grades")
 @login_required
+@conditional_view(_course_grades_fingerprint)
+@cached_page(_course_scopes)
 def view_course_grades(course_id):
-    course = Course.query.get_or_404(course_id)
+    course = Course.query.options(joinedload(Course.instructor)).get_or_404(course_id)
 
     # Get assignments for the course
     assignments = Assignment.query.filter_by(course_id=course_id).all()
     
-    # If student, get their submissions and grades
+    # If student, get their submissions in this course and the weighted course grade
     submissions_dict = {}
     graded_count = 0
-    avg_grade = None
+    summary = None
 
     if current_user.role == 'student':
-        submissions = Submission.query.filter_by(student_id=current_user.id).all()
+        submissions = (Submission.query.join(Assignment, Assignment.id == Submission.assignment_id)
+                       .filter(Submission.student_id == current_user.id, Assignment.course_id == course_id).all())
         submissions_dict = {sub.assignment_id: sub for sub in submissions}
-
-        graded_subs = [sub for sub in submissions if sub.grade is not None]
-        graded_count = len(graded_subs)
-        if graded_subs:
-            avg_grade = round(sum(sub.grade for sub in graded_subs) / graded_count, 2)
+        graded_count = sum(1 for sub in submissions if sub.grade is not None)
+        summary = gradebook.course_grades([course_id], [current_user.id])[course_id]
 
     return render_template(
         "main/view_grades.html",
@@ -768,6 +1286,6 @@ def view_course_grades(course_id):
         assignments=assignments,
         submissions_dict=submissions_dict,
         graded_count=graded_count,
-        avg_grade=avg_grade,
+        summary=summary,
     )
 
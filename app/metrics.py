@@ -0,0 +1,182 @@
+"""
+Per-endpoint request metrics exposed in Prometheus text format at /metrics.
+
+For every request we record a count (by endpoint, method and status) and
+fixed-bucket histograms of total latency, time spent in the database, time
+spent rendering templates and response size. Updates take one lock per
+request, so the overhead is a handful of dictionary operations.
+"""
+import bisect
+import threading
+import time
+
+from flask import Response, current_app, g, has_app_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+from .models import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    """Fixed-bucket histogram; not thread-safe on its own (the registry locks)"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is the +Inf overflow
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, cumulative count) pairs as Prometheus expects"""
+        running = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            running += count
+            yield bound, running
+
+
+class MetricsRegistry:
+    """Thread-safe store for every metric the app exports"""
+
+    HISTOGRAMS = (
+        ("lms_http_request_duration_seconds", "Time spent handling the request.", LATENCY_BUCKETS),
+        ("lms_db_duration_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS),
+        ("lms_template_render_seconds", "Time spent rendering templates per request.", LATENCY_BUCKETS),
+        ("lms_http_response_size_bytes", "Size of the response body.", SIZE_BUCKETS),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}  # (endpoint, method, status) -> count
+        self._histograms = {name: {} for name, _, _ in self.HISTOGRAMS}  # name -> endpoint -> Histogram
+
+    def observe_request(self, endpoint, method, status, duration, db_time, render_time, size):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            for (name, _, buckets), value in zip(self.HISTOGRAMS, (duration, db_time, render_time, size)):
+                if value is None:
+                    continue
+                histogram = self._histograms[name].get(endpoint)
+                if histogram is None:
+                    histogram = self._histograms[name][endpoint] = Histogram(buckets)
+                histogram.observe(value)
+
+    def render(self):
+        """Serialize everything in the Prometheus text exposition format"""
+        lines = [
+            "# HELP lms_http_requests_total Total HTTP requests handled.",
+            "# TYPE lms_http_requests_total counter",
+        ]
+        with self._lock:
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                labels = _labels(endpoint=endpoint, method=method, status=status)
+                lines.append(f"lms_http_requests_total{{{labels}}} {count}")
+            for name, help_text, _ in self.HISTOGRAMS:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for endpoint, histogram in sorted(self._histograms[name].items()):
+                    for bound, cumulative in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else _format_number(bound)
+                        lines.append(f"{name}_bucket{{{_labels(endpoint=endpoint, le=le)}}} {cumulative}")
+                    lines.append(f"{name}_sum{{{_labels(endpoint=endpoint)}}} {_format_number(histogram.sum)}")
+                    lines.append(f"{name}_count{{{_labels(endpoint=endpoint)}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return ",".join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _timer():
+    if has_app_context():
+        return g.get("metrics_timer")
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _timer() is not None:
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timer = _timer()
+    starts = conn.info.get("metrics_query_start")
+    if timer is not None and starts:
+        timer["db"] += time.perf_counter() - starts.pop()
+
+
+def _before_render(sender, template, context, **extra):
+    timer = _timer()
+    if timer is not None:
+        timer["render_start"].append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    timer = _timer()
+    if timer is not None and timer["render_start"]:
+        elapsed = time.perf_counter() - timer["render_start"].pop()
+        if not timer["render_start"]:  # only count the outermost template of a nested render
+            timer["render"] += elapsed
+
+
+def init_app(app):
+    """Create the registry, hook the request lifecycle and register /metrics"""
+    registry = MetricsRegistry()
+    app.extensions["metrics"] = registry
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def start_timer():
+        if current_app.config.get("METRICS_ENABLED", False):
+            g.metrics_timer = {"start": time.perf_counter(), "db": 0.0, "render": 0.0, "render_start": []}
+
+    @app.after_request
+    def record_request(response):
+        timer = g.pop("metrics_timer", None)
+        if timer is not None:
+            registry.observe_request(
+                request.endpoint or "unmatched",
+                request.method,
+                response.status_code,
+                time.perf_counter() - timer["start"],
+                timer["db"],
+                timer["render"],
+                response.calculate_content_length(),
+            )
+        return response
+
+    @app.teardown_request
+    def record_failure(exc):
+        timer = g.pop("metrics_timer", None)
+        if timer is not None:  # after_request never ran: the view raised
+            registry.observe_request(
+                request.endpoint or "unmatched", request.method, 500,
+                time.perf_counter() - timer["start"], timer["db"], timer["render"], None,
+            )
+
+    def metrics_view():
+        if not current_app.config.get("METRICS_ENABLED", False):
+            return Response("metrics disabled\n", status=404, content_type="text/plain; charset=utf-8")
+        return Response(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+    return registry
@@ -0,0 +1,160 @@
+"""
+Schema upgrades for databases created by an older version of the models.
+
+db.create_all() only creates missing tables, so an existing database keeps old
+column types and never gets indexes added to existing tables. Each step below
+checks the live schema and brings it up to the current models, and does nothing
+on a database that create_all() just built. upgrade() runs them in order at
+startup.
+"""
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.types import DateTime
+
+from .dates import to_utc
+from .models import db, Assignment
+
+# Assignment as of the DATETIME due_date change. Frozen here, not taken from the
+# model, so later column additions get their own step.
+_ASSIGNMENT_DATETIME_DDL = """
+CREATE TABLE _assignment_new (
+    id INTEGER NOT NULL,
+    title VARCHAR(128) NOT NULL,
+    description TEXT,
+    due_date DATETIME NOT NULL,
+    assignment_type VARCHAR(32) NOT NULL,
+    course_id INTEGER,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(course_id) REFERENCES course (id)
+)
+"""
+_ASSIGNMENT_COLUMNS = ("id", "title", "description", "due_date", "assignment_type", "course_id", "updated_at")
+
+
+def add_updated_at(conn):
+    """updated_at change stamps for conditional GET, empty for existing rows"""
+    inspector = inspect(conn)
+    for table in ("course", "assignment", "submission", "announcement"):
+        if "updated_at" not in {column["name"] for column in inspector.get_columns(table)}:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME"))
+
+
+def due_date_to_datetime(conn):
+    """Assignment.due_date: VARCHAR "YYYY-MM-DD" strings -> DATETIME in UTC"""
+    columns = {column["name"]: column for column in inspect(conn).get_columns("assignment")}
+    if "due_date" not in columns or isinstance(columns["due_date"]["type"], DateTime):
+        return
+    old = conn.execute(text("SELECT id, due_date FROM assignment")).all()
+    if conn.dialect.name == "sqlite":
+        # SQLite cannot change a column type in place: copy into a new table and swap
+        # Columns the old table does not have yet (updated_at before its step ran) copy as NULL
+        select = ", ".join(name if name in columns else "NULL" for name in _ASSIGNMENT_COLUMNS)
+        conn.execute(text(_ASSIGNMENT_DATETIME_DDL))
+        conn.execute(text(f"INSERT INTO _assignment_new ({', '.join(_ASSIGNMENT_COLUMNS)}) "
+                          f"SELECT {select} FROM assignment"))
+        conn.execute(text("DROP TABLE assignment"))
+        conn.execute(text("ALTER TABLE _assignment_new RENAME TO assignment"))
+    else:
+        conn.execute(text("ALTER TABLE assignment ADD COLUMN due_at TIMESTAMP"))
+        conn.execute(text("ALTER TABLE assignment DROP COLUMN due_date"))
+        conn.execute(text("ALTER TABLE assignment RENAME COLUMN due_at TO due_date"))
+    if old:
+        table = Assignment.__table__
+        conn.execute(table.update().where(table.c.id == bindparam("row_id")).values(due_date=bindparam("due")),
+                     [{"row_id": row_id, "due": to_utc(due)} for row_id, due in old])
+
+
+def add_submission_attempts(conn):
+    """Submission.attempts: resubmission counter, 1 for existing rows"""
+    if "attempts" not in {column["name"] for column in inspect(conn).get_columns("submission")}:
+        conn.execute(text("ALTER TABLE submission ADD COLUMN attempts INTEGER NOT NULL DEFAULT 1"))
+
+
+def add_submission_versions(conn):
+    """Submission.latest_version_id, with one version backfilled per existing submission"""
+    if "latest_version_id" in {column["name"] for column in inspect(conn).get_columns("submission")}:
+        return
+    conn.execute(text("ALTER TABLE submission ADD COLUMN latest_version_id INTEGER REFERENCES submission_version (id)"))
+    conn.execute(text(
+        "INSERT INTO submission_version (submission_id, number, content, file_path, file_name, submitted_at) "
+        "SELECT id, 1, content, file_path, file_path, COALESCE(submitted_at, CURRENT_TIMESTAMP) FROM submission"
+    ))
+    conn.execute(text(
+        "UPDATE submission SET attempts = 1, latest_version_id = "
+        "(SELECT v.id FROM submission_version v WHERE v.submission_id = submission.id AND v.number = 1)"
+    ))
+
+
+def add_grading_leases(conn):
+    """Submission.claimed_by and lease_expires_at for the grading queue, unclaimed for existing rows"""
+    columns = {column["name"] for column in inspect(conn).get_columns("submission")}
+    if "claimed_by" not in columns:
+        conn.execute(text('ALTER TABLE submission ADD COLUMN claimed_by INTEGER REFERENCES "user" (id)'))
+    if "lease_expires_at" not in columns:
+        conn.execute(text("ALTER TABLE submission ADD COLUMN lease_expires_at DATETIME"))
+
+
+def add_autograde_harness(conn):
+    """Assignment.autograde_harness, empty (manual grading) for existing rows"""
+    if "autograde_harness" not in {column["name"] for column in inspect(conn).get_columns("assignment")}:
+        conn.execute(text("ALTER TABLE assignment ADD COLUMN autograde_harness TEXT"))
+
+
+def add_quiz_time_limit(conn):
+    """Assignment.time_limit_minutes, untimed for existing rows"""
+    if "time_limit_minutes" not in {column["name"] for column in inspect(conn).get_columns("assignment")}:
+        conn.execute(text("ALTER TABLE assignment ADD COLUMN time_limit_minutes INTEGER"))
+
+
+def add_extraction_claimed_at(conn):
+    """ExtractedText.claimed_at, so rows left running by a dead worker can be reclaimed"""
+    if "claimed_at" not in {column["name"] for column in inspect(conn).get_columns("extracted_text")}:
+        conn.execute(text("ALTER TABLE extracted_text ADD COLUMN claimed_at DATETIME"))
+
+
+# (table, constraint name, columns); duplicates keep their lowest id, the row .first() used to find
+_UNIQUE_KEYS = [
+    ("submission", "uq_submission_student_assignment", ("student_id", "assignment_id")),
+    ("enrollment", "uq_enrollment_student_course", ("student_id", "course_id")),
+    ("ta_assignment", "uq_ta_assignment_ta_course", ("ta_id", "course_id")),
+]
+
+
+def add_unique_keys(conn):
+    """One submission per student and assignment, one enrollment and TA assignment per course.
+
+    Duplicate rows left by the old check-then-insert are removed first, then a unique
+    index is created; SQLite cannot add a UNIQUE constraint to an existing table.
+    """
+    inspector = inspect(conn)
+    for table, name, columns in _UNIQUE_KEYS:
+        existing = [set(c["column_names"]) for c in inspector.get_unique_constraints(table)]
+        existing += [set(ix["column_names"]) for ix in inspector.get_indexes(table) if ix["unique"]]
+        if set(columns) in existing:
+            continue
+        column_list = ", ".join(columns)
+        conn.execute(text(f"DELETE FROM {table} WHERE id NOT IN "
+                          f"(SELECT MIN(id) FROM {table} GROUP BY {column_list})"))
+        conn.execute(text(f"CREATE UNIQUE INDEX {name} ON {table} ({column_list})"))
+        if table == "submission":
+            conn.execute(text("DELETE FROM submission_version WHERE submission_id NOT IN (SELECT id FROM submission)"))
+            conn.execute(text("DROP INDEX IF EXISTS ix_submission_student_assignment"))  # covered by the unique key
+
+
+def create_missing_indexes(conn):
+    """Indexes declared on tables that already existed when they were added"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+STEPS = [add_updated_at, due_date_to_datetime, add_submission_attempts, add_submission_versions, add_unique_keys,
+         add_grading_leases, add_autograde_harness, add_quiz_time_limit, add_extraction_claimed_at,
+         create_missing_indexes]
+
+
+def upgrade():
+    """Run every step in one transaction; call inside an app context after create_all"""
+    with db.engine.begin() as conn:
+        for step in STEPS:
+            step(conn)
@@ -1,11 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from itsdangerous import URLSafeTimedSerializer
+from itsdangerous import BadSignature, URLSafeSerializer, URLSafeTimedSerializer
 from flask import current_app
 from datetime import datetime
+from .dates import UTCDateTime
+from .replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})  # GET requests may read from a replica
 
 class User(db.Model, UserMixin):
     # information
@@ -18,7 +20,8 @@ class User(db.Model, UserMixin):
     # relationships
     courses_taught = db.relationship('Course', back_populates='instructor', lazy=True)
     courses_enrolled = db.relationship('Enrollment', back_populates='student', lazy=True)
-    submissions = db.relationship('Submission', back_populates='student', lazy=True)
+    submissions = db.relationship('Submission', back_populates='student', lazy=True,
+                                  foreign_keys='Submission.student_id')
     ta_assignments = db.relationship('TAAssignment', back_populates='ta', lazy=True)
 
     def set_password(self, password):
@@ -45,6 +48,20 @@ class User(db.Model, UserMixin):
             return None
         return User.query.get(user_id)
 
+    def get_calendar_token(self):
+        """Token for this user's calendar feed URL (calendar apps cannot log in, and it does not expire)"""
+        s = URLSafeSerializer(current_app.config['SECRET_KEY'], salt='calendar-feed')
+        return s.dumps({'user_id': self.id})
+
+    @staticmethod
+    def calendar_token_user_id(token):
+        """User id a calendar feed token was issued for, or None; does not touch the database"""
+        s = URLSafeSerializer(current_app.config['SECRET_KEY'], salt='calendar-feed')
+        try:
+            return int(s.loads(token)['user_id'])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            return None
+
     def __repr__(self):
         return f"<User {self.username}>"
 
@@ -56,6 +73,7 @@ class Course(db.Model):
     code = db.Column(db.String(32), unique=True, nullable=False)
     teacher = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     image_url = db.Column(db.String(255), nullable=True)  # optional course image
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # relationships
     instructor = db.relationship('User', back_populates='courses_taught')
@@ -66,9 +84,13 @@ class Course(db.Model):
         return f"<Course {self.title}>"
 
 class Enrollment(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'course_id', name='uq_enrollment_student_course'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
 
     # relationships
     student = db.relationship('User', back_populates='courses_enrolled')
@@ -78,39 +100,110 @@ class Enrollment(db.Model):
         return f"<Enrollment StudentID: {self.student_id}, CourseID: {self.course_id}>"
 
 class Assignment(db.Model):
+    __table_args__ = (
+        db.Index('ix_assignment_course_due', 'course_id', 'due_date'),  # per-course deadline ranges and ordering
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(128), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    due_date = db.Column(db.String(64), nullable=False)
+    due_date = db.Column(UTCDateTime, nullable=False)  # stored as UTC, see app/dates.py
     assignment_type = db.Column(db.String(32), nullable=False, default='homework')
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Python test script run against each submission (see app/autograder.py); None for manual grading
+    autograde_harness = db.deferred(db.Column(db.Text, nullable=True))
+    time_limit_minutes = db.Column(db.Integer, nullable=True)  # quiz attempts only; None is untimed (see app/quizzes.py)
 
     # relationships
     course = db.relationship('Course', back_populates='assignments')
     submissions = db.relationship('Submission', back_populates='assignment', lazy=True)
 
+    @staticmethod
+    def submission_counts(assignment_ids):
+        """{assignment_id: {"submitted": n, "graded": m, "late": k}} for many assignments in one GROUP BY query"""
+        counts = {assignment_id: {"submitted": 0, "graded": 0, "late": 0} for assignment_id in assignment_ids}
+        if assignment_ids:
+            late = db.func.count(db.case((Submission.submitted_at > Assignment.due_date, 1)))
+            rows = (db.session.query(Submission.assignment_id, db.func.count(Submission.id),
+                                     db.func.count(Submission.grade), late)
+                    .join(Assignment, Assignment.id == Submission.assignment_id)
+                    .filter(Submission.assignment_id.in_(assignment_ids))
+                    .group_by(Submission.assignment_id))
+            for assignment_id, submitted, graded, late_count in rows:
+                counts[assignment_id] = {"submitted": submitted, "graded": graded, "late": late_count}
+        return counts
+
     def __repr__(self):
         return f"<Assignment {self.title}>"
     
 class Submission(db.Model):
+    __table_args__ = (
+        # one submission per student and assignment; also answers "has this student submitted?"
+        db.UniqueConstraint('student_id', 'assignment_id', name='uq_submission_student_assignment'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False, index=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.Text, nullable=True)  # Optional text content
     file_path = db.Column(db.String(255), nullable=True)  # Path to uploaded file
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # 1 + number of resubmissions
     grade = db.Column(db.Float, nullable=True)
     feedback = db.Column(db.Text, nullable=True)  # Teacher feedback
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # content, file_path and submitted_at mirror this version (see app/versioning.py)
+    latest_version_id = db.Column(db.Integer, db.ForeignKey('submission_version.id', use_alter=True,
+                                                            name='fk_submission_latest_version'), nullable=True)
+    # grading queue lease (see app/grading.py); active while lease_expires_at is in the future
+    claimed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
 
     # relationships
     assignment = db.relationship('Assignment', back_populates='submissions')
-    student = db.relationship('User', back_populates='submissions')
+    student = db.relationship('User', back_populates='submissions', foreign_keys=[student_id])
+    latest_version = db.relationship('SubmissionVersion', foreign_keys=[latest_version_id], post_update=True)
 
     def __repr__(self):
         return f"<Submission AssignmentID: {self.assignment_id}, StudentID: {self.student_id}>"
 
+class SubmissionVersion(db.Model):
+    """One hand-in of a submission. Rows are only ever added, and removed by retention."""
+    __table_args__ = (
+        db.UniqueConstraint('submission_id', 'number', name='uq_submission_version_number'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=False)
+    number = db.Column(db.Integer, nullable=False)  # 1 for the first hand-in
+    content = db.Column(db.Text, nullable=True)
+    file_path = db.Column(db.String(255), nullable=True, index=True)  # blob path under UPLOAD_FOLDER
+    file_name = db.Column(db.String(255), nullable=True)  # name the student uploaded
+    file_sha256 = db.Column(db.String(64), nullable=True)
+    file_size = db.Column(db.Integer, nullable=True)
+    submitted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # relationships
+    submission = db.relationship('Submission', foreign_keys=[submission_id], backref='versions')
+
+    def __repr__(self):
+        return f"<SubmissionVersion SubmissionID: {self.submission_id}, Number: {self.number}>"
+
+# Lateness is decided in SQL, so submissions can be filtered and counted by it:
+# Submission.query.filter(Submission.is_late) or undefer(Submission.is_late)
+Submission.is_late = db.column_property(
+    db.select(Submission.submitted_at > Assignment.due_date).where(Assignment.id == Submission.assignment_id)
+    .correlate_except(Assignment).scalar_subquery(),
+    deferred=True,
+)
+
 class TAAssignment(db.Model):
     """Tracks which TAs are assigned to which courses"""
+    __table_args__ = (
+        db.UniqueConstraint('ta_id', 'course_id', name='uq_ta_assignment_ta_course'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     ta_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
@@ -124,6 +217,10 @@ class TAAssignment(db.Model):
 
 class Message(db.Model):
     """One-on-one messages between users"""
+    __table_args__ = (
+        db.Index('ix_message_recipient_read', 'recipient_id', 'read'),  # inbox + unread badge lookups
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -136,6 +233,30 @@ class Message(db.Model):
     sender = db.relationship('User', foreign_keys=[sender_id], backref='messages_sent')
     recipient = db.relationship('User', foreign_keys=[recipient_id], backref='messages_received')
     
+    @staticmethod
+    def broadcast(sender_id, recipient_ids, subject, body):
+        """Queue one copy of a message per recipient as a single bulk INSERT.
+
+        Every row shares the same timestamp and starts unread, so each recipient
+        keeps their own read state. The caller is responsible for committing.
+        Returns the number of messages queued.
+        """
+        sent_at = datetime.utcnow()
+        rows = [
+            {
+                "sender_id": sender_id,
+                "recipient_id": recipient_id,
+                "subject": subject,
+                "body": body,
+                "timestamp": sent_at,
+                "read": False,
+            }
+            for recipient_id in recipient_ids
+        ]
+        if rows:
+            db.session.execute(db.insert(Message), rows)
+        return len(rows)
+
     def __repr__(self):
         return f"<Message from {self.sender_id} to {self.recipient_id}>"
 
@@ -147,10 +268,135 @@ class Announcement(db.Model):
     title = db.Column(db.String(128), nullable=False)
     content = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # relationships
     course = db.relationship('Course', backref='announcements')
     author = db.relationship('User', backref='announcements_posted')
     
     def __repr__(self):
-        return f"<Announcement {self.title} in Course {self.course_id}>"
\ No newline at end of file
+        return f"<Announcement {self.title} in Course {self.course_id}>"
+
+
+class IdempotencyKey(db.Model):
+    """Form posts already processed, so a repeated POST is a no-op (see app/idempotency.py)"""
+    key = db.Column(db.String(64), primary_key=True)  # sha256 of user, endpoint, form key and target
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.key[:12]} of User {self.user_id}>"
+
+class AutogradeJob(db.Model):
+    """One autograder run of a submission, queued until a worker picks it up (see app/autograder.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=False, index=True)
+    status = db.Column(db.String(16), nullable=False, default='queued', index=True)  # queued, running, done, error
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    score = db.Column(db.Float, nullable=True)
+    output = db.Column(db.Text, nullable=True)  # harness output, truncated to AUTOGRADER_OUTPUT_BYTES
+
+    # relationships
+    submission = db.relationship('Submission')
+
+    def __repr__(self):
+        return f"<AutogradeJob {self.id} SubmissionID: {self.submission_id} {self.status}>"
+
+class SubmissionSignature(db.Model):
+    """MinHash signature of a submission's latest text (see app/similarity.py)"""
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False, index=True)
+    signature = db.Column(db.LargeBinary, nullable=False)  # SIMILARITY_PERMUTATIONS little-endian uint32s
+    shingle_count = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SubmissionSignature SubmissionID: {self.submission_id}>"
+
+class SimilarityBucket(db.Model):
+    """One LSH band of a signature: submissions sharing (assignment, band, bucket) are candidate pairs"""
+    __table_args__ = (
+        db.Index('ix_similarity_bucket_lookup', 'assignment_id', 'band', 'bucket'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    band = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)  # 64-bit hash of the band's rows
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<SimilarityBucket AssignmentID: {self.assignment_id} Band: {self.band}>"
+
+class ExtractedText(db.Model):
+    """Text of an uploaded file, extracted once per stored blob by a background worker (see app/extraction.py)"""
+    file_sha256 = db.Column(db.String(64), primary_key=True)  # the blob, shared by identical uploads
+    file_path = db.Column(db.String(255), nullable=False)  # blob path under UPLOAD_FOLDER
+    file_name = db.Column(db.String(255), nullable=False)  # name first uploaded; its extension picks the format
+    status = db.Column(db.String(16), nullable=False, default='pending', index=True)  # pending, running, done, error
+    text = db.deferred(db.Column(db.Text, nullable=True))  # at most EXTRACT_MAX_CHARS characters
+    chars = db.Column(db.Integer, nullable=True)
+    truncated = db.Column(db.Boolean, nullable=False, default=False)
+    error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime, nullable=True)  # when a worker set it running
+    extracted_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ExtractedText {self.file_sha256[:12]} {self.status}>"
+
+class QuizQuestion(db.Model):
+    """One question of a quiz; its position is its column in every attempt's response array (see app/quizzes.py)"""
+    __table_args__ = (
+        db.UniqueConstraint('assignment_id', 'position', name='uq_quiz_question_position'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # 0-based and never reused, so stored responses stay aligned
+    kind = db.Column(db.String(16), nullable=False, default='choice')  # choice or numeric
+    prompt = db.Column(db.Text, nullable=False)
+    choices = db.Column(db.Text, nullable=True)  # one per line, multiple choice only
+    answer = db.Column(db.Float, nullable=False)  # index of the correct choice, or the numeric answer
+    tolerance = db.Column(db.Float, nullable=False, default=0.0)  # accepted absolute error of a numeric answer
+    points = db.Column(db.Float, nullable=False, default=1.0)
+
+    def choice_list(self):
+        return (self.choices or "").splitlines()
+
+    def __repr__(self):
+        return f"<QuizQuestion {self.position} of AssignmentID: {self.assignment_id}>"
+
+class QuizAttempt(db.Model):
+    """A student's single timed attempt at a quiz; responses are packed float64s, NaN for a blank answer"""
+    __table_args__ = (
+        db.UniqueConstraint('assignment_id', 'student_id', name='uq_quiz_attempt_student'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), nullable=True)  # set when submitted
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True)  # started_at + the time limit; None if untimed
+    submitted_at = db.Column(db.DateTime, nullable=True)
+    responses = db.Column(db.LargeBinary, nullable=True)  # one little-endian float64 per question position
+    score = db.Column(db.Float, nullable=True)  # 0-100, mirrored to Submission.grade
+
+    def __repr__(self):
+        return f"<QuizAttempt AssignmentID: {self.assignment_id}, StudentID: {self.student_id}>"
+
+
+class GradeCategory(db.Model):
+    """A course's weight and drop-lowest rule for one assignment_type (see app/gradebook.py)"""
+    __table_args__ = (
+        db.UniqueConstraint('course_id', 'assignment_type', name='uq_grade_category_course_type'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+    assignment_type = db.Column(db.String(32), nullable=False)
+    weight = db.Column(db.Float, nullable=False)  # relative; renormalized over the categories a student has grades in
+    drop_lowest = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<GradeCategory CourseID: {self.course_id}, Type: {self.assignment_type}>"
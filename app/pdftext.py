@@ -0,0 +1,174 @@
+"""
+Minimal pure-Python PDF text extraction (standard library only).
+
+Finds each content stream, inflates FlateDecode data and reads its text
+operators: Tj, TJ, ' and ". Line breaks come from T*, Td/TD with a vertical
+move, and Tm. Large negative TJ kerning becomes a space. This covers PDFs whose
+fonts use a single-byte encoding, which is what word processors and LaTeX
+usually write for Latin text. Strings of CID-keyed (Type0) fonts are glyph ids,
+not characters. Decoding them needs the fonts' ToUnicode maps, which this
+module does not read, so strings that look like glyph ids (mostly control
+bytes) are dropped. Images, fonts and other non-content streams are skipped.
+"""
+import re
+import zlib
+
+STREAM = re.compile(rb"stream\r?\n")
+FILTER = re.compile(rb"/Filter\s*(\[[^\]]*\]|/\w+)")
+SKIP = (b"/Image", b"/XObject", b"/Length1", b"/FontFile", b"/XRef", b"/ObjStm", b"/EmbeddedFile", b"/Metadata")
+MAX_STREAM_BYTES = 16 * 1024 * 1024  # per inflated stream, against compression bombs
+DELIMITERS = b"()<>[]{}/%"
+WHITESPACE = b" \t\r\n\f\0"
+ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f"}
+
+
+def content_streams(data):
+    """Inflated bytes of every stream that can hold page text"""
+    position = 0
+    while True:
+        match = STREAM.search(data, position)
+        if match is None:
+            return
+        start = match.end()
+        end = data.find(b"endstream", start)
+        if end < 0:
+            return
+        position = end + len(b"endstream")
+        header = data[max(0, match.start() - 2048):match.start()]
+        header = header[header.rfind(b"obj") + 3:] if b"obj" in header else header
+        if any(marker in header for marker in SKIP):
+            continue
+        raw = data[start:end].rstrip(b"\r\n")
+        filters = FILTER.search(header)
+        if filters:
+            if re.findall(rb"/(\w+)", filters.group(1)) != [b"FlateDecode"]:
+                continue  # images and chained filters
+            try:
+                raw = zlib.decompressobj().decompress(raw, MAX_STREAM_BYTES)
+            except zlib.error:
+                continue
+        if b"BT" in raw:
+            yield raw
+
+
+def _literal(data, i):
+    """Decode the (string) starting at data[i]; returns (bytes, index after it)"""
+    out, depth, i = bytearray(), 1, i + 1
+    while i < len(data):
+        c = data[i]
+        if c == 0x5C:  # backslash
+            i += 1
+            if i >= len(data):
+                break
+            c = data[i]
+            if c in ESCAPES:
+                out += ESCAPES[c]
+            elif 0x30 <= c <= 0x37:
+                digits = data[i:i + 3]
+                n = 1
+                while n < len(digits) and 0x30 <= digits[n] <= 0x37:
+                    n += 1
+                out.append(int(digits[:n], 8) & 0xFF)
+                i += n - 1
+            elif c == 0x0D:  # line continuation
+                if data[i + 1:i + 2] == b"\n":
+                    i += 1
+            elif c != 0x0A:
+                out.append(c)
+        elif c == 0x28:
+            depth += 1
+            out.append(c)
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                return bytes(out), i + 1
+            out.append(c)
+        else:
+            out.append(c)
+        i += 1
+    return bytes(out), i
+
+
+def tokens(data):
+    """Operands and operators of a content stream: bytes strings, floats, "[", "]", names and operators as str"""
+    i, n = 0, len(data)
+    while i < n:
+        c = data[i]
+        if c in WHITESPACE:
+            i += 1
+        elif c == 0x25:  # comment
+            while i < n and data[i] not in b"\r\n":
+                i += 1
+        elif c == 0x28:
+            value, i = _literal(data, i)
+            yield value
+        elif c == 0x3C and data[i + 1:i + 2] != b"<":
+            end = data.find(b">", i)
+            end = n if end < 0 else end
+            digits = re.sub(rb"[^0-9A-Fa-f]", b"", data[i + 1:end])
+            yield bytes.fromhex((digits + b"0" * (len(digits) % 2)).decode())
+            i = end + 1
+        elif c in b"[]":
+            yield chr(c)
+            i += 1
+        elif c in b"<>{}":
+            i += 2 if data[i:i + 2] in (b"<<", b">>") else 1
+        else:
+            start = i
+            i += 1
+            while i < n and data[i] not in WHITESPACE and data[i] not in DELIMITERS:
+                i += 1
+            word = data[start:i].decode("latin-1")
+            try:
+                yield float(word)
+            except ValueError:
+                yield word
+
+
+def _decode(string):
+    if string.startswith(b"\xfe\xff"):
+        return string[2:].decode("utf-16-be", "replace")
+    if sum(byte < 0x20 for byte in string) * 3 > len(string):
+        return ""  # two-byte glyph ids of a CID font, not characters
+    return string.decode("latin-1")
+
+
+def stream_text(data):
+    """Text shown by one content stream"""
+    out, operands, array = [], [], None
+    for token in tokens(data):
+        if token == "[":
+            array = []
+        elif token == "]":
+            operands.append(array or [])
+            array = None
+        elif array is not None:
+            array.append(token)
+        elif isinstance(token, (bytes, float)) or token.startswith("/"):
+            operands.append(token)
+        else:
+            if token in ("T*", "Tm", "'", '"'):
+                out.append("\n")
+            elif token in ("Td", "TD") and len(operands) >= 2 and operands[-1] != 0:
+                out.append("\n")
+            elif token in ("Td", "TD"):
+                out.append(" ")
+            if token in ("Tj", "'", '"') and operands and isinstance(operands[-1], bytes):
+                out.append(_decode(operands[-1]))
+            elif token == "TJ" and operands and isinstance(operands[-1], list):
+                for item in operands[-1]:
+                    if isinstance(item, bytes):
+                        out.append(_decode(item))
+                    elif isinstance(item, float) and item < -200:
+                        out.append(" ")
+            elif token == "ET":
+                out.append("\n")
+            operands = []
+    return "".join(out)
+
+
+def extract(data):
+    """Text of a PDF file's bytes, one line per text line, pages in file order"""
+    text = "".join(stream_text(stream) for stream in content_streams(data))
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
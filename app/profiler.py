@@ -0,0 +1,124 @@
+"""
+Opt-in per-request SQL profiler and N+1 detector.
+
+When SQL_PROFILER_ENABLED is set, every statement a request sends through the
+engine is timed and grouped by statement shape. Results are reported in
+X-SQL-* response headers, a JSON log line and (for HTML pages) a small panel
+rendered into base.html. A shape executed more than SQL_PROFILER_N_PLUS_ONE
+times with different parameters is flagged as a likely N+1 pattern.
+"""
+import json
+import logging
+import re
+import time
+
+from flask import current_app, g, has_app_context, render_template, request
+from sqlalchemy import event
+
+from .models import db
+
+logger = logging.getLogger("app.sql_profile")
+
+PANEL_MARKER = "<!--sql-profile-panel-->"
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryProfile:
+    """Statements recorded during a single request"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.shapes = {}  # statement -> {"count", "time", "params"}
+
+    def record(self, statement, parameters, duration):
+        self.count += 1
+        self.total_time += duration
+        shape = _WHITESPACE.sub(" ", statement).strip()
+        entry = self.shapes.setdefault(shape, {"count": 0, "time": 0.0, "params": set()})
+        entry["count"] += 1
+        entry["time"] += duration
+        entry["params"].add(repr(parameters))
+
+    def duplicates(self):
+        """Shapes executed more than once, most frequent first"""
+        repeated = [(shape, e) for shape, e in self.shapes.items() if e["count"] > 1]
+        return sorted(repeated, key=lambda item: item[1]["count"], reverse=True)
+
+    def n_plus_one(self, threshold):
+        """Shapes executed more than threshold times with differing parameters"""
+        return [(shape, e) for shape, e in self.duplicates()
+                if e["count"] > threshold and len(e["params"]) > 1]
+
+    def summary(self, threshold):
+        return {
+            "queries": self.count,
+            "time_ms": round(self.total_time * 1000, 2),
+            "duplicates": [{"statement": shape, "count": e["count"]} for shape, e in self.duplicates()],
+            "n_plus_one": [{"statement": shape, "count": e["count"]} for shape, e in self.n_plus_one(threshold)],
+        }
+
+
+def current_profile():
+    if has_app_context():
+        return g.get("sql_profile")
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile() is not None:
+        conn.info.setdefault("sql_profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    starts = conn.info.get("sql_profile_start")
+    if profile is not None and starts:
+        profile.record(statement, parameters, time.perf_counter() - starts.pop())
+
+
+def init_app(app):
+    """Hook the engine and request lifecycle; does nothing per request unless enabled"""
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.context_processor
+    def inject_profiler_flag():
+        return {"sql_profiler_enabled": current_app.config.get("SQL_PROFILER_ENABLED", False)}
+
+    @app.before_request
+    def start_profile():
+        if current_app.config.get("SQL_PROFILER_ENABLED"):
+            g.sql_profile = QueryProfile()
+
+    @app.after_request
+    def report_profile(response):
+        profile = g.pop("sql_profile", None)
+        if profile is None:
+            return response
+        threshold = current_app.config.get("SQL_PROFILER_N_PLUS_ONE", 5)
+        summary = profile.summary(threshold)
+        g.sql_profile_summary = summary  # kept for request_finished subscribers (tests)
+
+        response.headers["X-SQL-Query-Count"] = str(summary["queries"])
+        response.headers["X-SQL-Query-Time-Ms"] = str(summary["time_ms"])
+        response.headers["X-SQL-N-Plus-One"] = str(len(summary["n_plus_one"]))
+
+        log_line = json.dumps({"endpoint": request.endpoint, "status": response.status_code, **summary})
+        if summary["n_plus_one"]:
+            logger.warning(log_line)
+        else:
+            logger.info(log_line)
+
+        if response.mimetype == "text/html" and not response.direct_passthrough:
+            body = response.get_data(as_text=True)
+            if PANEL_MARKER in body:
+                panel = render_template("sql_profile_panel.html", profile=summary, threshold=threshold)
+                response.set_data(body.replace(PANEL_MARKER, panel))
+        return response
+
+    @app.teardown_request
+    def discard_profile(exc):
+        g.pop("sql_profile", None)  # after_request is skipped when the view raised
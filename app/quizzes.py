@@ -0,0 +1,195 @@
+"""
+Quizzes: question banks, timed attempts and vectorized scoring.
+
+A quiz or exam assignment owns QuizQuestions. Each question has a fixed
+`position`, which is never reused, so a deleted question leaves a gap rather
+than shifting the columns of attempts already stored. A multiple-choice answer
+is the index of the correct choice. A numeric answer is a value, with an
+absolute tolerance.
+
+An attempt stores its responses as one packed little-endian float64 per
+position, with NaN for a blank answer. Scoring a whole class is therefore one
+pass over a matrix:
+
+    responses  (attempts x positions)   from the attempts' BLOBs
+    answer, tolerance, points  (positions)   from the key, in one query
+    correct = |responses - answer| <= tolerance   (NaN compares False)
+    score   = 100 * correct @ points / points.sum()
+
+The scores are then written to QuizAttempt.score and Submission.grade with two
+executemany UPDATEs. Correcting the key re-scores every submitted attempt the
+same way (rescore()). Both return the cache scopes the new grades invalidate,
+for the caller to bump once it has committed.
+
+An attempt is timed when the assignment has time_limit_minutes. Answers posted
+after expires_at plus QUIZ_GRACE_SECONDS are not accepted, and the attempt is
+submitted blank.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from . import versioning
+from .cache import grades_scope, user_scope
+from .database import insert
+from .models import db, Assignment, QuizAttempt, QuizQuestion, Submission
+
+RESPONSE_DTYPE = np.dtype("<f8")
+_BLANK = np.array([np.nan], dtype=RESPONSE_DTYPE).tobytes()
+
+
+def questions(assignment_id):
+    """The quiz's questions in position order"""
+    return QuizQuestion.query.filter_by(assignment_id=assignment_id).order_by(QuizQuestion.position).all()
+
+
+def next_position(assignment_id):
+    last = db.session.execute(db.select(db.func.max(QuizQuestion.position))
+                              .where(QuizQuestion.assignment_id == assignment_id)).scalar()
+    return 0 if last is None else last + 1
+
+
+def answer_key(assignment_id):
+    """(answer, tolerance, points) arrays indexed by position; unused positions score nothing"""
+    rows = db.session.execute(db.select(QuizQuestion.position, QuizQuestion.answer, QuizQuestion.tolerance,
+                                        QuizQuestion.points)
+                              .where(QuizQuestion.assignment_id == assignment_id)).all()
+    width = max((row.position for row in rows), default=-1) + 1
+    answer = np.full(width, np.nan)
+    tolerance = np.zeros(width)
+    points = np.zeros(width)
+    if rows:
+        positions = np.array([row.position for row in rows])
+        answer[positions] = [row.answer for row in rows]
+        tolerance[positions] = [row.tolerance for row in rows]
+        points[positions] = [row.points for row in rows]
+    return answer, tolerance, points
+
+
+def pack_responses(values, width):
+    """Packed float64 responses: values maps position to a float; anything missing is NaN"""
+    responses = np.full(width, np.nan, dtype=RESPONSE_DTYPE)
+    for position, value in values.items():
+        if 0 <= position < width:
+            responses[position] = value
+    return responses.tobytes()
+
+
+def unpack_responses(blob):
+    return np.frombuffer(blob or b"", dtype=RESPONSE_DTYPE)
+
+
+def response_matrix(blobs, width):
+    """Stack attempts' packed responses into an (attempts x width) matrix, padding short ones with NaN"""
+    size = width * RESPONSE_DTYPE.itemsize
+    rows = [(blob or b"")[:size] for blob in blobs]
+    data = b"".join(row + _BLANK * ((size - len(row)) // RESPONSE_DTYPE.itemsize) for row in rows)
+    return np.frombuffer(data, dtype=RESPONSE_DTYPE).reshape(len(rows), width)
+
+
+def score_matrix(responses, answer, tolerance, points):
+    """0-100 score of every row of responses, in one vectorized pass"""
+    total = points.sum()
+    if total <= 0:
+        return np.zeros(len(responses))
+    with np.errstate(invalid="ignore"):
+        correct = np.abs(responses - answer) <= tolerance + 1e-9 * np.abs(answer)
+    return 100.0 * (correct @ points) / total
+
+
+def _write_scores(course_id, attempt_rows, scores):
+    """Bulk-write scores to attempts and their submissions; attempt_rows are (attempt id, submission id, student id).
+
+    Returns the cache scopes to bump after the commit.
+    """
+    if not attempt_rows:
+        return set()
+    scores = np.round(scores, 2).tolist()
+    db.session.execute(db.update(QuizAttempt), [
+        {"id": attempt_id, "score": score} for (attempt_id, _, _), score in zip(attempt_rows, scores)])
+    db.session.execute(db.update(Submission), [
+        {"id": submission_id, "grade": score}
+        for (_, submission_id, _), score in zip(attempt_rows, scores) if submission_id is not None])
+    return {grades_scope(course_id)} | {user_scope(student_id) for _, _, student_id in attempt_rows}
+
+
+def rescore(assignment_id, attempt_ids=None):
+    """Score the quiz's submitted attempts (or only attempt_ids) and write the grades.
+
+    Returns (count, cache scopes to bump after the commit). Flushed, not committed.
+    """
+    stmt = (db.select(QuizAttempt.id, QuizAttempt.submission_id, QuizAttempt.student_id, QuizAttempt.responses)
+            .where(QuizAttempt.assignment_id == assignment_id, QuizAttempt.submitted_at.isnot(None))
+            .order_by(QuizAttempt.id))
+    if attempt_ids is not None:
+        stmt = stmt.where(QuizAttempt.id.in_(attempt_ids))
+    rows = db.session.execute(stmt).all()
+    if not rows:
+        return 0, set()
+    answer, tolerance, points = answer_key(assignment_id)
+    scores = score_matrix(response_matrix([row.responses for row in rows], len(answer)), answer, tolerance, points)
+    course_id = db.session.execute(db.select(Assignment.course_id).where(Assignment.id == assignment_id)).scalar()
+    scopes = _write_scores(course_id, [(row.id, row.submission_id, row.student_id) for row in rows], scores)
+    return len(rows), scopes
+
+
+def start(assignment, student_id, now=None):
+    """The student's attempt, created on first call (INSERT ... ON CONFLICT DO NOTHING); flushed, not committed"""
+    now = now or datetime.utcnow()
+    expires_at = now + timedelta(minutes=assignment.time_limit_minutes) if assignment.time_limit_minutes else None
+    db.session.execute(insert(QuizAttempt).values(assignment_id=assignment.id, student_id=student_id,
+                                                  started_at=now, expires_at=expires_at)
+                       .on_conflict_do_nothing(index_elements=["assignment_id", "student_id"]))
+    return QuizAttempt.query.filter_by(assignment_id=assignment.id, student_id=student_id).one()
+
+
+def attempt_for(assignment_id, student_id):
+    return QuizAttempt.query.filter_by(assignment_id=assignment_id, student_id=student_id).first()
+
+
+def in_time(attempt, now=None):
+    """Whether answers posted now still count"""
+    if attempt.expires_at is None:
+        return True
+    grace = timedelta(seconds=current_app.config.get("QUIZ_GRACE_SECONDS", 30))
+    return (now or datetime.utcnow()) <= attempt.expires_at + grace
+
+
+def parse_answers(quiz_questions, form):
+    """{position: value} from posted fields q<position>: a choice number (1-based) or a number"""
+    values = {}
+    for question in quiz_questions:
+        raw = (form.get(f"q{question.position}") or "").strip()
+        try:
+            value = float(raw)
+        except ValueError:
+            continue
+        values[question.position] = value - 1 if question.kind == "choice" else value
+    return values
+
+
+def submit(attempt, values, now=None):
+    """Finish an attempt: store responses (blank if out of time), record the submission, score it.
+
+    Returns the cache scopes to bump after the commit, or None if the attempt had already been
+    submitted. Flushed, not committed.
+    """
+    now = now or datetime.utcnow()
+    width = next_position(attempt.assignment_id)
+    on_time = in_time(attempt, now)
+    blob = pack_responses(values if on_time else {}, width)
+    finished = db.session.execute(
+        db.update(QuizAttempt)
+        .where(QuizAttempt.id == attempt.id, QuizAttempt.submitted_at.is_(None))
+        .values(submitted_at=now, responses=blob)
+        .execution_options(synchronize_session=False)).rowcount
+    if not finished:
+        return None
+    answered = int(np.count_nonzero(~np.isnan(unpack_responses(blob))))
+    note = f"Quiz attempt: {answered} answered" + ("" if on_time else " (time limit exceeded, answers not accepted)")
+    version = versioning.submit(attempt.assignment_id, attempt.student_id, note)
+    db.session.execute(db.update(QuizAttempt).where(QuizAttempt.id == attempt.id)
+                       .values(submission_id=version.submission_id)
+                       .execution_options(synchronize_session=False))
+    return rescore(attempt.assignment_id, [attempt.id])[1]
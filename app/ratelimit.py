@@ -0,0 +1,189 @@
+"""
+Token-bucket rate limiting for login, registration, password reset and messaging.
+
+RATELIMITS maps an endpoint to rules. Each rule keys a bucket by the client IP
+("ip"), the logged-in user ("user") or a posted form field ("form:username").
+A bucket holds up to `burst` tokens (at least 1) and refills at `per_minute`
+tokens a minute (more than 0; init_app() refuses other rules). Every POST to
+the endpoint takes one token from each of its buckets. A request that finds a
+bucket empty is answered with 429 and a Retry-After header giving the seconds
+until a token is back. GET requests are never limited, so the forms still
+render.
+
+A bucket is two numbers: its tokens and the time it was last refilled. A check
+refills from the elapsed time, then takes a token. That is constant work: a
+dictionary lookup in MemoryBuckets (one per process), or one primary-key
+INSERT ... ON CONFLICT DO UPDATE in SQLiteBuckets, a file shared by every
+process on the host (RATELIMIT_STORAGE = "sqlite"). Keying by username as well
+as IP means a credential-stuffing run spread over many addresses still gets
+one account only burst attempts, and a single address gets only its own
+budget across accounts.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import click
+from flask import Response, current_app, request
+from flask_login import current_user
+
+
+class MemoryBuckets:
+    """Buckets in a dict, with LRU eviction beyond max_entries (an evicted bucket starts full again)"""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, burst, rate, now=None):
+        """(allowed, tokens left) after taking one token; rate is tokens per second"""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def prune(self, idle_seconds, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [key for key, (_, updated) in self._buckets.items() if updated < now - idle_seconds]
+            for key in idle:
+                del self._buckets[key]
+        return len(idle)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBuckets:
+    """Buckets in a SQLite file shared by every process pointing at it; one upsert per check"""
+
+    # The SET expressions all read the row's old values, so refill, take and the
+    # allowed flag are computed from the same state in one atomic statement.
+    TAKE = (
+        "INSERT INTO rate_bucket (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1) "
+        "ON CONFLICT(key) DO UPDATE SET "
+        "tokens = MIN(:burst, tokens + MAX(0, :now - updated) * :rate)"
+        " - (MIN(:burst, tokens + MAX(0, :now - updated) * :rate) >= 1), "
+        "allowed = MIN(:burst, tokens + MAX(0, :now - updated) * :rate) >= 1, "
+        "updated = :now "
+        "RETURNING allowed, tokens"
+    )
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_bucket ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_bucket_updated ON rate_bucket (updated)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def take(self, key, burst, rate, now=None):
+        """(allowed, tokens left) after taking one token; rate is tokens per second"""
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            allowed, tokens = conn.execute(self.TAKE, {"key": key, "burst": burst, "rate": rate,
+                                                       "now": now}).fetchone()
+        return bool(allowed), tokens
+
+    def prune(self, idle_seconds, now=None):
+        """Delete buckets untouched for idle_seconds; long enough idle they are full, the same as absent"""
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM rate_bucket WHERE updated < ?", (now - idle_seconds,)).rowcount
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM rate_bucket")
+
+
+def get_buckets():
+    return current_app.extensions["rate_buckets"]
+
+
+def _subject(by):
+    """The value a rule keys its bucket on, or None when the rule does not apply to this request"""
+    if by == "ip":
+        return request.remote_addr or "unknown"
+    if by == "user":
+        return str(current_user.id) if current_user.is_authenticated else None
+    if by.startswith("form:"):
+        value = (request.form.get(by[5:]) or "").strip().lower()
+        return value[:256] or None
+    raise ValueError(f"Unknown rate limit key: {by!r}")
+
+
+def validate(limits):
+    """Raise ValueError for a rule that could never refill or never allow a request"""
+    for endpoint, rules in limits.items():
+        for rule in rules:
+            if not rule.get("per_minute", 0) > 0 or not rule.get("burst", 0) >= 1:
+                raise ValueError(f"Rate limit for {endpoint} needs per_minute > 0 and burst >= 1: {rule!r}")
+
+
+def check(endpoint, rules, now=None):
+    """Take a token from each of the endpoint's buckets; returns the seconds to wait, or 0 if allowed"""
+    buckets = get_buckets()
+    wait = 0
+    for rule in rules:
+        subject = _subject(rule["by"])
+        if subject is None:
+            continue
+        rate = rule["per_minute"] / 60.0
+        allowed, tokens = buckets.take(f"{endpoint}|{rule['by']}|{subject}", rule["burst"], rate, now)
+        if not allowed:
+            wait = max(wait, math.ceil((1 - tokens) / rate))
+    return wait
+
+
+def too_many_requests(wait):
+    response = Response(f"Too many requests. Try again in {wait} seconds.\n", status=429, mimetype="text/plain")
+    response.headers["Retry-After"] = str(wait)
+    return response
+
+
+def init_app(app):
+    """Create the bucket store selected by RATELIMIT_STORAGE and check limited endpoints before each request"""
+    validate(app.config.get("RATELIMITS", {}))
+    storage = app.config.get("RATELIMIT_STORAGE", "memory")
+    if storage == "memory":
+        buckets = MemoryBuckets(app.config.get("RATELIMIT_MAX_BUCKETS", 100000))
+    elif storage == "sqlite":
+        buckets = SQLiteBuckets(app.config.get("RATELIMIT_SQLITE_PATH")
+                                or os.path.join(app.instance_path, "rate_limits.db"))
+    else:
+        raise ValueError(f"Unknown RATELIMIT_STORAGE: {storage!r}")
+    app.extensions["rate_buckets"] = buckets
+
+    @app.before_request
+    def limit_request():
+        if request.method in ("GET", "HEAD", "OPTIONS") or not current_app.config.get("RATELIMIT_ENABLED", True):
+            return None
+        rules = current_app.config.get("RATELIMITS", {}).get(request.endpoint)
+        if not rules:
+            return None
+        wait = check(request.endpoint, rules)
+        return too_many_requests(wait) if wait else None
+
+    @app.cli.command("prune-rate-limits")
+    @click.option("--idle-hours", type=float, default=24.0, help="delete buckets untouched this long")
+    def prune_command(idle_hours):
+        """Delete idle rate-limit buckets (they would be full again anyway)"""
+        click.echo(f"Deleted {buckets.prune(idle_hours * 3600)} idle buckets")
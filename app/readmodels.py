@@ -0,0 +1,192 @@
+"""
+Read models for list pages.
+
+A list page shows a few columns of many rows. Loading ORM entities for it costs
+an object, an identity-map entry and attribute instrumentation per row. It also
+loads every column of the table, including large text the page never shows,
+such as Message.body and Submission.content. The functions here run Core
+select() projections of just the columns each template uses, and return them
+as NamedTuples. Nothing is tracked by the session and nothing can lazy-load.
+Related values are flattened into the row by joins (course_title rather than
+course.title).
+
+Detail pages and every write keep using the ORM models.
+"""
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import case, func
+
+from .models import db, Announcement, Assignment, Course, Enrollment, ExtractedText, Message, Submission, SubmissionVersion, User
+
+PREVIEW_CHARS = 300  # submission notes shown in a listing; the full text is on the history page
+FILE_PREVIEW_CHARS = 2000  # extracted file text shown in a listing; the rest is on the version's text page
+
+
+class AssignmentItem(NamedTuple):
+    id: int
+    title: str
+    description: Optional[str]
+    due_date: datetime
+    assignment_type: str
+    course_id: Optional[int]
+    course_title: Optional[str]
+
+
+class MessageItem(NamedTuple):
+    id: int
+    subject: str
+    timestamp: datetime
+    read: bool
+    correspondent: str  # sender's username in the inbox, recipient's in sent mail
+
+
+class AnnouncementItem(NamedTuple):
+    id: int
+    title: str
+    content: str
+    timestamp: datetime
+    course_title: str
+    course_code: str
+    author_username: str
+    author_role: str
+
+
+class SubmissionItem(NamedTuple):
+    id: int
+    student_id: int
+    student_username: str
+    student_email: str
+    submitted_at: datetime
+    attempts: int
+    grade: Optional[float]
+    feedback: Optional[str]
+    content_preview: Optional[str]
+    content_truncated: bool
+    file_path: Optional[str]  # legacy upload, before versioning
+    version_id: Optional[int]
+    version_file_path: Optional[str]
+    version_file_name: Optional[str]
+    is_late: bool
+    claimed: bool
+    claimed_by: Optional[int]
+    text_status: Optional[str]  # extraction of the latest file: pending, running, done, error; None if not extracted
+    text_preview: Optional[str]
+
+
+class StudentItem(NamedTuple):
+    id: int
+    username: str
+    email: str
+
+
+class CourseItem(NamedTuple):
+    id: int
+    title: str
+    code: str
+    description: Optional[str]
+    enrollment_count: int
+    students: tuple  # StudentItems enrolled in the course
+
+
+def _rows(item, stmt):
+    return [item._make(row) for row in db.session.execute(stmt)]
+
+
+def assignments(student_id=None, sort=None, order="asc"):
+    """Assignments with their course title; only the student's courses when student_id is given.
+
+    sort is "due_date", "course" or None for newest first.
+    """
+    stmt = (db.select(Assignment.id, Assignment.title, Assignment.description, Assignment.due_date,
+                      Assignment.assignment_type, Assignment.course_id, Course.title)
+            .outerjoin(Course, Course.id == Assignment.course_id))
+    if student_id is not None:
+        stmt = stmt.where(Assignment.course_id.in_(
+            db.select(Enrollment.course_id).where(Enrollment.student_id == student_id)))
+    column = {"due_date": Assignment.due_date, "course": Course.title}.get(sort)
+    if column is None:
+        stmt = stmt.order_by(Assignment.id.desc())
+    else:
+        stmt = stmt.order_by(column.asc() if order == "asc" else column.desc())
+    return _rows(AssignmentItem, stmt)
+
+
+def _messages(user_column, other_column, user_id):
+    stmt = (db.select(Message.id, Message.subject, Message.timestamp, Message.read, User.username)
+            .join(User, User.id == other_column)
+            .where(user_column == user_id)
+            .order_by(Message.timestamp.desc()))
+    return _rows(MessageItem, stmt)
+
+
+def inbox(user_id):
+    """Received messages, newest first, without their bodies"""
+    return _messages(Message.recipient_id, Message.sender_id, user_id)
+
+
+def sent(user_id):
+    """Sent messages, newest first, without their bodies"""
+    return _messages(Message.sender_id, Message.recipient_id, user_id)
+
+
+def announcements(course_ids):
+    """Announcements of the given courses, newest first"""
+    stmt = (db.select(Announcement.id, Announcement.title, Announcement.content, Announcement.timestamp,
+                      Course.title, Course.code, User.username, User.role)
+            .join(Course, Course.id == Announcement.course_id)
+            .join(User, User.id == Announcement.author_id)
+            .where(Announcement.course_id.in_(course_ids))
+            .order_by(Announcement.timestamp.desc()))
+    return _rows(AnnouncementItem, stmt)
+
+
+def submissions(assignment_id, now=None):
+    """An assignment's submissions with student, latest file, lateness and lease state.
+
+    Notes are cut to PREVIEW_CHARS and extracted file text to FILE_PREVIEW_CHARS in SQL,
+    so long texts never leave the database.
+    """
+    now = now or datetime.utcnow()
+    claimed = db.and_(Submission.grade.is_(None), Submission.lease_expires_at >= now)
+    stmt = (db.select(
+                Submission.id, Submission.student_id, User.username, User.email, Submission.submitted_at,
+                Submission.attempts, Submission.grade, Submission.feedback,
+                func.substr(Submission.content, 1, PREVIEW_CHARS),
+                func.coalesce(func.length(Submission.content) > PREVIEW_CHARS, False),
+                Submission.file_path, SubmissionVersion.id, SubmissionVersion.file_path, SubmissionVersion.file_name,
+                func.coalesce(Submission.submitted_at > Assignment.due_date, False),
+                case((claimed, True), else_=False),
+                Submission.claimed_by,
+                ExtractedText.status, func.substr(ExtractedText.text, 1, FILE_PREVIEW_CHARS))
+            .join(User, User.id == Submission.student_id)
+            .join(Assignment, Assignment.id == Submission.assignment_id)
+            .outerjoin(SubmissionVersion, SubmissionVersion.id == Submission.latest_version_id)
+            .outerjoin(ExtractedText, ExtractedText.file_sha256 == SubmissionVersion.file_sha256)
+            .where(Submission.assignment_id == assignment_id)
+            .order_by(Submission.id))
+    return _rows(SubmissionItem, stmt)
+
+
+def students():
+    """Every student account, for the enroll lists"""
+    return _rows(StudentItem, db.select(User.id, User.username, User.email).where(User.role == "student"))
+
+
+def taught_courses(teacher_id):
+    """The teacher's courses with enrollment counts and enrolled students, in two queries"""
+    courses = db.session.execute(
+        db.select(Course.id, Course.title, Course.code, Course.description).where(Course.teacher == teacher_id)
+    ).all()
+    enrolled = {course.id: [] for course in courses}
+    if enrolled:
+        rows = db.session.execute(
+            db.select(Enrollment.course_id, User.id, User.username, User.email)
+            .join(User, User.id == Enrollment.student_id)
+            .where(Enrollment.course_id.in_(list(enrolled)))
+            .order_by(Enrollment.id))
+        for course_id, *student in rows:
+            enrolled[course_id].append(StudentItem._make(student))
+    return [CourseItem(course.id, course.title, course.code, course.description, len(enrolled[course.id]),
+                       tuple(enrolled[course.id]))
+            for course in courses]
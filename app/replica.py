@@ -0,0 +1,92 @@
+"""
+Read/write session routing.
+
+When DB_READ_URL (a replica) or DB_READ_ONLY_POOL (a read-only pool on the
+primary SQLite file) is configured, the session sends queries made while
+handling a GET/HEAD request to the "read" engine. Flushes and DML always go to
+the primary, and once a request has written, the rest of it reads from the
+primary too. After any request that wrote, the user's next requests stay on
+the primary for DB_READ_STICKY_SECONDS so they see their own writes even if
+the replica lags behind.
+"""
+import os
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+READ_BIND = "read"
+STICKY_KEY = "_db_primary_until"
+SAFE_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+
+
+class RoutingSession(Session):
+    """Session that picks the read engine for reads inside read-only requests"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or getattr(clause, "is_dml", False):
+                g.db_wrote = True
+            elif g.get("db_route") == READ_BIND and not g.get("db_wrote"):
+                engine = self._db.engines.get(READ_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_url(config):
+    """URL of the read engine, or None when routing is off"""
+    if config.get("DB_READ_URL"):
+        return config["DB_READ_URL"]
+    if not config.get("DB_READ_ONLY_POOL"):
+        return None
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        return None  # a read-only pool only makes sense for a shared SQLite file
+    if url.query.get("uri"):
+        return None  # already a driver URI; name the read URL explicitly with DB_READ_URL
+    return f"sqlite:///file:{url.database}?mode=ro&uri=true"
+
+
+def _create_read_engine(app, url):
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:"):
+        # Relative SQLite paths live in the instance folder, as for the primary
+        is_uri = url.database.startswith("file:")
+        path = url.database[5:] if is_uri else url.database
+        if not os.path.isabs(path):
+            path = os.path.join(app.instance_path, path)
+            url = url.set(database=f"file:{path}" if is_uri else path)
+    return create_engine(url, **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+
+
+def init_app(app):
+    """Create the read engine and route each request; call right after db.init_app.
+
+    The engine is added to db.engines under READ_BIND (without a model bind key)
+    so the pragma, profiler and metrics listeners see it like the primary.
+    """
+    url = read_url(app.config)
+    if url is None:
+        return
+    db = app.extensions["sqlalchemy"]
+    with app.app_context():
+        db.engines[READ_BIND] = _create_read_engine(app, url)
+
+    @app.before_request
+    def choose_route():
+        if request.method in SAFE_METHODS and session.get(STICKY_KEY, 0) <= time.time():
+            g.db_route = READ_BIND
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.pop("db_wrote", False):
+            session[STICKY_KEY] = time.time() + current_app.config.get("DB_READ_STICKY_SECONDS", 5)
+        return response
+
+    @app.teardown_request
+    def reset_route(exc):
+        g.pop("db_route", None)
+        g.pop("db_wrote", None)
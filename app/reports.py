@@ -0,0 +1,104 @@
+"""
+Deadline reports for instructors, aggregated in SQL.
+
+Every figure comes from a GROUP BY over Submission joined to Assignment: on-time
+and late counts, resubmissions (Submission.attempts) and a histogram of how
+long before the deadline work arrived. Histogram buckets are assigned by a CASE
+expression in the query, so rows are never loaded one by one. The hours are
+computed with each database's own date arithmetic (hours_before_due()). The
+histogram shows the rush before each deadline for capacity planning.
+"""
+from sqlalchemy import case, extract, func, literal_column
+
+from .models import db, Assignment, Submission
+
+# (label, lower, upper) in hours before the deadline, lower bound inclusive;
+# negative hours are late submissions. None leaves a side open.
+BUCKETS = [
+    ("> 7 days early", 168, None),
+    ("3-7 days early", 72, 168),
+    ("1-3 days early", 24, 72),
+    ("6-24 hours early", 6, 24),
+    ("1-6 hours early", 1, 6),
+    ("last hour", 0, 1),
+    ("< 1 hour late", -1, 0),
+    ("1-24 hours late", -24, -1),
+    ("> 1 day late", None, -24),
+]
+
+
+def hours_before_due(dialect=None):
+    """Hours between submission and deadline; negative when late (SQLite, PostgreSQL and MySQL)"""
+    dialect = dialect or db.engine.dialect.name
+    if dialect == "sqlite":
+        return (func.julianday(Assignment.due_date) - func.julianday(Submission.submitted_at)) * 24
+    if dialect == "postgresql":
+        return extract("epoch", Assignment.due_date - Submission.submitted_at) / 3600.0
+    if dialect in ("mysql", "mariadb"):
+        return func.timestampdiff(literal_column("SECOND"), Submission.submitted_at, Assignment.due_date) / 3600.0
+    raise NotImplementedError(f"Deadline report hours are not supported on {dialect}")
+
+
+def bucket_expression(buckets=BUCKETS):
+    """CASE expression giving each submission's bucket index"""
+    hours = hours_before_due()
+    whens = []
+    for index, (_, lower, upper) in enumerate(buckets):
+        conditions = []
+        if lower is not None:
+            conditions.append(hours >= lower)
+        if upper is not None:
+            conditions.append(hours < upper)
+        whens.append((db.and_(*conditions), index))
+    return case(*whens)
+
+
+def deadline_report(course_id):
+    """Per-assignment submission timing for one course, plus course-wide totals"""
+    late = Submission.submitted_at > Assignment.due_date
+    rows = (db.session.query(
+                Assignment.id, Assignment.title, Assignment.due_date,
+                func.count(Submission.id),
+                func.count(case((late, 1))),
+                func.coalesce(func.sum(Submission.attempts - 1), 0),
+                func.count(case((Submission.attempts > 1, 1))),
+            )
+            .outerjoin(Submission, Submission.assignment_id == Assignment.id)
+            .filter(Assignment.course_id == course_id)
+            .group_by(Assignment.id)
+            .order_by(Assignment.due_date))
+    assignments = []
+    by_id = {}
+    for assignment_id, title, due_date, submitted, late_count, resubmissions, resubmitted in rows:
+        item = {
+            "id": assignment_id,
+            "title": title,
+            "due_date": due_date,
+            "submitted": submitted,
+            "on_time": submitted - late_count,
+            "late": late_count,
+            "resubmissions": resubmissions,
+            "resubmitted_students": resubmitted,
+            "histogram": [0] * len(BUCKETS),
+        }
+        assignments.append(item)
+        by_id[assignment_id] = item
+
+    bucket = bucket_expression().label("bucket")
+    histogram = [0] * len(BUCKETS)
+    counts = (db.session.query(Submission.assignment_id, bucket, func.count(Submission.id))
+              .join(Assignment, Assignment.id == Submission.assignment_id)
+              .filter(Assignment.course_id == course_id, Submission.submitted_at.isnot(None))
+              .group_by(Submission.assignment_id, bucket))
+    for assignment_id, index, count in counts:
+        by_id[assignment_id]["histogram"][index] = count
+        histogram[index] += count
+
+    totals = {key: sum(item[key] for item in assignments)
+              for key in ("submitted", "on_time", "late", "resubmissions", "resubmitted_students")}
+    return {
+        "assignments": assignments,
+        "buckets": [label for label, _, _ in BUCKETS],
+        "histogram": histogram,
+        "totals": totals,
+    }
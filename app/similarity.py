@@ -0,0 +1,206 @@
+"""
+Near-duplicate detection across the submissions of an assignment (MinHash LSH).
+
+Comparing every pair of n submissions is O(n²). Instead, each submission is
+reduced once, at submit time, to a fixed-size MinHash signature. The input is
+its notes plus the text of its file, once app/extraction.py has extracted it
+(the submission is re-indexed then). That text is cut into overlapping runs of
+SIMILARITY_SHINGLE_SIZE tokens, so renaming a variable or reflowing whitespace
+changes few shingles. The fraction of equal positions in two signatures
+estimates the Jaccard similarity of their shingle sets.
+
+Signatures are stored as packed little-endian uint32 arrays in a BLOB
+(SubmissionSignature). They are also split into SIMILARITY_BANDS bands, and
+each band is hashed into a SimilarityBucket row. Two submissions become a
+candidate pair only if some band of theirs lands in the same bucket. The
+suspicious-pairs report is therefore one indexed self-join on the buckets,
+followed by a signature comparison of those candidates only. Its cost grows
+with the number of submissions and matches, not with n².
+
+With 128 permutations in 32 bands of 4 rows, a pair at Jaccard 0.5 shares a
+bucket with probability 1 - (1 - 0.5**4)**32, about 87%, and at 0.7 with about
+99.98%. Changing the permutation or band settings needs
+`flask index-similarity --all`.
+"""
+import functools
+import hashlib
+import random
+import re
+import struct
+import zlib
+from datetime import datetime
+from typing import NamedTuple
+
+import click
+from flask import current_app
+from sqlalchemy.orm import aliased
+
+from .database import insert
+from .models import db, ExtractedText, SimilarityBucket, Submission, SubmissionSignature, SubmissionVersion, User
+
+TOKEN = re.compile(r"\w+|[^\w\s]")
+SEED = 131  # fixed, so signatures computed by different processes are comparable
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+
+
+class SimilarPair(NamedTuple):
+    similarity: float  # estimated Jaccard similarity of the two shingle sets
+    first_id: int
+    first_username: str
+    second_id: int
+    second_username: str
+
+
+def _settings():
+    config = current_app.config
+    return (config.get("SIMILARITY_SHINGLE_SIZE", 5), config.get("SIMILARITY_PERMUTATIONS", 128),
+            config.get("SIMILARITY_BANDS", 32))
+
+
+def shingles(text, size=5):
+    """32-bit hashes of the text's overlapping runs of size lower-cased tokens"""
+    tokens = TOKEN.findall(text.lower())
+    if not tokens:
+        return set()
+    if len(tokens) <= size:
+        return {zlib.crc32(" ".join(tokens).encode())}
+    return {zlib.crc32(" ".join(tokens[i:i + size]).encode()) for i in range(len(tokens) - size + 1)}
+
+
+@functools.lru_cache(maxsize=None)
+def _permutations(count):
+    rng = random.Random(SEED)
+    return tuple((rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(count))
+
+
+def minhash(hashes, permutations=128):
+    """MinHash signature: for each of the random hash functions, the minimum over the set"""
+    return [min([(a * x + b) % _PRIME for x in hashes]) & _MASK for a, b in _permutations(permutations)]
+
+
+def pack(signature):
+    return struct.pack(f"<{len(signature)}I", *signature)
+
+
+def unpack(blob):
+    return struct.unpack(f"<{len(blob) // 4}I", blob)
+
+
+def estimate(first, second):
+    """Estimated Jaccard similarity of two signatures: the fraction of equal positions"""
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+def buckets(blob, bands):
+    """[(band, bucket)]: a signed 64-bit hash of each band's bytes"""
+    width = len(blob) // bands
+    return [(band, int.from_bytes(hashlib.blake2b(blob[band * width:(band + 1) * width], digest_size=8).digest(),
+                                  "little", signed=True))
+            for band in range(bands)]
+
+
+def submission_text(content, file_text=None):
+    """What a submission is compared on: its notes and its file's extracted text"""
+    return "\n".join(part for part in (content, file_text) if part)
+
+
+def index(submission_id, assignment_id, text):
+    """Replace the submission's signature and LSH buckets (flushed, not committed); returns the signature"""
+    size, permutations, bands = _settings()
+    db.session.execute(db.delete(SimilarityBucket).where(SimilarityBucket.submission_id == submission_id))
+    hashes = shingles(text, size)
+    if not hashes:
+        db.session.execute(db.delete(SubmissionSignature).where(SubmissionSignature.submission_id == submission_id))
+        return None
+    signature = minhash(hashes, permutations)
+    blob = pack(signature)
+    stmt = insert(SubmissionSignature).values(submission_id=submission_id, assignment_id=assignment_id,
+                                              signature=blob, shingle_count=len(hashes), updated_at=datetime.utcnow())
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=["submission_id"],
+        set_={"signature": stmt.excluded.signature, "shingle_count": stmt.excluded.shingle_count,
+              "updated_at": stmt.excluded.updated_at}))
+    db.session.execute(db.insert(SimilarityBucket), [
+        {"assignment_id": assignment_id, "band": band, "bucket": bucket, "submission_id": submission_id}
+        for band, bucket in buckets(blob, bands)])
+    return signature
+
+
+def candidates(assignment_id):
+    """Pairs (lower id, higher id) sharing at least one LSH bucket, from one self-join"""
+    mine, other = aliased(SimilarityBucket), aliased(SimilarityBucket)
+    return db.session.execute(
+        db.select(mine.submission_id, other.submission_id).distinct()
+        .join(other, db.and_(other.assignment_id == mine.assignment_id, other.band == mine.band,
+                             other.bucket == mine.bucket, other.submission_id > mine.submission_id))
+        .where(mine.assignment_id == assignment_id)).all()
+
+
+def suspicious_pairs(assignment_id, threshold=None):
+    """Candidate pairs whose estimated similarity is at least threshold, most similar first"""
+    if threshold is None:
+        threshold = current_app.config.get("SIMILARITY_THRESHOLD", 0.5)
+    pairs = candidates(assignment_id)
+    if not pairs:
+        return []
+    ids = {submission_id for pair in pairs for submission_id in pair}
+    rows = db.session.execute(
+        db.select(SubmissionSignature.submission_id, SubmissionSignature.signature, User.username)
+        .join(Submission, Submission.id == SubmissionSignature.submission_id)
+        .join(User, User.id == Submission.student_id)
+        .where(SubmissionSignature.submission_id.in_(ids)))
+    signatures, names = {}, {}
+    for submission_id, blob, username in rows:
+        signatures[submission_id], names[submission_id] = unpack(blob), username
+    result = []
+    for first, second in pairs:
+        similarity = estimate(signatures[first], signatures[second])
+        if similarity >= threshold:
+            result.append(SimilarPair(similarity, first, names[first], second, names[second]))
+    result.sort(key=lambda pair: (-pair.similarity, pair.first_id, pair.second_id))
+    return result
+
+
+def _sources():
+    """(submission id, assignment id, notes, extracted file text) of each submission's latest version"""
+    return (db.select(Submission.id, Submission.assignment_id, Submission.content, ExtractedText.text)
+            .outerjoin(SubmissionVersion, SubmissionVersion.id == Submission.latest_version_id)
+            .outerjoin(ExtractedText, db.and_(ExtractedText.file_sha256 == SubmissionVersion.file_sha256,
+                                              ExtractedText.status == "done")))
+
+
+def index_submissions(submission_ids):
+    """Index the given submissions from their notes and extracted file text (flushed, not committed)"""
+    if not submission_ids:
+        return 0
+    rows = db.session.execute(_sources().where(Submission.id.in_(submission_ids))).all()
+    for submission_id, assignment_id, content, file_text in rows:
+        index(submission_id, assignment_id, submission_text(content, file_text))
+    return len(rows)
+
+
+def reindex(assignment_id=None, missing_only=True):
+    """Index submissions that have no signature yet (or all of them); returns the number indexed"""
+    stmt = _sources()
+    if assignment_id is not None:
+        stmt = stmt.where(Submission.assignment_id == assignment_id)
+    if missing_only:
+        stmt = stmt.where(~db.select(SubmissionSignature.submission_id)
+                          .where(SubmissionSignature.submission_id == Submission.id).exists())
+    count = 0
+    for submission_id, submission_assignment_id, content, file_text in db.session.execute(stmt).all():
+        index(submission_id, submission_assignment_id, submission_text(content, file_text))
+        count += 1
+    db.session.commit()
+    return count
+
+
+def init_app(app):
+    @app.cli.command("index-similarity")
+    @click.option("--assignment", "assignment_id", type=int, help="only this assignment")
+    @click.option("--all", "everything", is_flag=True, help="recompute signatures that already exist")
+    def index_command(assignment_id, everything):
+        """Compute MinHash signatures for submissions that have none"""
+        count = reindex(assignment_id, missing_only=not everything)
+        click.echo(f"Indexed {count} submissions")
@@ -0,0 +1,162 @@
+"""
+Append-only submission history.
+
+Every hand-in inserts a SubmissionVersion. The Submission row, one per student
+and assignment and upserted on each hand-in, keeps the grade and points at its
+latest version. It copies that version's content, file and time so existing
+pages and queries keep working. Uploaded files go into a content-addressed blob
+store under UPLOAD_FOLDER/blobs. Resubmitting an identical file stores nothing
+new, and no version's file is overwritten or deleted by a later hand-in.
+
+Retention keeps the newest SUBMISSION_VERSIONS_KEEP versions of each submission.
+If SUBMISSION_VERSIONS_MAX_AGE_DAYS is set, older versions past that age are
+dropped too, but the latest version is always kept. Blobs that no version or
+submission still references are deleted. prune() runs for the one submission
+after each hand-in, and `flask prune-submission-versions` compacts everything.
+"""
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import func
+
+from .database import insert
+from .models import db, Submission, SubmissionVersion
+
+BLOB_DIR = "blobs"
+CHUNK = 64 * 1024
+
+
+def store_blob(file_storage):
+    """Save an upload under its SHA-256; returns (path relative to UPLOAD_FOLDER, sha256, size)"""
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    os.makedirs(os.path.join(upload_folder, BLOB_DIR), exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.join(upload_folder, BLOB_DIR), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            for chunk in iter(lambda: file_storage.stream.read(CHUNK), b""):
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        sha256 = digest.hexdigest()
+        relative = os.path.join(BLOB_DIR, sha256[:2], sha256)
+        target = os.path.join(upload_folder, relative)
+        if os.path.exists(target):
+            os.remove(tmp_path)  # same bytes already stored
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return relative, sha256, size
+
+
+def submit(assignment_id, student_id, content, blob=None, file_name=None):
+    """Record a hand-in and return its new SubmissionVersion (flushed, not committed).
+
+    The Submission row is created or updated by one INSERT ... ON CONFLICT DO UPDATE
+    that also increments attempts, so concurrent hand-ins neither duplicate the row
+    nor reuse a version number. blob is store_blob()'s result; without one the
+    previous version's file carries over.
+    """
+    now = datetime.utcnow()
+    stmt = insert(Submission).values(assignment_id=assignment_id, student_id=student_id, content=content,
+                                     file_path=blob[0] if blob else None, submitted_at=now, updated_at=now,
+                                     attempts=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["student_id", "assignment_id"],
+        set_={
+            "attempts": Submission.attempts + 1,
+            "content": stmt.excluded.content,
+            "file_path": func.coalesce(stmt.excluded.file_path, Submission.file_path),
+            "submitted_at": stmt.excluded.submitted_at,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ).returning(Submission.id, Submission.attempts, Submission.file_path, Submission.latest_version_id)
+    submission_id, number, file_path, previous_id = db.session.execute(stmt).one()
+
+    version = SubmissionVersion(submission_id=submission_id, number=number, content=content, submitted_at=now)
+    if blob is not None:
+        version.file_path, version.file_sha256, version.file_size = blob
+        version.file_name = file_name
+    elif previous_id is not None:
+        previous = db.session.get(SubmissionVersion, previous_id)
+        version.file_path, version.file_sha256 = previous.file_path, previous.file_sha256
+        version.file_size, version.file_name = previous.file_size, previous.file_name
+    else:
+        version.file_path = version.file_name = file_path  # file from before versioning
+    db.session.add(version)
+    db.session.flush()
+    db.session.execute(db.update(Submission).where(Submission.id == submission_id)
+                       .values(latest_version_id=version.id))
+    return version
+
+
+def history(submission_id, page=1, per_page=None):
+    """Page of a submission's versions, newest first"""
+    per_page = per_page or current_app.config.get("SUBMISSION_HISTORY_PER_PAGE", 10)
+    query = (db.select(SubmissionVersion).where(SubmissionVersion.submission_id == submission_id)
+             .order_by(SubmissionVersion.number.desc()))
+    return db.paginate(query, page=page, per_page=per_page, error_out=False)
+
+
+def prune(submission_ids=None, keep=None, max_age_days=None, now=None):
+    """Delete versions outside the retention policy, then unreferenced blobs; commits.
+
+    Returns the number of versions removed.
+    """
+    config = current_app.config
+    keep = keep if keep is not None else config.get("SUBMISSION_VERSIONS_KEEP")
+    max_age_days = max_age_days if max_age_days is not None else config.get("SUBMISSION_VERSIONS_MAX_AGE_DAYS")
+    if not keep and not max_age_days:
+        return 0
+
+    rank = func.row_number().over(partition_by=SubmissionVersion.submission_id,
+                                  order_by=SubmissionVersion.number.desc()).label("rank")
+    ranked = db.select(SubmissionVersion.id, SubmissionVersion.file_path, SubmissionVersion.submitted_at, rank)
+    if submission_ids is not None:
+        ranked = ranked.where(SubmissionVersion.submission_id.in_(submission_ids))
+    ranked = ranked.subquery()
+    doomed = []
+    if keep:
+        doomed.append(ranked.c.rank > keep)
+    if max_age_days:
+        cutoff = (now or datetime.utcnow()) - timedelta(days=max_age_days)
+        doomed.append(db.and_(ranked.c.rank > 1, ranked.c.submitted_at < cutoff))
+    rows = db.session.execute(db.select(ranked.c.id, ranked.c.file_path).where(db.or_(*doomed))).all()
+    if not rows:
+        return 0
+
+    ids = [row.id for row in rows]
+    paths = {row.file_path for row in rows if row.file_path}
+    db.session.query(SubmissionVersion).filter(SubmissionVersion.id.in_(ids)).delete(synchronize_session=False)
+    if paths:
+        still_used = {path for (path,) in db.session.query(SubmissionVersion.file_path)
+                      .filter(SubmissionVersion.file_path.in_(paths)).distinct()}
+        still_used |= {path for (path,) in db.session.query(Submission.file_path)
+                       .filter(Submission.file_path.in_(paths)).distinct()}
+        paths -= still_used
+    db.session.commit()
+
+    upload_folder = config["UPLOAD_FOLDER"]
+    for path in paths:
+        full_path = os.path.join(upload_folder, path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+    return len(ids)
+
+
+def init_app(app):
+    @app.cli.command("prune-submission-versions")
+    @click.option("--keep", type=int, help="versions to keep per submission")
+    @click.option("--max-age-days", type=int, help="drop older versions past this age (never the latest)")
+    def prune_command(keep, max_age_days):
+        """Apply the submission history retention policy to every submission"""
+        removed = prune(keep=keep, max_age_days=max_age_days)
+        click.echo(f"Removed {removed} submission versions")
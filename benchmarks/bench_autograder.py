@@ -0,0 +1,85 @@
+"""
+Benchmark: autograder throughput against process-pool size
+
+Usage:
+    python -m benchmarks.bench_autograder [--jobs 32] [--work 2000000] [--workers 1,2,4]
+
+Seeds one assignment with --jobs .py submissions and a CPU-bound harness. The
+harness runs the submitted function --work times before it prints a score. It
+then queues every submission ("regrade all") and times `run_pending` once per
+pool size in --workers (default: 1, 2, 4 ... up to the CPU count). Reports jobs
+per second and the speedup over one worker.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+HARNESS = """
+import runpy
+add = runpy.run_path("submission.py")["add"]
+total = 0
+for i in range({work}):
+    total = add(total, 1)
+print("SCORE:", 100 if total == {work} else 0)
+"""
+
+
+def seed(db, app, jobs, work):
+    from werkzeug.security import generate_password_hash
+    from app.models import User, Course, Assignment, Submission
+
+    password_hash = generate_password_hash("bench-password")
+    db.session.execute(db.insert(User), [{"id": 1, "username": "instructor0", "email": "instructor0@example.com",
+                                          "role": "instructor", "password_hash": password_hash}]
+                       + [{"id": 2 + n, "username": f"student{n}", "email": f"student{n}@example.com",
+                           "role": "student", "password_hash": password_hash} for n in range(jobs)])
+    db.session.execute(db.insert(Course), [{"id": 1, "title": "Bench Course", "code": "BENCH1", "teacher": 1}])
+    db.session.execute(db.insert(Assignment), [{"id": 1, "title": "Bench HW", "due_date": datetime(2025, 1, 1),
+                                                 "assignment_type": "homework", "course_id": 1,
+                                                 "autograde_harness": HARNESS.format(work=work)}])
+    for n in range(jobs):
+        with open(os.path.join(app.config["UPLOAD_FOLDER"], f"solution{n}.py"), "w") as source:
+            source.write("def add(a, b):\n    return a + b\n")
+    db.session.execute(db.insert(Submission), [{"assignment_id": 1, "student_id": 2 + n,
+                                                "file_path": f"solution{n}.py"} for n in range(jobs)])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=32)
+    parser.add_argument("--work", type=int, default=2000000, help="loop iterations per harness run")
+    parser.add_argument("--workers", help="comma-separated pool sizes")
+    args = parser.parse_args()
+    cpus = os.cpu_count() or 1
+    sizes = [int(size) for size in args.workers.split(",")] if args.workers else \
+        sorted({min(2 ** n, cpus) for n in range(cpus.bit_length() + 1)})
+
+    from .harness import bench_app
+
+    with bench_app(CACHE_TYPE="null") as app:
+        from app import autograder
+        from app.models import db
+
+        with app.app_context():
+            seed(db, app, args.jobs, args.work)
+            results = {}
+            for workers in sizes:
+                autograder.enqueue(1)
+                db.session.commit()
+                start = time.perf_counter()
+                finished = autograder.run_pending(workers=workers)
+                elapsed = time.perf_counter() - start
+                results[workers] = {"seconds": round(elapsed, 2), "jobs_per_second": round(finished / elapsed, 2)}
+            base = results[sizes[0]]["jobs_per_second"]
+            for result in results.values():
+                result["speedup"] = round(result["jobs_per_second"] / base, 2)
+
+    print(json.dumps({"benchmark": "autograder", "jobs": args.jobs, "work": args.work, "cpus": cpus,
+                      "results": results}, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: broadcast a message to every student in a 1,000-student course
+
+Usage:
+    python -m benchmarks.bench_broadcast [--students 1000] [--repeat 5]
+
+Seeds a throwaway SQLite database, then times both the bulk-insert model
+helper and the full POST /messages/broadcast route.
+"""
+import argparse
+import json
+import statistics
+import time
+
+from .datagen import PASSWORD, get_scale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # One course that every student is enrolled in
+    scale = get_scale("tiny", students=args.students, instructors=1, courses=1, enrollments_per_student=1,
+                      assignments_per_course=0, messages_per_user=0)
+
+    from .harness import bench_app
+    from .datagen import generate
+
+    with bench_app() as app:
+        from app.models import db, Message
+
+        with app.app_context():
+            dataset = generate(db, scale)
+            teacher_id, course_id, student_ids = dataset["instructor_id"], dataset["course_id"], dataset["student_ids"]
+
+            # Model helper: one executemany INSERT + one commit
+            helper_times = []
+            for i in range(args.repeat):
+                start = time.perf_counter()
+                Message.broadcast(teacher_id, student_ids, f"Helper {i}", "Benchmark body")
+                db.session.commit()
+                helper_times.append(time.perf_counter() - start)
+
+        # Full route through the test client
+        client = app.test_client()
+        client.post("/auth/login", data={"username": "instructor0", "password": PASSWORD})
+        route_times = []
+        for i in range(args.repeat):
+            start = time.perf_counter()
+            response = client.post("/messages/broadcast", data={
+                "course_id": course_id, "subject": f"Route {i}", "body": "Benchmark body",
+            })
+            route_times.append(time.perf_counter() - start)
+            assert response.status_code == 302, response.status_code
+
+        with app.app_context():
+            # Per-recipient unread badge lookup (served by the recipient/read index)
+            start = time.perf_counter()
+            for sid in student_ids:
+                Message.query.filter_by(recipient_id=sid, read=False).count()
+            unread_total = time.perf_counter() - start
+
+            total_messages = Message.query.count()
+
+    result = {
+        "benchmark": "broadcast",
+        "students": args.students,
+        "repeat": args.repeat,
+        "messages_written": total_messages,
+        "helper_ms_median": round(statistics.median(helper_times) * 1000, 2),
+        "route_ms_median": round(statistics.median(route_times) * 1000, 2),
+        "unread_count_us_per_student": round(unread_total / max(len(student_ids), 1) * 1e6, 2),
+    }
+    print(json.dumps(result, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
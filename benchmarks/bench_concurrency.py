@@ -0,0 +1,132 @@
+"""
+Benchmark: many page readers plus grading writers against one SQLite file
+
+Usage:
+    python -m benchmarks.bench_concurrency [--readers 8] [--writers 1] [--seconds 10]
+    python -m benchmarks.bench_concurrency --journal-mode DELETE --busy-timeout 0   # old defaults
+
+Each thread has its own logged-in test client. Readers loop over student pages,
+writers keep re-grading submissions. Reports throughput, latency percentiles
+and how many requests failed with "database is locked".
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from .datagen import PASSWORD, get_scale
+from .run_routes import percentile
+
+READ_PATHS = ("/", "/classes", "/grades", "/assignments", "/messages")
+
+
+def worker(app, username, stop, record, action):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": username, "password": PASSWORD})
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            response = action(client, i)
+            ok, error = response.status_code < 400, None if response.status_code < 400 else str(response.status_code)
+        except Exception as exc:  # TESTING propagates view errors, including OperationalError
+            ok, error = False, str(exc).splitlines()[0]
+        record(time.perf_counter() - start, ok, error)
+        i += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", default="small")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--journal-mode", default="WAL")
+    parser.add_argument("--synchronous", default="NORMAL")
+    parser.add_argument("--busy-timeout", type=int, default=5000)
+    args = parser.parse_args()
+
+    # Pragmas are read from Config when the app is created, so set them first
+    os.environ.update({
+        "SQLITE_JOURNAL_MODE": args.journal_mode,
+        "SQLITE_SYNCHRONOUS": args.synchronous,
+        "SQLITE_BUSY_TIMEOUT_MS": str(args.busy_timeout),
+        "CACHE_TYPE": "null",  # every read should reach the database
+        "METRICS_ENABLED": "0",
+    })
+
+    from .harness import bench_app
+    from .datagen import generate
+
+    with bench_app() as app:
+        from app.models import db, Assignment, Course, Submission
+
+        with app.app_context():
+            dataset = generate(db, get_scale(args.scale))
+            instructor_id = dataset["instructor_id"]
+            submission_ids = [sid for (sid,) in db.session.query(Submission.id)
+                              .join(Assignment, Submission.assignment_id == Assignment.id)
+                              .join(Course, Assignment.course_id == Course.id)
+                              .filter(Course.teacher == instructor_id).limit(500)]
+
+        lock = threading.Lock()
+        results = {"read": [], "write": []}
+        errors = {}
+
+        def recorder(kind):
+            def record(elapsed, ok, error):
+                with lock:
+                    results[kind].append(elapsed * 1000)
+                    if not ok:
+                        errors[error] = errors.get(error, 0) + 1
+            return record
+
+        def read(client, i):
+            return client.get(READ_PATHS[i % len(READ_PATHS)])
+
+        def write(client, i):
+            submission_id = submission_ids[i % len(submission_ids)]
+            return client.post(f"/grade_submission/{submission_id}",
+                               data={"grade": str(50 + i % 50), "feedback": f"Pass {i}"})
+
+        stop = threading.Event()
+        threads = [threading.Thread(target=worker, args=(app, f"student{n}", stop, recorder("read"), read))
+                   for n in range(args.readers)]
+        threads += [threading.Thread(target=worker, args=(app, "instructor0", stop, recorder("write"), write))
+                    for _ in range(args.writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        with app.app_context():
+            journal_mode = db.session.execute(db.text("PRAGMA journal_mode")).scalar()
+
+    def stats(samples):
+        if not samples:
+            return {"requests": 0}
+        return {"requests": len(samples), "per_second": round(len(samples) / args.seconds, 1),
+                "p50_ms": round(percentile(samples, 50), 2), "p95_ms": round(percentile(samples, 95), 2),
+                "max_ms": round(max(samples), 2)}
+
+    result = {
+        "benchmark": "concurrency",
+        "journal_mode": journal_mode,
+        "synchronous": args.synchronous,
+        "busy_timeout_ms": args.busy_timeout,
+        "readers": args.readers,
+        "writers": args.writers,
+        "seconds": args.seconds,
+        "read": stats(results["read"]),
+        "write": stats(results["write"]),
+        "errors": errors,
+        "locked_errors": sum(count for error, count in errors.items() if "locked" in error),
+    }
+    print(json.dumps(result, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
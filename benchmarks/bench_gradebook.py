@@ -0,0 +1,99 @@
+"""
+Benchmark: recomputing a course's weighted grades after a weight change
+
+Usage:
+    python -m benchmarks.bench_gradebook [--students 500] [--assignments 60]
+
+Seeds one course with --students enrolled students and --assignments assignments
+(homework, quiz and exam in turn), each graded for about 90% of the students.
+It times a weight change followed by gradebook.course_grades() for the whole
+class: four queries and array operations on the students x assignments grid.
+It then times the array step on its own and a per-student loop in plain Python
+over the same grid, and checks that both give the same grades. Finally it times
+the grade distribution report, built and then served from the cache.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--assignments", type=int, default=60)
+    args = parser.parse_args()
+
+    from .harness import bench_app
+
+    with bench_app(CACHE_TYPE="memory") as app:
+        from werkzeug.security import generate_password_hash
+        from app import gradebook
+        from app.models import db, User, Course, Enrollment, Assignment, Submission
+
+        rng = random.Random(131)
+        policy = {"homework": (30.0, 2), "quiz": (20.0, 1), "exam": (50.0, 0)}
+        with app.app_context():
+            password_hash = generate_password_hash("bench-password")
+            db.session.execute(db.insert(User), [
+                {"id": 1 + n, "username": f"student{n}", "email": f"student{n}@example.com", "role": "student",
+                 "password_hash": password_hash} for n in range(args.students)])
+            db.session.execute(db.insert(Course), [{"id": 1, "title": "Bench Course", "code": "BENCH1", "teacher": 1}])
+            db.session.execute(db.insert(Enrollment), [
+                {"student_id": 1 + n, "course_id": 1} for n in range(args.students)])
+            types = gradebook.TYPES
+            db.session.execute(db.insert(Assignment), [
+                {"id": 1 + n, "title": f"A{n}", "due_date": datetime(2025, 1, 1) + timedelta(days=n),
+                 "assignment_type": types[n % len(types)], "course_id": 1} for n in range(args.assignments)])
+            db.session.execute(db.insert(Submission), [
+                {"assignment_id": 1 + a, "student_id": 1 + s, "grade": float(rng.randrange(40, 101))}
+                for a in range(args.assignments) for s in range(args.students) if rng.random() < 0.9])
+            db.session.commit()
+
+            start = time.perf_counter()
+            gradebook.save_policy(1, policy)
+            db.session.commit()
+            result = gradebook.course_grades([1])[1]
+            vectorized_seconds = time.perf_counter() - start
+
+            columns = [assignment_type for _, _, assignment_type in result.assignments]
+            start = time.perf_counter()
+            _, final = gradebook.compute(result.grades, columns, result.categories)
+            compute_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            looped = {}
+            for student_id, row in zip(result.student_ids, result.grades.tolist()):
+                earned = weight_sum = 0.0
+                for assignment_type, (weight, drop_lowest) in policy.items():
+                    grades = sorted(grade for grade, column in zip(row, columns)
+                                    if column == assignment_type and grade == grade)
+                    if grades:
+                        grades = grades[min(drop_lowest, len(grades) - 1):]
+                        earned += weight * sum(grades) / len(grades)
+                        weight_sum += weight
+                looped[student_id] = earned / weight_sum
+            loop_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            gradebook.distribution(1)
+            report_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            gradebook.distribution(1)
+            cached_report_seconds = time.perf_counter() - start
+
+    vectorized = dict(zip(result.student_ids, result.final.tolist()))
+    print(json.dumps({
+        "benchmark": "gradebook", "students": args.students, "assignments": args.assignments,
+        "recompute_ms": round(vectorized_seconds * 1000, 1),
+        "matrix_compute_ms": round(compute_seconds * 1000, 2),
+        "per_student_loop_ms": round(loop_seconds * 1000, 2),
+        "report_build_ms": round(report_seconds * 1000, 1),
+        "report_cached_ms": round(cached_report_seconds * 1000, 2),
+        "mismatches": sum(abs(vectorized[student_id] - grade) > 1e-9 for student_id, grade in looped.items()),
+    }, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
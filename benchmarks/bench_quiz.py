@@ -0,0 +1,97 @@
+"""
+Benchmark: re-scoring a whole quiz in one vectorized pass against scoring attempt by attempt
+
+Usage:
+    python -m benchmarks.bench_quiz [--attempts 5000] [--questions 40]
+
+Seeds one quiz with --questions questions (half multiple choice, half numeric)
+and --attempts submitted attempts with random answers. It then times
+quizzes.rescore(), which builds the attempts x questions matrix and writes all
+grades with executemany UPDATEs. It also times the loop that rescore() replaces:
+load each attempt, compare each answer with its question, and update that
+attempt's grade. It checks that both produce the same scores.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--attempts", type=int, default=5000)
+    parser.add_argument("--questions", type=int, default=40)
+    args = parser.parse_args()
+
+    from .harness import bench_app
+
+    with bench_app(CACHE_TYPE="null") as app:
+        from werkzeug.security import generate_password_hash
+        from app import quizzes
+        from app.models import db, User, Course, Assignment, QuizAttempt, QuizQuestion, Submission
+
+        rng = random.Random(131)
+        with app.app_context():
+            password_hash = generate_password_hash("bench-password")
+            db.session.execute(db.insert(User), [
+                {"id": 1 + n, "username": f"student{n}", "email": f"student{n}@example.com", "role": "student",
+                 "password_hash": password_hash} for n in range(args.attempts)])
+            db.session.execute(db.insert(Course), [{"id": 1, "title": "Bench Course", "code": "BENCH1", "teacher": 1}])
+            db.session.execute(db.insert(Assignment), [{"id": 1, "title": "Bench Quiz", "due_date": datetime(2025, 1, 1),
+                                                         "assignment_type": "quiz", "course_id": 1}])
+            key = []
+            for position in range(args.questions):
+                if position % 2:
+                    key.append({"assignment_id": 1, "position": position, "kind": "numeric", "prompt": f"Q{position}",
+                                "answer": float(position), "tolerance": 0.5, "points": 2.0})
+                else:
+                    key.append({"assignment_id": 1, "position": position, "kind": "choice", "prompt": f"Q{position}",
+                                "choices": "A\nB\nC\nD", "answer": float(position % 4), "tolerance": 0.0,
+                                "points": 1.0})
+            db.session.execute(db.insert(QuizQuestion), key)
+            now = datetime.utcnow()
+            db.session.execute(db.insert(Submission), [
+                {"id": 1 + n, "assignment_id": 1, "student_id": 1 + n, "content": "Quiz attempt"}
+                for n in range(args.attempts)])
+            db.session.execute(db.insert(QuizAttempt), [
+                {"id": 1 + n, "assignment_id": 1, "student_id": 1 + n, "submission_id": 1 + n, "started_at": now,
+                 "submitted_at": now,
+                 "responses": quizzes.pack_responses(
+                     {q["position"]: (q["answer"] + rng.choice([0.0, 0.2, 1.0]) if q["kind"] == "numeric"
+                                      else float(rng.randrange(4)))
+                      for q in key if rng.random() > 0.1}, args.questions)}
+                for n in range(args.attempts)])
+            db.session.commit()
+
+            start = time.perf_counter()
+            quizzes.rescore(1)
+            db.session.commit()
+            vectorized_seconds = time.perf_counter() - start
+            vectorized = dict(db.session.execute(db.select(QuizAttempt.id, QuizAttempt.score)).all())
+
+            start = time.perf_counter()
+            questions = QuizQuestion.query.filter_by(assignment_id=1).all()
+            total = sum(question.points for question in questions)
+            looped = {}
+            for attempt in QuizAttempt.query.filter_by(assignment_id=1).all():
+                responses = quizzes.unpack_responses(attempt.responses)
+                earned = sum(question.points for question in questions
+                             if question.position < len(responses)
+                             and abs(responses[question.position] - question.answer) <= question.tolerance + 1e-9 * abs(question.answer))
+                attempt.score = round(100.0 * earned / total, 2)
+                db.session.get(Submission, attempt.submission_id).grade = attempt.score
+                looped[attempt.id] = attempt.score
+            db.session.commit()
+            loop_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        "benchmark": "quiz", "attempts": args.attempts, "questions": args.questions,
+        "vectorized_rescore_ms": round(vectorized_seconds * 1000, 1),
+        "per_attempt_loop_ms": round(loop_seconds * 1000, 1),
+        "mismatches": sum(vectorized[attempt_id] != score for attempt_id, score in looped.items()),
+    }, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
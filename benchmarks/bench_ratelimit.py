@@ -0,0 +1,56 @@
+"""
+Benchmark: cost of one rate-limit check as the number of buckets grows
+
+Usage:
+    python -m benchmarks.bench_ratelimit [--checks 20000] [--buckets 100 10000 100000]
+
+For each bucket count it fills a memory store and a SQLite store with that many
+keys, then times --checks random takes against them. The per-check time should
+stay flat: a dictionary lookup, or one primary-key upsert.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--buckets", type=int, nargs="+", default=[100, 10000, 100000])
+    args = parser.parse_args()
+
+    from app.ratelimit import MemoryBuckets, SQLiteBuckets
+
+    rng = random.Random(131)
+    workdir = tempfile.mkdtemp(prefix="lms-bench-")
+    results = []
+    try:
+        for count in args.buckets:
+            row = {"buckets": count}
+            for name, store in (("memory", MemoryBuckets(max_entries=count)),
+                                ("sqlite", SQLiteBuckets(os.path.join(workdir, f"limits-{count}.db")))):
+                now = time.time()
+                if name == "sqlite":
+                    with store._connect() as conn:
+                        conn.executemany("INSERT INTO rate_bucket (key, tokens, updated, allowed) VALUES (?, 5, ?, 1)",
+                                         [(f"ip|{n}", now) for n in range(count)])
+                else:
+                    for n in range(count):
+                        store.take(f"ip|{n}", 5, 0.1, now)
+                keys = [f"ip|{rng.randrange(count)}" for _ in range(args.checks)]
+                start = time.perf_counter()
+                for key in keys:
+                    store.take(key, 5, 0.1)
+                row[f"{name}_us_per_check"] = round((time.perf_counter() - start) * 1e6 / args.checks, 2)
+            results.append(row)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps({"benchmark": "ratelimit", "checks": args.checks, "results": results}, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
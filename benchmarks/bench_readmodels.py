@@ -0,0 +1,113 @@
+"""
+Benchmark: list-page read models against ORM entities at 10,000 rows
+
+Usage:
+    python -m benchmarks.bench_readmodels [--rows 10000] [--body-bytes 2000] [--repeat 5]
+
+Seeds one instructor with an inbox of --rows messages, and one assignment with
+--rows submissions. Every message body and submission note is --body-bytes long.
+Each list is loaded both ways: the ORM query the pages used before, and the
+app/readmodels.py projection. For each, it reports the median wall time and the
+peak Python memory allocated while building the list (tracemalloc).
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+
+def seed(db, rows, body_bytes):
+    from werkzeug.security import generate_password_hash
+    from app.models import User, Course, Assignment, Submission, Message
+
+    password_hash = generate_password_hash("bench-password")
+    users = [{"id": 1, "username": "instructor0", "email": "instructor0@example.com", "role": "instructor",
+              "password_hash": password_hash}]
+    users += [{"id": 2 + n, "username": f"student{n}", "email": f"student{n}@example.com", "role": "student",
+               "password_hash": password_hash} for n in range(rows)]
+    db.session.execute(db.insert(User), users)
+    db.session.execute(db.insert(Course), [{"id": 1, "title": "Bench Course", "code": "BENCH1", "teacher": 1}])
+    db.session.execute(db.insert(Assignment), [{"id": 1, "title": "Bench HW", "due_date": datetime(2025, 1, 1),
+                                                 "assignment_type": "homework", "course_id": 1}])
+    text = "x" * body_bytes
+    start = datetime(2024, 12, 1)
+    db.session.execute(db.insert(Submission), [
+        {"assignment_id": 1, "student_id": 2 + n, "content": text, "submitted_at": start + timedelta(minutes=n)}
+        for n in range(rows)])
+    db.session.execute(db.insert(Message), [
+        {"sender_id": 2 + n, "recipient_id": 1, "subject": f"Question {n}", "body": text,
+         "timestamp": start + timedelta(minutes=n), "read": False}
+        for n in range(rows)])
+    db.session.commit()
+
+
+def measure(db, load, repeat):
+    """(median seconds, peak bytes) of building the list; the session is reset between runs"""
+    times = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        start = time.perf_counter()
+        result = load()
+        times.append(time.perf_counter() - start)
+        del result
+    db.session.expunge_all()
+    tracemalloc.start()
+    result = load()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    db.session.expunge_all()
+    return statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--body-bytes", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from .harness import bench_app
+
+    with bench_app() as app:
+        from sqlalchemy.orm import joinedload, undefer
+        from app import readmodels
+        from app.models import db, Message, Submission
+
+        with app.app_context():
+            seed(db, args.rows, args.body_bytes)
+            cases = {
+                "inbox": (
+                    lambda: Message.query.options(joinedload(Message.sender)).filter_by(recipient_id=1)
+                    .order_by(Message.timestamp.desc()).all(),
+                    lambda: readmodels.inbox(1),
+                ),
+                "view_submissions": (
+                    lambda: Submission.query.options(joinedload(Submission.student),
+                                                     joinedload(Submission.latest_version),
+                                                     undefer(Submission.is_late))
+                    .filter_by(assignment_id=1).all(),
+                    lambda: readmodels.submissions(1),
+                ),
+            }
+            results = {}
+            for name, (orm_load, read_load) in cases.items():
+                orm_time, orm_peak = measure(db, orm_load, args.repeat)
+                read_time, read_peak = measure(db, read_load, args.repeat)
+                results[name] = {
+                    "orm_ms_median": round(orm_time * 1000, 2),
+                    "readmodel_ms_median": round(read_time * 1000, 2),
+                    "speedup": round(orm_time / read_time, 2) if read_time else None,
+                    "orm_peak_kib": round(orm_peak / 1024),
+                    "readmodel_peak_kib": round(read_peak / 1024),
+                    "memory_ratio": round(orm_peak / read_peak, 2) if read_peak else None,
+                }
+
+    print(json.dumps({"benchmark": "readmodels", "rows": args.rows, "body_bytes": args.body_bytes,
+                      "repeat": args.repeat, "results": results}, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: the LSH suspicious-pairs report against comparing every pair
+
+Usage:
+    python -m benchmarks.bench_similarity [--submissions 2000] [--words 400] [--copies 20]
+
+Seeds one assignment with --submissions essays of --words random words. --copies
+of them are lightly edited copies of another essay. It times indexing (signature
+and buckets per submission, as done at submit time), the LSH report, and an
+all-pairs comparison of the same signatures, and checks that both find the same
+copied pairs.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+from itertools import combinations
+
+
+def essays(count, words, copies, seed=131):
+    rng = random.Random(seed)
+    vocabulary = [f"word{n}" for n in range(2000)]
+    texts = [" ".join(rng.choice(vocabulary) for _ in range(words)) for _ in range(count - copies)]
+    for n in range(copies):
+        tokens = texts[n].split()
+        tokens[rng.randrange(len(tokens))] = "edited"
+        texts.append(" ".join(tokens))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--copies", type=int, default=20)
+    args = parser.parse_args()
+
+    from .harness import bench_app
+
+    with bench_app(CACHE_TYPE="null") as app:
+        from werkzeug.security import generate_password_hash
+        from app import similarity
+        from app.models import db, User, Course, Assignment, Submission, SubmissionSignature
+
+        with app.app_context():
+            password_hash = generate_password_hash("bench-password")
+            texts = essays(args.submissions, args.words, args.copies)
+            db.session.execute(db.insert(User), [
+                {"id": 1 + n, "username": f"student{n}", "email": f"student{n}@example.com", "role": "student",
+                 "password_hash": password_hash} for n in range(len(texts))])
+            db.session.execute(db.insert(Course), [{"id": 1, "title": "Bench Course", "code": "BENCH1", "teacher": 1}])
+            db.session.execute(db.insert(Assignment), [{"id": 1, "title": "Bench HW", "due_date": datetime(2025, 1, 1),
+                                                         "assignment_type": "homework", "course_id": 1}])
+            db.session.execute(db.insert(Submission), [
+                {"id": 1 + n, "assignment_id": 1, "student_id": 1 + n, "content": text}
+                for n, text in enumerate(texts)])
+            db.session.commit()
+
+            start = time.perf_counter()
+            for n, text in enumerate(texts):
+                similarity.index(1 + n, 1, text)
+            db.session.commit()
+            index_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            report = similarity.suspicious_pairs(1)
+            lsh_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            signatures = {submission_id: similarity.unpack(blob) for submission_id, blob in db.session.execute(
+                db.select(SubmissionSignature.submission_id, SubmissionSignature.signature))}
+            threshold = app.config["SIMILARITY_THRESHOLD"]
+            brute = {(a, b) for a, b in combinations(sorted(signatures), 2)
+                     if similarity.estimate(signatures[a], signatures[b]) >= threshold}
+            all_pairs_seconds = time.perf_counter() - start
+
+    found = {(pair.first_id, pair.second_id) for pair in report}
+    print(json.dumps({
+        "benchmark": "similarity", "submissions": args.submissions, "words": args.words, "copies": args.copies,
+        "index_ms_per_submission": round(index_seconds * 1000 / len(texts), 2),
+        "lsh_report_ms": round(lsh_seconds * 1000, 1),
+        "all_pairs_ms": round(all_pairs_seconds * 1000, 1),
+        "pairs_found": len(found), "all_pairs_found": len(brute), "missed": len(brute - found),
+    }, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Deterministic synthetic data generator for benchmarks.
+
+Every row is written with an explicit primary key through bulk INSERTs, and all
+randomness comes from one seeded random.Random, so the same Scale always
+produces the same database.
+"""
+import random
+from dataclasses import dataclass, asdict, replace
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.security import generate_password_hash
+
+PASSWORD = "password123"
+EPOCH = datetime(2025, 9, 1, 9, 0, 0)  # fixed "now" so generated dates are reproducible
+
+
+@dataclass(frozen=True)
+class Scale:
+    students: int = 200
+    instructors: int = 5
+    tas: int = 10
+    courses: int = 20
+    enrollments_per_student: int = 4
+    tas_per_course: int = 1
+    assignments_per_course: int = 10
+    submission_rate: float = 0.8  # share of (student, assignment) pairs that were submitted
+    graded_rate: float = 0.6  # share of submissions that have a grade
+    messages_per_user: int = 3
+    announcements_per_course: int = 3
+    seed: int = 131
+
+    def as_dict(self):
+        return asdict(self)
+
+
+SCALES = {
+    "tiny": Scale(students=20, instructors=2, tas=2, courses=4, enrollments_per_student=2,
+                  assignments_per_course=4, messages_per_user=1, announcements_per_course=1),
+    "small": Scale(),
+    "medium": Scale(students=1000, instructors=20, tas=40, courses=80, enrollments_per_student=5,
+                    assignments_per_course=15),
+    "large": Scale(students=5000, instructors=50, tas=100, courses=250, enrollments_per_student=5,
+                   assignments_per_course=20, messages_per_user=5),
+}
+
+
+def get_scale(name, **overrides):
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    return replace(SCALES[name], **overrides)
+
+
+def _bulk_insert(db, model, rows, chunk=5000):
+    for start in range(0, len(rows), chunk):
+        db.session.execute(db.insert(model), rows[start:start + chunk])
+
+
+def generate(db, scale):
+    """Populate an empty database and return ids of representative rows.
+
+    User 1 is an instructor who teaches course 1; the first student is enrolled in
+    course 1 and the first TA assists it, so route benchmarks always have a
+    permitted target for every role.
+    """
+    from app.models import (User, Course, Enrollment, TAAssignment, Assignment, Submission, SubmissionVersion,
+                            Message, Announcement)
+
+    rng = random.Random(scale.seed)
+    password_hash = generate_password_hash(PASSWORD)  # hashing is slow: do it once for every row
+
+    users = []
+    instructor_ids, student_ids, ta_ids = [], [], []
+    for role, count, bucket in (("instructor", scale.instructors, instructor_ids),
+                                ("student", scale.students, student_ids),
+                                ("ta", scale.tas, ta_ids)):
+        for i in range(count):
+            user_id = len(users) + 1
+            users.append({"id": user_id, "username": f"{role}{i}", "email": f"{role}{i}@example.com",
+                          "role": role, "password_hash": password_hash})
+            bucket.append(user_id)
+    _bulk_insert(db, User, users)
+
+    courses = []
+    for c in range(scale.courses):
+        courses.append({"id": c + 1, "title": f"Course {c:04d}", "code": f"BENCH{c:04d}",
+                        "description": f"Synthetic course {c}",
+                        "teacher": instructor_ids[c % len(instructor_ids)]})
+    _bulk_insert(db, Course, courses)
+    course_ids = [c["id"] for c in courses]
+
+    enrollments = []
+    enrolled = {}  # student id -> course ids
+    per_student = min(scale.enrollments_per_student, len(course_ids))
+    for s, student_id in enumerate(student_ids):
+        picks = rng.sample(course_ids, per_student)
+        if s == 0 and 1 not in picks:
+            picks[0] = 1
+        enrolled[student_id] = sorted(picks)
+        for course_id in enrolled[student_id]:
+            enrollments.append({"id": len(enrollments) + 1, "student_id": student_id, "course_id": course_id})
+    _bulk_insert(db, Enrollment, enrollments)
+
+    ta_rows = []
+    if ta_ids:
+        for c, course_id in enumerate(course_ids):
+            for j in range(min(scale.tas_per_course, len(ta_ids))):
+                ta_rows.append({"id": len(ta_rows) + 1, "ta_id": ta_ids[(c * scale.tas_per_course + j) % len(ta_ids)],
+                                "course_id": course_id})
+    _bulk_insert(db, TAAssignment, ta_rows)
+
+    assignments = []
+    course_assignments = {course_id: [] for course_id in course_ids}
+    kinds = ("homework", "homework", "quiz", "exam")
+    for course_id in course_ids:
+        for a in range(scale.assignments_per_course):
+            due = EPOCH + timedelta(days=7 * a + rng.randint(0, 6))
+            assignment_id = len(assignments) + 1
+            assignments.append({"id": assignment_id, "title": f"Assignment {a} (course {course_id})",
+                                "description": "Synthetic assignment", "due_date": due.replace(tzinfo=timezone.utc),
+                                "assignment_type": kinds[a % len(kinds)], "course_id": course_id})
+            course_assignments[course_id].append((assignment_id, due))
+    _bulk_insert(db, Assignment, assignments)
+
+    submissions, versions = [], []
+    for student_id in student_ids:
+        for course_id in enrolled[student_id]:
+            for assignment_id, due in course_assignments[course_id]:
+                if rng.random() >= scale.submission_rate:
+                    continue
+                submitted_at = due - timedelta(hours=rng.randint(-24, 72))
+                graded = rng.random() < scale.graded_rate
+                submission_id = len(submissions) + 1
+                attempts = 1 + (student_id + assignment_id) % 4 // 3  # every 4th pair resubmitted
+                for number in range(1, attempts + 1):
+                    versions.append({"id": len(versions) + 1, "submission_id": submission_id, "number": number,
+                                     "content": f"Answer from {student_id}",
+                                     "submitted_at": submitted_at - timedelta(hours=attempts - number)})
+                submissions.append({"id": submission_id, "assignment_id": assignment_id,
+                                    "student_id": student_id, "content": f"Answer from {student_id}",
+                                    "submitted_at": submitted_at, "attempts": attempts,
+                                    "latest_version_id": len(versions),
+                                    "grade": round(rng.uniform(50, 100), 1) if graded else None,
+                                    "feedback": "Good work" if graded else None})
+    _bulk_insert(db, Submission, submissions)
+    _bulk_insert(db, SubmissionVersion, versions)
+
+    messages = []
+    all_ids = [u["id"] for u in users]
+    for sender_id in all_ids:
+        for m in range(scale.messages_per_user):
+            recipient_id = rng.choice(all_ids)
+            if recipient_id == sender_id:
+                continue
+            messages.append({"id": len(messages) + 1, "sender_id": sender_id, "recipient_id": recipient_id,
+                             "subject": f"Message {m}", "body": "Synthetic message body",
+                             "timestamp": EPOCH + timedelta(minutes=len(messages)),
+                             "read": rng.random() < 0.5})
+    _bulk_insert(db, Message, messages)
+
+    announcements = []
+    for course in courses:
+        for n in range(scale.announcements_per_course):
+            announcements.append({"id": len(announcements) + 1, "course_id": course["id"],
+                                  "author_id": course["teacher"], "title": f"Announcement {n}",
+                                  "content": "Synthetic announcement",
+                                  "timestamp": EPOCH + timedelta(days=n)})
+    _bulk_insert(db, Announcement, announcements)
+
+    db.session.commit()
+
+    first_student = student_ids[0] if student_ids else None
+    course1_assignments = {assignment_id for assignment_id, _ in course_assignments.get(1, [])}
+    course1_submission = next((s for s in submissions if s["assignment_id"] in course1_assignments), None)
+    student_message = next((m for m in messages if first_student in (m["sender_id"], m["recipient_id"])), None)
+    return {
+        "counts": {"users": len(users), "courses": len(courses), "enrollments": len(enrollments),
+                   "ta_assignments": len(ta_rows), "assignments": len(assignments),
+                   "submissions": len(submissions), "submission_versions": len(versions), "messages": len(messages),
+                   "announcements": len(announcements)},
+        "instructor_id": instructor_ids[0] if instructor_ids else None,
+        "student_id": first_student,
+        "ta_id": ta_ids[0] if ta_ids else None,
+        "student_ids": student_ids,
+        "course_id": 1,
+        "assignment_id": min(course1_assignments) if course1_assignments else None,
+        "submission_id": course1_submission["id"] if course1_submission else None,
+        "message_id": student_message["id"] if student_message else None,
+    }
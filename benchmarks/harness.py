@@ -0,0 +1,43 @@
+"""
+Shared setup for benchmark scripts: a throwaway database and app instance
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+
+@contextmanager
+def bench_app(**config):
+    """Yield an app bound to a fresh temporary SQLite database.
+
+    The database URL has to be in the environment before app.config is first
+    imported, so benchmark scripts must not import the app package at module level.
+    No app context is held while the caller runs: test-client requests then get
+    their own context (and their own flask.g), as they would in production.
+    """
+    workdir = tempfile.mkdtemp(prefix="lms-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from app import create_app
+    from app.models import db
+
+    app = create_app()
+    app.config.update({
+        "TESTING": True,
+        "WTF_CSRF_ENABLED": False,
+        "RATELIMIT_ENABLED": False,  # benchmarks post from one address far faster than any user
+        "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+        **config,
+    })
+    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    try:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+        yield app
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
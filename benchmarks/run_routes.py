@@ -0,0 +1,331 @@
+"""
+Route benchmark: drive every main and auth route through the Flask test client
+
+Usage:
+    python -m benchmarks.run_routes [--scale small] [--iterations 20] [--output out.json]
+    python -m benchmarks.run_routes --compare baseline.json   # exit 1 on regressions
+
+Seeds a throwaway database with benchmarks.datagen, then times each route case
+and reports p50/p95 latency and the SQL query count (from the profiler's
+X-SQL-Query-Count header) as JSON with sorted keys, so two runs can be diffed.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from .datagen import PASSWORD, SCALES, get_scale
+
+
+class RouteCase:
+    """One request to time: who sends it, how, and with which data"""
+
+    def __init__(self, endpoint, role, method="GET", url=None, data=None, label=None, setup=None, headers=None,
+                 expect=None):
+        self.endpoint = endpoint
+        self.role = role  # "student", "instructor", "ta" or "anonymous"
+        self.method = method
+        self.url = url  # callable(ctx, i) -> str; defaults to url_for(endpoint)
+        self.data = data  # callable(ctx, i) -> dict
+        self.label = label
+        self.setup = setup  # callable(ctx, i) -> client, run untimed before the request
+        self.headers = headers  # callable(ctx, i) -> dict
+        self.expect = expect  # status every timed response must have, or None to record whatever comes back
+
+    @property
+    def name(self):
+        suffix = f" {self.label}" if self.label else ""
+        return f"{self.method} {self.endpoint} [{self.role}]{suffix}"
+
+
+def _url(endpoint, **params):
+    def build(ctx, i):
+        from flask import url_for
+        values = {key: (value(ctx, i) if callable(value) else value) for key, value in params.items()}
+        with ctx.app.test_request_context():
+            return url_for(endpoint, **values)
+    return build
+
+
+def _ds(key):
+    return lambda ctx, i: ctx.dataset[key]
+
+
+def _fresh_login(username):
+    def setup(ctx, i):
+        client = ctx.app.test_client()
+        client.post("/auth/login", data={"username": username, "password": PASSWORD})
+        return client
+    return setup
+
+
+def build_cases():
+    course = _ds("course_id")
+    assignment = _ds("assignment_id")
+    return [
+        # auth blueprint
+        RouteCase("auth.login", "anonymous"),
+        RouteCase("auth.login", "anonymous", "POST", setup=lambda ctx, i: ctx.app.test_client(),
+                  data=lambda ctx, i: {"username": "student0", "password": PASSWORD}),
+        RouteCase("auth.register", "anonymous"),
+        RouteCase("auth.register", "anonymous", "POST", setup=lambda ctx, i: ctx.app.test_client(),
+                  data=lambda ctx, i: {"username": f"newuser{i}", "email": f"newuser{i}@example.com",
+                                       "password": PASSWORD, "password_confirm": PASSWORD, "role": "student"}),
+        RouteCase("auth.logout", "student", setup=_fresh_login("student0")),
+        RouteCase("auth.forgot_password", "anonymous"),
+        RouteCase("auth.forgot_password", "anonymous", "POST",
+                  data=lambda ctx, i: {"email": "student0@example.com"}),
+        RouteCase("auth.reset_password", "anonymous", url=_url("auth.reset_password", token=lambda ctx, i: ctx.reset_token)),
+        RouteCase("auth.reset_password", "anonymous", "POST",
+                  url=_url("auth.reset_password", token=lambda ctx, i: ctx.reset_token),
+                  data=lambda ctx, i: {"password": PASSWORD, "password_confirm": PASSWORD}),
+
+        # main blueprint - pages
+        RouteCase("main.default", "student"),
+        RouteCase("main.index", "student"),
+        RouteCase("main.index", "instructor"),
+        RouteCase("main.index", "ta"),
+        RouteCase("main.calendar_feed", "anonymous", url=_url("main.calendar_feed", token=lambda ctx, i: ctx.calendar_token)),
+        # A fresh client: flashes left in the shared anonymous session by the auth cases turn off the ETag check
+        RouteCase("main.calendar_feed", "anonymous", url=_url("main.calendar_feed", token=lambda ctx, i: ctx.calendar_token),
+                  setup=lambda ctx, i: ctx.app.test_client(), headers=lambda ctx, i: {"If-None-Match": ctx.calendar_etag},
+                  label="If-None-Match", expect=304),
+        RouteCase("main.grades", "student"),
+        RouteCase("main.grades", "instructor"),
+        RouteCase("main.classes", "student"),
+        RouteCase("main.classes", "instructor"),
+        RouteCase("main.classes", "ta"),
+        RouteCase("main.assignments", "student"),
+        RouteCase("main.assignments", "student", url=_url("main.assignments", sort="due_date"), label="sort=due_date"),
+        RouteCase("main.assignments", "instructor"),
+        RouteCase("main.analytics", "student"),
+        RouteCase("main.teacher_portal", "instructor"),
+        RouteCase("main.view_course", "instructor", url=_url("main.view_course", course_id=course)),
+        RouteCase("main.deadline_report", "instructor", url=_url("main.deadline_report", course_id=course)),
+        RouteCase("main.course_gradebook", "instructor", url=_url("main.course_gradebook", course_id=course)),
+        RouteCase("main.grade_report", "instructor", url=_url("main.grade_report", course_id=course)),
+        RouteCase("main.manage_tas", "instructor", url=_url("main.manage_tas", course_id=course)),
+        RouteCase("main.submit_assignment", "student", url=_url("main.submit_assignment", assignment_id=assignment)),
+        RouteCase("main.download_file", "student", url=_url("main.download_file", filename="bench_upload.txt")),
+        RouteCase("main.view_submissions", "instructor", url=_url("main.view_submissions", assignment_id=assignment)),
+        RouteCase("main.view_submissions", "ta", url=_url("main.view_submissions", assignment_id=assignment)),
+        RouteCase("main.claim_next", "ta", "POST", url=_url("main.claim_next", assignment_id=assignment)),
+        RouteCase("main.grade_next", "ta", url=_url("main.grade_next", assignment_id=assignment)),
+        RouteCase("main.autograder_settings", "instructor",
+                  url=_url("main.autograder_settings", assignment_id=assignment)),
+        RouteCase("main.similarity_report", "instructor",
+                  url=_url("main.similarity_report", assignment_id=assignment)),
+        RouteCase("main.quiz_editor", "instructor", url=_url("main.quiz_editor", assignment_id=assignment)),
+        RouteCase("main.submission_history", "instructor",
+                  url=_url("main.submission_history", submission_id=_ds("submission_id"))),
+        RouteCase("main.messages", "student"),
+        RouteCase("main.sent_messages", "student"),
+        RouteCase("main.compose_message", "student"),
+        RouteCase("main.broadcast_message", "instructor"),
+        RouteCase("main.view_message", "student", url=_url("main.view_message", message_id=_ds("message_id"))),
+        RouteCase("main.announcements", "student"),
+        RouteCase("main.announcements", "instructor"),
+        RouteCase("main.create_announcement", "instructor"),
+        RouteCase("main.create_assignment", "instructor"),
+        RouteCase("main.create_course", "instructor"),
+        RouteCase("main.view_course_grades", "student", url=_url("main.view_course_grades", course_id=course)),
+
+        # main blueprint - writes
+        RouteCase("main.create_assignment", "instructor", "POST",
+                  data=lambda ctx, i: {"title": f"Bench assignment {i}", "description": "Created by benchmark",
+                                       "due_date": "2025-12-31", "assignment_type": "homework",
+                                       "course_id": ctx.dataset["course_id"]}),
+        RouteCase("main.create_course", "instructor", "POST",
+                  data=lambda ctx, i: {"name": f"Bench course {i}", "code": f"NEW{i:05d}",
+                                       "description": "Created by benchmark", "image_url": ""}),
+        RouteCase("main.enroll_student", "instructor", "POST", url=_url("main.enroll_student", course_id=course),
+                  data=lambda ctx, i: {"student_identifier": f"student{(i % 5) + 1}"}),
+        RouteCase("main.manage_tas", "instructor", "POST", url=_url("main.manage_tas", course_id=course),
+                  data=lambda ctx, i: {"ta_id": ctx.dataset["ta_id"], "course_id": ctx.dataset["course_id"]}),
+        RouteCase("main.remove_ta", "instructor", "POST",
+                  url=_url("main.remove_ta", course_id=course, ta_id=lambda ctx, i: ctx.dataset["ta_id"] + 1)),
+        RouteCase("main.submit_assignment", "student", "POST",
+                  url=_url("main.submit_assignment", assignment_id=assignment),
+                  data=lambda ctx, i: {"content": f"Resubmission {i}"}),
+        RouteCase("main.grade_submission", "instructor", "POST",
+                  url=_url("main.grade_submission", submission_id=_ds("submission_id")),
+                  data=lambda ctx, i: {"grade": str(60 + i % 40), "feedback": "Benchmark feedback"}),
+        RouteCase("main.compose_message", "student", "POST",
+                  data=lambda ctx, i: {"recipient_id": ctx.dataset["instructor_id"], "subject": f"Bench {i}",
+                                       "body": "Benchmark message"}),
+        RouteCase("main.broadcast_message", "instructor", "POST",
+                  data=lambda ctx, i: {"course_id": ctx.dataset["course_id"], "subject": f"Bench {i}",
+                                       "body": "Benchmark broadcast"}),
+        RouteCase("main.create_announcement", "instructor", "POST",
+                  data=lambda ctx, i: {"course_id": ctx.dataset["course_id"], "title": f"Bench {i}",
+                                       "content": "Benchmark announcement"}),
+    ]
+
+
+class Context:
+    def __init__(self, app, dataset):
+        self.app = app
+        self.dataset = dataset
+        self.clients = {"anonymous": app.test_client()}
+        for role, username in (("student", "student0"), ("instructor", "instructor0"), ("ta", "ta0")):
+            client = app.test_client()
+            client.post("/auth/login", data={"username": username, "password": PASSWORD})
+            self.clients[role] = client
+        from app.models import User
+        with app.app_context():
+            student = User.query.filter_by(username="student0").first()
+            self.reset_token = student.get_reset_token()
+            self.calendar_token = student.get_calendar_token()
+        with app.test_request_context():
+            from flask import url_for
+            calendar_url = url_for("main.calendar_feed", token=self.calendar_token)
+        self.calendar_etag = self.clients["anonymous"].get(calendar_url).headers.get("ETag")
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))  # ceil without floats
+    return ordered[int(rank) - 1]
+
+
+def run_case(ctx, case, iterations, warmup):
+    latencies, queries, statuses = [], [], set()
+    for i in range(warmup + iterations):
+        client = case.setup(ctx, i) if case.setup else ctx.clients[case.role]
+        url = case.url(ctx, i) if case.url else _url(case.endpoint)(ctx, i)
+        kwargs = {"data": case.data(ctx, i)} if case.data else {}
+        if case.headers:
+            kwargs["headers"] = case.headers(ctx, i)
+        start = time.perf_counter()
+        response = client.open(url, method=case.method, **kwargs)
+        elapsed = time.perf_counter() - start
+        response.close()
+        if i < warmup:
+            continue
+        assert case.expect in (None, response.status_code), f"{case.name}: {response.status_code}"
+        latencies.append(elapsed * 1000)
+        statuses.add(response.status_code)
+        if "X-SQL-Query-Count" in response.headers:
+            queries.append(int(response.headers["X-SQL-Query-Count"]))
+    return {
+        "endpoint": case.endpoint,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "max_ms": round(max(latencies), 3),
+        "queries": percentile(queries, 50) if queries else None,
+        "status": sorted(statuses),
+    }
+
+
+def compare(current, baseline, max_slowdown, min_delta_ms):
+    """Routes that got slower (p95) or issue more queries than the baseline"""
+    regressions = []
+    for name, now in sorted(current["routes"].items()):
+        before = baseline.get("routes", {}).get(name)
+        if before is None:
+            continue
+        if now["p95_ms"] > before["p95_ms"] * max_slowdown and now["p95_ms"] - before["p95_ms"] > min_delta_ms:
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {now['p95_ms']} ms")
+        if now["queries"] is not None and before["queries"] is not None and now["queries"] > before["queries"]:
+            regressions.append(f"{name}: queries {before['queries']} -> {now['queries']}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--students", type=int)
+    parser.add_argument("--courses", type=int)
+    parser.add_argument("--enrollments-per-student", type=int)
+    parser.add_argument("--assignments-per-course", type=int)
+    parser.add_argument("--submission-rate", type=float)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--cache", choices=["memory", "null"], default="memory",
+                        help="page cache backend; 'null' measures the uncached render path")
+    parser.add_argument("--only", help="run only cases whose name contains this text")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--max-slowdown", type=float, default=1.25)
+    parser.add_argument("--min-delta-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    scale = get_scale(args.scale, students=args.students, courses=args.courses,
+                      enrollments_per_student=args.enrollments_per_student,
+                      assignments_per_course=args.assignments_per_course,
+                      submission_rate=args.submission_rate, seed=args.seed)
+    os.environ["CACHE_TYPE"] = args.cache
+    logging.getLogger("app.sql_profile").setLevel(logging.ERROR)  # the headers carry what we need
+
+    from .harness import bench_app
+    from .datagen import generate
+
+    with bench_app(SQL_PROFILER_ENABLED=True) as app:
+        from app.models import db
+
+        start = time.perf_counter()
+        with app.app_context():
+            dataset = generate(db, scale)
+        seed_seconds = time.perf_counter() - start
+        with open(os.path.join(app.config["UPLOAD_FOLDER"], "bench_upload.txt"), "w") as fh:
+            fh.write("benchmark upload\n")
+
+        ctx = Context(app, dataset)
+        cases = build_cases()
+        if args.only:
+            cases = [case for case in cases if args.only in case.name]
+        routes = {}
+        for case in cases:
+            routes[case.name] = run_case(ctx, case, args.iterations, args.warmup)
+
+        blueprint_endpoints = {rule.endpoint for rule in app.url_map.iter_rules()
+                               if rule.endpoint.split(".")[0] in ("main", "auth")}
+        uncovered = sorted(blueprint_endpoints - {case.endpoint for case in build_cases()})
+
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "scale": scale.as_dict(),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "cache": args.cache,
+            "rows": dataset["counts"],
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "routes": routes,
+        "uncovered_endpoints": uncovered,
+    }
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare(result, baseline, args.max_slowdown, args.min_delta_ms)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,7 @@ Pytest configuration and fixtures
 import pytest
 import os
 import tempfile
+from flask import g, request_finished
 from app import create_app
 from app.models import db, User, Course, Assignment
 
@@ -19,6 +20,7 @@ def app():
         'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
         'WTF_CSRF_ENABLED': False,
         'SECRET_KEY': 'test-secret-key',
+        'RAISE_ON_TEMPLATE_LAZYLOAD': True,
     })
     
     with test_app.app_context():
@@ -31,6 +33,38 @@ def app():
     os.unlink(db_path)
 
 
+@pytest.fixture
+def query_budget(app):
+    """Turn on the SQL profiler and assert per-route query budgets
+    
+    Usage: query_budget.check(client.get('/classes'), max_queries=6)
+    """
+    app.config['SQL_PROFILER_ENABLED'] = True
+    budget = QueryBudget()
+    
+    def capture(sender, response, **extra):
+        budget.last = g.get('sql_profile_summary')
+    
+    request_finished.connect(capture, app)
+    yield budget
+    request_finished.disconnect(capture, app)
+
+
+class QueryBudget:
+    """Reads the profiler's report for the most recent request"""
+    
+    def __init__(self):
+        self.last = None
+    
+    def check(self, response, max_queries):
+        count = int(response.headers['X-SQL-Query-Count'])
+        repeated = [f"x{d['count']} {d['statement']}" for d in (self.last or {}).get('duplicates', [])]
+        assert count <= max_queries, (
+            f"{count} queries, budget is {max_queries}. Repeated statements:\n" + "\n".join(repeated)
+        )
+        return count
+
+
 @pytest.fixture
 def client(app):
     """Test client for making requests"""
@@ -0,0 +1,103 @@
+"""
+Tests for the home page agenda: upcoming and overdue-unsubmitted deadlines, cached per user
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event
+
+from app import agenda
+from app.cache import bump_version, course_scope, user_scope
+from app.models import db, User, Assignment, Enrollment, Submission
+
+
+@pytest.fixture
+def enrolled(app, sample_course, student_user):
+    """teststudent enrolled in CS101 with assignments due relative to now; returns ids"""
+    now = datetime.now(timezone.utc)
+    with app.app_context():
+        student = User.query.filter_by(username='teststudent').first()
+        db.session.add(Enrollment(student_id=student.id, course_id=sample_course.id))
+        due = {
+            'next': now + timedelta(days=1),
+            'later': now + timedelta(days=3),
+            'latest': now + timedelta(days=5),
+            'overdue': now - timedelta(days=2),
+            'submitted_overdue': now - timedelta(days=1),
+            'ancient': now - timedelta(days=400),
+        }
+        ids = {}
+        for title, due_date in due.items():
+            assignment = Assignment(title=title, description='Work', due_date=due_date, course_id=sample_course.id)
+            db.session.add(assignment)
+            db.session.flush()
+            ids[title] = assignment.id
+        db.session.add(Submission(assignment_id=ids['submitted_overdue'], student_id=student.id))
+        db.session.commit()
+        return {'student_id': student.id, 'course_id': sample_course.id, **ids}
+
+
+def titles(items):
+    return [item['title'] for item in items]
+
+
+class TestAgenda:
+    """Only the next deadlines and overdue unsubmitted work are listed"""
+
+    def test_upcoming_and_overdue_lists(self, app, enrolled):
+        app.config['AGENDA_SIZE'] = 2
+        with app.app_context():
+            student = db.session.get(User, enrolled['student_id'])
+            items = agenda.for_user(student, [enrolled['course_id']])
+        assert titles(items['upcoming']) == ['next', 'later']
+        assert titles(items['overdue']) == ['overdue']  # submitted and long-past work is left out
+
+    def test_submitted_upcoming_work_drops_out(self, app, enrolled):
+        with app.app_context():
+            db.session.add(Submission(assignment_id=enrolled['next'], student_id=enrolled['student_id']))
+            db.session.commit()
+            student = db.session.get(User, enrolled['student_id'])
+            assert 'next' not in titles(agenda.build(student, [enrolled['course_id']])['upcoming'])
+
+    def test_cached_until_a_scope_is_bumped(self, app, enrolled):
+        with app.app_context():
+            student = db.session.get(User, enrolled['student_id'])
+            agenda.for_user(student, [enrolled['course_id']])
+            statements = []
+            record = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                again = agenda.for_user(student, [enrolled['course_id']])
+                assert statements == []
+                db.session.add(Submission(assignment_id=enrolled['later'], student_id=student.id))
+                db.session.commit()
+                bump_version(user_scope(student.id))  # as submit_assignment does
+                statements.clear()
+                fresh = agenda.for_user(student, [enrolled['course_id']])
+                assert statements
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        assert 'later' in titles(again['upcoming'])
+        assert 'later' not in titles(fresh['upcoming'])
+
+    def test_cache_expires_at_next_deadline(self, app):
+        now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        items = {'upcoming': [{'due_date': (now + timedelta(seconds=90)).isoformat()}], 'overdue': []}
+        with app.app_context():
+            assert agenda._expires_in(items, now) == 90
+
+    def test_home_page_shows_agenda(self, app, enrolled, authenticated_client):
+        response = authenticated_client.get('/home')
+        assert response.status_code == 200
+        assert b'Overdue' in response.data
+        assert b'next' in response.data
+        assert b'ancient' not in response.data
+
+    def test_new_assignment_appears_on_home(self, app, enrolled, authenticated_client):
+        assert b'Brand New Lab' not in authenticated_client.get('/home').data
+        with app.app_context():
+            db.session.add(Assignment(title='Brand New Lab', description='Fresh', due_date='2099-01-01',
+                                      course_id=enrolled['course_id']))
+            db.session.commit()
+            bump_version(course_scope(enrolled['course_id']))  # as create_assignment does
+        assert b'Brand New Lab' in authenticated_client.get('/home').data
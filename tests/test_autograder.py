@@ -0,0 +1,205 @@
+"""
+Tests for the autograder: sandboxed harness runs, the job queue and the pages
+"""
+import io
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import autograder, create_app
+from app.config import Config
+from app.models import db, Assignment, AutogradeJob, Submission, User
+
+HARNESS = """
+import runpy, io, contextlib
+out = io.StringIO()
+with contextlib.redirect_stdout(out):
+    module = runpy.run_path("submission.py")
+print("add(2, 3) ->", module["add"](2, 3))
+print("SCORE:", 100 if module["add"](2, 3) == 5 else 0)
+"""
+
+
+def spec(tmp_path, harness, source="def add(a, b):\n    return a + b\n", **limits):
+    path = tmp_path / "blob"
+    path.write_text(source)
+    limit = autograder.limits({})
+    limit.update(limits)
+    return {"job_id": 1, "file_path": str(path), "file_name": "solution.py", "content": "notes",
+            "harness": harness, "limits": limit}
+
+
+class TestRunOne:
+    """One harness run in its own directory and process"""
+
+    def test_score_and_output(self, tmp_path):
+        result = autograder.run_one(spec(tmp_path, HARNESS))
+        assert (result["status"], result["score"]) == ("done", 100.0)
+        assert "add(2, 3) -> 5" in result["output"]
+
+    def test_files_are_staged(self, tmp_path):
+        harness = "import os; print(sorted(os.listdir('.'))); print(open('notes.txt').read()); print('SCORE: 150')"
+        result = autograder.run_one(spec(tmp_path, harness))
+        assert "['harness.py', 'notes.txt', 'solution.py', 'submission.py']" in result["output"]
+        assert result["score"] == 100.0  # clamped
+
+    def test_missing_score_is_an_error(self, tmp_path):
+        result = autograder.run_one(spec(tmp_path, "raise SystemExit('boom')"))
+        assert (result["status"], result["score"]) == ("error", None)
+        assert "boom" in result["output"]
+
+    def test_wall_clock_timeout(self, tmp_path):
+        result = autograder.run_one(spec(tmp_path, "import time; time.sleep(30)", wall_seconds=1))
+        assert result["status"] == "error" and result["output"].startswith("Timed out")
+        assert result["seconds"] < 10
+
+    @pytest.mark.skipif(autograder.resource is None, reason="rlimits need a POSIX system")
+    def test_cpu_limit(self, tmp_path):
+        result = autograder.run_one(spec(tmp_path, "while True: pass", cpu_seconds=1, wall_seconds=20))
+        assert result["status"] == "error" and result["output"].startswith("Killed by signal")
+
+    def test_environment_is_scrubbed(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("SECRET_KEY", "do-not-leak")
+        result = autograder.run_one(spec(tmp_path, "import os; print(dict(os.environ)); print('SCORE: 1')"))
+        assert "do-not-leak" not in result["output"]
+
+    def test_output_is_truncated(self, tmp_path):
+        result = autograder.run_one(spec(tmp_path, "print('x' * 50000); print('SCORE: 5')", output_bytes=100))
+        assert len(result["output"]) <= 100 and result["score"] == 5.0
+
+
+@pytest.fixture
+def autograded(app, sample_assignment, tmp_path):
+    """Three .py submissions to an assignment with HARNESS attached; one of them is wrong"""
+    folder = app.config['UPLOAD_FOLDER'] = str(tmp_path / 'uploads')
+    os.makedirs(folder)
+    with app.app_context():
+        assignment = db.session.get(Assignment, sample_assignment.id)
+        assignment.autograde_harness = HARNESS
+        ids = []
+        for i, body in enumerate(["return a + b", "return a + b", "return a - b"]):
+            student = User(username=f'coder{i}', email=f'coder{i}@test.com', role='student')
+            student.set_password('password123')
+            db.session.add(student)
+            db.session.flush()
+            name = f'autograde_test_{student.id}.py'
+            with open(os.path.join(folder, name), 'w') as source:
+                source.write(f"def add(a, b):\n    {body}\n")
+            submission = Submission(assignment_id=assignment.id, student_id=student.id, file_path=name)
+            db.session.add(submission)
+            db.session.flush()
+            ids.append(submission.id)
+        db.session.commit()
+        return {'assignment_id': assignment.id, 'submission_ids': ids}
+
+
+class TestQueue:
+    """Jobs are queued in batches and their results written back to the submissions"""
+
+    def test_regrade_all_runs_as_a_batch(self, app, autograded):
+        with app.app_context():
+            assert autograder.enqueue(autograded['assignment_id']) == 3
+            assert autograder.enqueue(autograded['assignment_id']) == 0  # already queued
+            db.session.commit()
+            assert autograder.run_pending(workers=2) == 3
+            grades = [db.session.get(Submission, i).grade for i in autograded['submission_ids']]
+            assert grades == [100.0, 100.0, 0.0]
+            assert db.session.get(Submission, autograded['submission_ids'][0]).feedback.startswith("Autograder: 100/100")
+            assert autograder.status_counts(autograded['assignment_id']) == {'done': 3}
+            assert autograder.run_pending(workers=2) == 0
+
+    def test_claim_takes_each_job_once(self, app, autograded):
+        with app.app_context():
+            autograder.enqueue(autograded['assignment_id'])
+            first, second = autograder.claim(2), autograder.claim(2)
+            assert len(first) == 2 and len(second) == 1 and not set(first) & set(second)
+            assert autograder.claim(2) == []
+
+    def test_abandoned_running_jobs_are_reclaimed(self, app, autograded):
+        """A job a killed worker left running is claimed again once it is stale, and not before"""
+        with app.app_context():
+            autograder.enqueue(autograded['assignment_id'])
+            started = datetime(2025, 1, 1)
+            job_ids = autograder.claim(3, now=started)
+            db.session.commit()
+            stale = timedelta(seconds=autograder.stale_after(app.config))
+            assert autograder.claim(3, now=started + stale - timedelta(seconds=1)) == []
+            assert sorted(autograder.claim(3, now=started + stale + timedelta(seconds=1))) == sorted(job_ids)
+            db.session.commit()
+            assert autograder.run_pending(workers=1) == 3  # a restarted worker picks them up
+            assert autograder.status_counts(autograded['assignment_id']) == {'done': 3}
+
+    def test_failed_run_keeps_grade(self, app, autograded):
+        with app.app_context():
+            submission_id = autograded['submission_ids'][0]
+            db.session.get(Submission, submission_id).grade = 42.0
+            db.session.get(Assignment, autograded['assignment_id']).autograde_harness = "print('no score')"
+            autograder.enqueue(autograded['assignment_id'], [submission_id])
+            db.session.commit()
+            autograder.run_pending(workers=1)
+            job = AutogradeJob.query.filter_by(submission_id=submission_id).one()
+            assert job.status == 'error' and 'without a SCORE line' in job.output
+            assert db.session.get(Submission, submission_id).grade == 42.0
+
+
+class TestPages:
+    """Instructors attach a harness; student hand-ins are queued"""
+
+    def test_instructor_saves_harness_and_regrades(self, app, authenticated_teacher_client, autograded):
+        url = f"/assignment/{autograded['assignment_id']}/autograder"
+        response = authenticated_teacher_client.post(url, data={'harness': "print('SCORE: 50')"},
+                                                     follow_redirects=True)
+        assert b'Autograder harness saved.' in response.data
+        response = authenticated_teacher_client.post(f"/assignment/{autograded['assignment_id']}/regrade",
+                                                     follow_redirects=True)
+        assert b'Queued 3 submissions for autograding.' in response.data
+        assert b'<strong>Queued:</strong> 3' in response.data
+
+    def test_students_cannot_configure(self, app, authenticated_client, autograded):
+        response = authenticated_client.get(f"/assignment/{autograded['assignment_id']}/autograder",
+                                            follow_redirects=True)
+        assert b'Only the course instructor can configure the autograder.' in response.data
+
+    def test_submission_is_queued(self, app, authenticated_client, autograded):
+        response = authenticated_client.post(
+            f"/submit_assignment/{autograded['assignment_id']}",
+            data={'content': 'done', 'idempotency_key': 'k1',
+                  'file': (io.BytesIO(b"def add(a, b):\n    return a + b\n"), 'mine.py')},
+            content_type='multipart/form-data', follow_redirects=True)
+        assert b'submitted successfully' in response.data
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            submission = Submission.query.filter_by(student_id=student.id).one()
+            (job,) = AutogradeJob.query.filter_by(submission_id=submission.id).all()
+            assert job.status == 'queued'
+            autograder.run_pending(workers=1)
+            assert db.session.get(Submission, submission.id).grade == 100.0
+
+
+class TestMigration:
+    """Older databases get the harness column, empty"""
+
+    def test_adds_harness_column(self, tmp_path):
+        path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE assignment (id INTEGER NOT NULL, title VARCHAR(128) NOT NULL, description TEXT,
+                                     due_date DATETIME NOT NULL, assignment_type VARCHAR(32) NOT NULL,
+                                     course_id INTEGER, updated_at DATETIME, PRIMARY KEY (id));
+            INSERT INTO assignment (id, title, due_date, assignment_type)
+                VALUES (1, 'Old HW', '2025-03-01 12:00:00.000000', 'homework');
+        """)
+        conn.close()
+
+        class LegacyConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            CACHE_TYPE = 'null'
+            TESTING = True
+
+        app = create_app(LegacyConfig)
+        with app.app_context():
+            assert db.session.get(Assignment, 1).autograde_harness is None
+            for engine in db.engines.values():
+                engine.dispose()
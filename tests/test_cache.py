@@ -0,0 +1,103 @@
+"""
+Unit and integration tests for the rendered-page cache
+"""
+import pytest
+from app.cache import LRUCache, SQLiteCache, get_cache
+from app.models import db, User, Enrollment
+
+
+class TestCacheBackends:
+    """Test the in-memory and SQLite cache backends"""
+    
+    def test_lru_evicts_least_recently_used(self):
+        """Test that the LRU backend stays within max_entries"""
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 'A')
+        cache.set('b', 'B')
+        assert cache.get('a') == 'A'  # 'a' is now most recently used
+        cache.set('c', 'C')
+        
+        assert cache.get('b') is None
+        assert cache.get('a') == 'A'
+        assert cache.get('c') == 'C'
+    
+    def test_lru_entries_expire(self):
+        """Test that entries are dropped once their TTL has passed"""
+        cache = LRUCache()
+        cache.set('a', 'A', timeout=-1)
+        assert cache.get('a') is None
+    
+    def test_sqlite_backend_shares_entries_and_versions(self, tmp_path):
+        """Test that two SQLite backends on the same file see each other's writes"""
+        path = str(tmp_path / 'cache.db')
+        first = SQLiteCache(path)
+        second = SQLiteCache(path)
+        
+        first.set('page', '<html>')
+        assert second.get('page') == '<html>'
+        
+        first.bump_versions(['course:1', 'course:1', 'user:2'])
+        assert second.get_versions(['course:1', 'user:2', 'user:3']) == [2, 1, 0]
+
+
+class TestPageCacheInvalidation:
+    """Integration tests for cached pages and write-route invalidation"""
+    
+    def test_repeat_visit_is_served_from_cache(self, authenticated_client, app, sample_course):
+        """Test that a second visit returns the stored page without re-running the view"""
+        first = authenticated_client.get('/classes')
+        assert first.status_code == 200
+        assert b'Test Course' not in first.data
+        
+        # Enroll behind the cache's back (no write route bumps the version)
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            db.session.add(Enrollment(student_id=student.id, course_id=sample_course.id))
+            db.session.commit()
+        second = authenticated_client.get('/classes')
+        assert second.data == first.data
+        
+        with app.app_context():
+            get_cache().clear()
+        third = authenticated_client.get('/classes')
+        assert b'Test Course' in third.data
+    
+    def test_enroll_student_invalidates_student_pages(self, client, app, student_user, sample_course):
+        """Test that enrolling a student makes their cached classes page stale"""
+        client.post('/auth/login', data={'username': 'teststudent', 'password': 'password123'})
+        response = client.get('/classes')
+        assert b'Test Course' not in response.data
+        client.get('/auth/logout')
+        
+        client.post('/auth/login', data={'username': 'testteacher', 'password': 'password123'})
+        client.post(f'/course/{sample_course.id}/enroll', data={'student_identifier': 'teststudent'})
+        client.get('/auth/logout')
+        
+        client.post('/auth/login', data={'username': 'teststudent', 'password': 'password123'})
+        response = client.get('/classes')
+        assert b'Test Course' in response.data
+    
+    def test_create_announcement_invalidates_course_members(self, authenticated_teacher_client, app, sample_course):
+        """Test that posting an announcement refreshes the announcements page"""
+        response = authenticated_teacher_client.get('/announcements')
+        assert b'Midterm info' not in response.data
+        
+        authenticated_teacher_client.post('/announcements/create', data={
+            'course_id': sample_course.id,
+            'title': 'Midterm info',
+            'content': 'Bring a pencil.'
+        })
+        response = authenticated_teacher_client.get('/announcements')
+        assert b'Midterm info' in response.data
+    
+    def test_pending_flash_bypasses_cache(self, authenticated_teacher_client, sample_course):
+        """Test that a page carrying a flash message is rendered fresh"""
+        authenticated_teacher_client.get('/classes')
+        response = authenticated_teacher_client.post('/create_course', data={
+            'name': 'Second Course',
+            'code': 'CS202',
+            'description': 'Another course',
+            'image_url': ''
+        }, follow_redirects=True)
+        assert b'Course created successfully' in response.data
+        assert b'Second Course' in response.data
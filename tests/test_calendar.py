@@ -0,0 +1,74 @@
+"""
+Tests for the per-user iCalendar deadline feed
+"""
+import pytest
+
+from app import ical
+from app.models import db, User, Assignment, Enrollment
+
+
+@pytest.fixture
+def feed_url(app, sample_assignment, student_user):
+    """Feed URL of teststudent, enrolled in the course of sample_assignment"""
+    with app.app_context():
+        student = User.query.filter_by(username='teststudent').first()
+        db.session.add(Enrollment(student_id=student.id, course_id=sample_assignment.course_id))
+        db.session.commit()
+        return f'/calendar/{student.get_calendar_token()}.ics'
+
+
+class TestIcalWriter:
+    """Text escaping and line folding follow RFC 5545"""
+
+    def test_escape(self):
+        assert ical.escape('a,b;c\\d\ne') == 'a\\,b\\;c\\\\d\\ne'
+
+    def test_long_lines_fold_at_75_octets(self):
+        folded = ical.fold('DESCRIPTION:' + 'é' * 100)
+        lines = folded.split('\r\n')
+        assert all(len(line.encode('utf-8')) <= 75 for line in lines)
+        assert ''.join(line[1:] if i else line for i, line in enumerate(lines)) == 'DESCRIPTION:' + 'é' * 100
+
+
+class TestCalendarFeed:
+    """The feed needs no login, streams events and answers repeat polls with 304"""
+
+    def test_feed_lists_course_deadlines(self, client, feed_url):
+        response = client.get(feed_url)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/calendar'
+        body = response.get_data(as_text=True)
+        assert body.startswith('BEGIN:VCALENDAR\r\n')
+        assert 'SUMMARY:CS101: Test Assignment\r\n' in body
+        assert 'DTSTART:20251231T235959Z\r\n' in body
+        assert body.endswith('END:VCALENDAR\r\n')
+
+    def test_feed_is_streamed(self, client, feed_url):
+        response = client.get(feed_url, buffered=False)
+        assert response.is_streamed
+        response.close()
+
+    def test_teacher_feed_covers_taught_courses(self, app, client, sample_assignment, teacher_user):
+        with app.app_context():
+            token = User.query.filter_by(username='testteacher').first().get_calendar_token()
+        assert b'Test Assignment' in client.get(f'/calendar/{token}.ics').data
+
+    def test_unchanged_feed_is_304_after_one_query(self, app, client, feed_url, query_budget):
+        etag = client.get(feed_url).headers['ETag']
+        response = client.get(feed_url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert query_budget.check(response, max_queries=1) == 1
+
+    def test_new_assignment_changes_etag(self, app, client, feed_url, sample_course):
+        etag = client.get(feed_url).headers['ETag']
+        with app.app_context():
+            db.session.add(Assignment(title='Midterm', description='Exam', due_date='2026-01-15',
+                                      assignment_type='exam', course_id=sample_course.id))
+            db.session.commit()
+        response = client.get(feed_url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert b'Midterm' in response.data
+
+    def test_bad_token_is_404(self, client, feed_url):
+        assert client.get('/calendar/not-a-token.ics').status_code == 404
+        assert client.get(feed_url.replace('.ics', 'x.ics')).status_code == 404
@@ -0,0 +1,134 @@
+"""
+Integration tests for ETag / conditional GET on read-only pages
+"""
+import sqlite3
+import time
+from datetime import datetime
+import pytest
+from sqlalchemy import inspect
+from app import create_app
+from app.config import Config
+from app.models import db, User, Course, Assignment, Enrollment, Submission
+from app.cache import bump_version, course_scope
+
+
+class TestConditionalGet:
+    """Test ETag validators on the main blueprint pages"""
+    
+    def test_pages_carry_validators(self, authenticated_client):
+        """Test that read-only pages send an ETag and must be revalidated"""
+        response = authenticated_client.get('/home')
+        assert response.status_code == 200
+        assert response.headers['ETag'].startswith('W/"')
+        assert 'no-cache' in response.headers['Cache-Control']
+        assert 'private' in response.headers['Cache-Control']
+    
+    def test_unchanged_page_returns_304(self, authenticated_client):
+        """Test that a matching If-None-Match short-circuits with 304"""
+        etag = authenticated_client.get('/assignments').headers['ETag']
+        
+        response = authenticated_client.get('/assignments', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        assert response.headers['ETag'] == etag
+    
+    def test_last_modified_and_if_modified_since(self, authenticated_client, app, sample_assignment):
+        """Test that Last-Modified comes from the fingerprint's table stamps and is honoured alone"""
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            db.session.add(Enrollment(student_id=student.id, course_id=sample_assignment.course_id))
+            db.session.commit()
+        response = authenticated_client.get('/assignments')
+        last_modified = response.headers['Last-Modified']
+        
+        response = authenticated_client.get('/assignments', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+        
+        with app.app_context():
+            db.session.get(Assignment, sample_assignment.id).updated_at = datetime(2099, 1, 1)
+            db.session.commit()
+        response = authenticated_client.get('/assignments', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 200
+        assert response.headers['Last-Modified'] == 'Thu, 01 Jan 2099 00:00:00 GMT'
+    
+    def test_new_assignment_changes_etag(self, authenticated_client, app, sample_course):
+        """Test that creating an assignment in an enrolled course invalidates the validator"""
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            db.session.add(Enrollment(student_id=student.id, course_id=sample_course.id))
+            db.session.commit()
+        etag = authenticated_client.get('/home').headers['ETag']
+        
+        with app.app_context():
+            db.session.add(Assignment(title='Fresh Homework', description='New', due_date='2099-12-31',
+                                      assignment_type='homework', course_id=sample_course.id))
+            db.session.commit()
+            bump_version(course_scope(sample_course.id))  # as create_assignment does
+        
+        response = authenticated_client.get('/home', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert b'Fresh Homework' in response.data
+        assert response.headers['ETag'] != etag
+    
+    def test_grading_changes_etag(self, authenticated_client, app, sample_assignment):
+        """Test that an update to an existing row (not just inserts) changes the validator"""
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            db.session.add(Enrollment(student_id=student.id, course_id=sample_assignment.course_id))
+            db.session.add(Submission(assignment_id=sample_assignment.id, student_id=student.id))
+            db.session.commit()
+        etag = authenticated_client.get('/grades').headers['ETag']
+        
+        time.sleep(0.01)
+        with app.app_context():
+            submission = Submission.query.first()
+            submission.grade = 91.0
+            db.session.commit()
+        
+        response = authenticated_client.get('/grades', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+    
+    def test_etag_is_per_user(self, client, app, student_user, teacher_user):
+        """Test that two users never share a validator for the same page"""
+        client.post('/auth/login', data={'username': 'teststudent', 'password': 'password123'})
+        student_etag = client.get('/announcements').headers['ETag']
+        client.get('/auth/logout', follow_redirects=True)
+        
+        client.post('/auth/login', data={'username': 'testteacher', 'password': 'password123'})
+        response = client.get('/announcements', headers={'If-None-Match': student_etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != student_etag
+
+
+class TestUpdatedAtMigration:
+    """Databases created before the change stamps get the updated_at columns at startup"""
+
+    def test_columns_are_added(self, tmp_path):
+        path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE course (id INTEGER PRIMARY KEY, title VARCHAR(140) NOT NULL, description TEXT,
+                                 code VARCHAR(32) NOT NULL UNIQUE, teacher INTEGER NOT NULL, image_url VARCHAR(255));
+            CREATE TABLE assignment (id INTEGER PRIMARY KEY, title VARCHAR(128) NOT NULL, description TEXT,
+                                     due_date DATETIME NOT NULL, assignment_type VARCHAR(32) NOT NULL,
+                                     course_id INTEGER);
+            CREATE TABLE submission (id INTEGER PRIMARY KEY, assignment_id INTEGER NOT NULL,
+                                     student_id INTEGER NOT NULL, content TEXT, file_path VARCHAR(255),
+                                     submitted_at DATETIME, grade FLOAT, feedback TEXT);
+            CREATE TABLE announcement (id INTEGER PRIMARY KEY, course_id INTEGER NOT NULL, author_id INTEGER NOT NULL,
+                                       title VARCHAR(128) NOT NULL, content TEXT NOT NULL, timestamp DATETIME);
+        """)
+        conn.close()
+
+        class LegacyConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            CACHE_TYPE = 'null'
+            TESTING = True
+
+        app = create_app(LegacyConfig)
+        with app.app_context():
+            inspector = inspect(db.engine)
+            for table in ('course', 'assignment', 'submission', 'announcement'):
+                assert 'updated_at' in {c['name'] for c in inspector.get_columns(table)}
+            for engine in db.engines.values():
+                engine.dispose()
@@ -0,0 +1,75 @@
+"""
+Tests for engine configuration: SQLite pragmas and pool options
+"""
+import threading
+
+from app.database import engine_options, sqlite_pragmas
+from app.models import db, User
+
+
+class TestSQLitePragmas:
+    """Every pooled connection gets the configured pragmas"""
+
+    def test_wal_and_pragmas_applied(self, app):
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == app.config["SQLITE_BUSY_TIMEOUT_MS"]
+            assert conn.exec_driver_sql("PRAGMA cache_size").scalar() == app.config["SQLITE_CACHE_SIZE"]
+
+    def test_unset_pragmas_are_skipped(self):
+        pragmas = sqlite_pragmas({"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": None})
+        assert pragmas == [("journal_mode", "WAL")]
+
+    def test_writer_not_blocked_by_open_reader(self, app, student_user):
+        """A long read transaction must not stop a write from committing (WAL)"""
+        user_id = User.query.filter_by(username='teststudent').first().id
+        db.session.commit()  # end the session's own read transaction
+        engine = db.engine
+        reader = engine.connect()
+        try:
+            reader.exec_driver_sql("BEGIN")
+            assert reader.exec_driver_sql("SELECT email FROM user WHERE id = ?", (user_id,)).scalar() == "student@test.com"
+            errors = []
+
+            def write():
+                try:
+                    with engine.connect() as writer:
+                        writer.exec_driver_sql("PRAGMA busy_timeout = 0")  # fail fast instead of waiting
+                        writer.exec_driver_sql("UPDATE user SET email = 'changed@test.com' WHERE id = ?", (user_id,))
+                        writer.commit()
+                except Exception as exc:
+                    errors.append(exc)
+
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+            assert errors == []  # rollback-journal mode raises "database is locked" here
+            # The reader keeps its snapshot until its transaction ends
+            assert reader.exec_driver_sql("SELECT email FROM user WHERE id = ?", (user_id,)).scalar() == "student@test.com"
+        finally:
+            reader.exec_driver_sql("ROLLBACK")
+            reader.close()
+        assert db.session.get(User, user_id).email == "changed@test.com"
+
+
+class TestEngineOptions:
+    """Pool settings from Config"""
+
+    def test_file_database_gets_pool_settings(self):
+        options = engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite:///app.db", "DB_POOL_SIZE": 8,
+                                  "DB_MAX_OVERFLOW": 4, "DB_POOL_PRE_PING": True})
+        assert options == {"pool_pre_ping": True, "pool_size": 8, "max_overflow": 4}
+
+    def test_memory_database_skips_pool_sizing(self):
+        options = engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite://", "DB_POOL_SIZE": 8})
+        assert "pool_size" not in options
+        assert options["pool_pre_ping"] is False  # matches Config; SQLite never drops idle connections
+
+    def test_explicit_engine_options_win(self):
+        options = engine_options({"SQLALCHEMY_DATABASE_URI": "sqlite:///app.db", "DB_POOL_SIZE": 8,
+                                  "SQLALCHEMY_ENGINE_OPTIONS": {"pool_size": 2}})
+        assert options["pool_size"] == 2
+
+    def test_app_engine_uses_configured_pool(self, app):
+        assert db.engine.pool.size() == app.config["DB_POOL_SIZE"]
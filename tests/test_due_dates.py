@@ -0,0 +1,191 @@
+"""
+Tests for timezone-aware due dates, SQL-side lateness and the due_date migration
+"""
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import undefer
+
+from app import create_app
+from app.config import Config
+from app.dates import to_utc
+from app.migrations import due_date_to_datetime
+from app.models import db, User, Assignment, Submission
+
+UTC = timezone.utc
+
+# The schema of the first release, before any of the startup migrations existed
+BASELINE_SCHEMA = """
+    CREATE TABLE user (id INTEGER NOT NULL, username VARCHAR(64) NOT NULL, email VARCHAR(120) NOT NULL,
+                       role VARCHAR(20) NOT NULL, password_hash VARCHAR(255) NOT NULL, PRIMARY KEY (id),
+                       UNIQUE (username), UNIQUE (email));
+    CREATE TABLE course (id INTEGER NOT NULL, title VARCHAR(140) NOT NULL, description TEXT,
+                         code VARCHAR(32) NOT NULL, teacher INTEGER NOT NULL, image_url VARCHAR(255),
+                         PRIMARY KEY (id), UNIQUE (code), FOREIGN KEY(teacher) REFERENCES user (id));
+    CREATE TABLE enrollment (id INTEGER NOT NULL, student_id INTEGER NOT NULL, course_id INTEGER NOT NULL,
+                             PRIMARY KEY (id), FOREIGN KEY(student_id) REFERENCES user (id),
+                             FOREIGN KEY(course_id) REFERENCES course (id));
+    CREATE TABLE assignment (id INTEGER NOT NULL, title VARCHAR(128) NOT NULL, description TEXT,
+                             due_date VARCHAR(64) NOT NULL, assignment_type VARCHAR(32) NOT NULL,
+                             course_id INTEGER, PRIMARY KEY (id), FOREIGN KEY(course_id) REFERENCES course (id));
+    CREATE TABLE submission (id INTEGER NOT NULL, assignment_id INTEGER NOT NULL, student_id INTEGER NOT NULL,
+                             content TEXT, file_path VARCHAR(255), submitted_at DATETIME, grade FLOAT,
+                             feedback TEXT, PRIMARY KEY (id), FOREIGN KEY(assignment_id) REFERENCES assignment (id),
+                             FOREIGN KEY(student_id) REFERENCES user (id));
+    CREATE TABLE ta_assignment (id INTEGER NOT NULL, ta_id INTEGER NOT NULL, course_id INTEGER NOT NULL,
+                                PRIMARY KEY (id), FOREIGN KEY(ta_id) REFERENCES user (id),
+                                FOREIGN KEY(course_id) REFERENCES course (id));
+    CREATE TABLE message (id INTEGER NOT NULL, sender_id INTEGER NOT NULL, recipient_id INTEGER NOT NULL,
+                          subject VARCHAR(128) NOT NULL, body TEXT NOT NULL, timestamp DATETIME, read BOOLEAN,
+                          PRIMARY KEY (id), FOREIGN KEY(sender_id) REFERENCES user (id),
+                          FOREIGN KEY(recipient_id) REFERENCES user (id));
+    CREATE TABLE announcement (id INTEGER NOT NULL, course_id INTEGER NOT NULL, author_id INTEGER NOT NULL,
+                               title VARCHAR(128) NOT NULL, content TEXT NOT NULL, timestamp DATETIME,
+                               PRIMARY KEY (id), FOREIGN KEY(course_id) REFERENCES course (id),
+                               FOREIGN KEY(author_id) REFERENCES user (id));
+    INSERT INTO user (id, username, email, role, password_hash) VALUES (1, 'prof', 'prof@test.com', 'instructor', 'x');
+    INSERT INTO user (id, username, email, role, password_hash) VALUES (2, 'pupil', 'pupil@test.com', 'student', 'x');
+    INSERT INTO course (id, title, code, teacher) VALUES (1, 'Legacy', 'LG101', 1);
+    INSERT INTO enrollment (id, student_id, course_id) VALUES (1, 2, 1);
+    INSERT INTO assignment (id, title, due_date, assignment_type, course_id)
+        VALUES (1, 'Old HW', '2025-03-01', 'homework', 1);
+    INSERT INTO submission (id, assignment_id, student_id, content, submitted_at, grade)
+        VALUES (1, 1, 2, 'done', '2025-02-28 12:00:00', 91.0);
+"""
+
+
+class TestToUtc:
+    """Due date input is normalised to aware UTC"""
+
+    def test_plain_date_means_end_of_day(self):
+        assert to_utc('2025-12-31') == datetime(2025, 12, 31, 23, 59, 59, tzinfo=UTC)
+        assert to_utc(date(2025, 12, 31)) == datetime(2025, 12, 31, 23, 59, 59, tzinfo=UTC)
+
+    def test_naive_input_uses_app_timezone(self, app):
+        app.config['TIMEZONE'] = 'America/New_York'
+        with app.app_context():
+            assert to_utc(datetime(2025, 12, 1, 17, 0)) == datetime(2025, 12, 1, 22, 0, tzinfo=UTC)
+
+    def test_aware_input_is_converted(self):
+        assert to_utc('2025-06-01T12:00:00+02:00') == datetime(2025, 6, 1, 10, 0, tzinfo=UTC)
+
+
+class TestDueDateColumn:
+    """Assignment.due_date round-trips as aware UTC and lateness is computed in SQL"""
+
+    def test_due_date_loads_aware(self, app, sample_assignment):
+        with app.app_context():
+            db.session.expire_all()
+            assignment = db.session.get(Assignment, sample_assignment.id)
+            assert assignment.due_date == datetime(2025, 12, 31, 23, 59, 59, tzinfo=UTC)
+
+    def test_is_late_filters_and_counts_in_sql(self, app, sample_assignment, student_user, teacher_user):
+        with app.app_context():
+            due = db.session.get(Assignment, sample_assignment.id).due_date.replace(tzinfo=None)
+            student = User.query.filter_by(username='teststudent').first()
+            teacher = User.query.filter_by(username='testteacher').first()
+            db.session.add(Submission(assignment_id=sample_assignment.id, student_id=student.id,
+                                      submitted_at=due - timedelta(hours=1)))
+            db.session.add(Submission(assignment_id=sample_assignment.id, student_id=teacher.id,
+                                      submitted_at=due + timedelta(seconds=1)))
+            db.session.commit()
+            late = Submission.query.filter(Submission.is_late).all()
+            assert [s.student_id for s in late] == [teacher.id]
+            on_time = Submission.query.options(undefer(Submission.is_late)).filter_by(student_id=student.id).one()
+            assert on_time.is_late is False
+
+    def test_due_range_uses_course_due_index(self, app):
+        with app.app_context():
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM assignment WHERE course_id = 1 AND due_date BETWEEN :a AND :b"
+            ), {'a': '2025-01-01', 'b': '2025-02-01'}).all()
+            assert 'ix_assignment_course_due' in ' '.join(str(row[-1]) for row in plan)
+
+    def test_create_assignment_stores_local_time_as_utc(self, app, authenticated_teacher_client, sample_course):
+        app.config['TIMEZONE'] = 'America/Los_Angeles'
+        response = authenticated_teacher_client.post('/create_assignment', data={
+            'title': 'Timed Quiz', 'description': 'Due at 5pm Pacific', 'due_date': '2025-11-20T17:00',
+            'assignment_type': 'quiz', 'course_id': sample_course.id,
+        })
+        assert response.status_code == 302
+        with app.app_context():
+            assignment = Assignment.query.filter_by(title='Timed Quiz').one()
+            assert assignment.due_date == datetime(2025, 11, 21, 1, 0, tzinfo=UTC)
+
+
+class TestDueDateMigration:
+    """A database with the old VARCHAR due_date is upgraded at startup"""
+
+    def test_string_due_dates_become_datetimes(self, tmp_path):
+        path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE course (id INTEGER PRIMARY KEY, title VARCHAR(128) NOT NULL, description TEXT,
+                                 code VARCHAR(32) NOT NULL UNIQUE, teacher INTEGER, image_url VARCHAR(255),
+                                 updated_at DATETIME);
+            CREATE TABLE assignment (id INTEGER NOT NULL, title VARCHAR(128) NOT NULL, description TEXT,
+                                     due_date VARCHAR(64) NOT NULL, assignment_type VARCHAR(32) NOT NULL,
+                                     course_id INTEGER, updated_at DATETIME, PRIMARY KEY (id),
+                                     FOREIGN KEY(course_id) REFERENCES course (id));
+            INSERT INTO course (id, title, code, teacher) VALUES (1, 'Legacy', 'LG101', 1);
+            INSERT INTO assignment (id, title, due_date, assignment_type, course_id)
+                VALUES (1, 'Old HW', '2025-03-01', 'homework', 1);
+        """)
+        conn.close()
+
+        class LegacyConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            CACHE_TYPE = 'null'
+            TESTING = True
+
+        app = create_app(LegacyConfig)
+        with app.app_context():
+            inspector = inspect(db.engine)
+            due_type = {c['name']: c['type'] for c in inspector.get_columns('assignment')}['due_date']
+            assert due_type.__class__.__name__ == 'DATETIME'
+            assert 'ix_assignment_course_due' in {ix['name'] for ix in inspector.get_indexes('assignment')}
+            assert db.session.get(Assignment, 1).due_date == datetime(2025, 3, 1, 23, 59, 59, tzinfo=UTC)
+            for engine in db.engines.values():
+                engine.dispose()
+
+    def test_baseline_assignment_table_without_updated_at(self, tmp_path):
+        """The copy into the DATETIME table fills columns the old table lacks with NULL"""
+        path = tmp_path / 'baseline.db'
+        conn = sqlite3.connect(path)
+        conn.executescript(BASELINE_SCHEMA)
+        conn.close()
+
+        engine = create_engine(f'sqlite:///{path}')
+        with engine.begin() as connection:
+            due_date_to_datetime(connection)
+        with engine.connect() as connection:
+            row = connection.execute(text("SELECT title, due_date, updated_at FROM assignment")).one()
+        engine.dispose()
+        assert row.title == 'Old HW'
+        assert row.due_date.startswith('2025-03-01 23:59:59')
+        assert row.updated_at is not None  # stamped by the due date rewrite
+
+    def test_baseline_database_upgrades_at_startup(self, tmp_path):
+        path = tmp_path / 'baseline.db'
+        conn = sqlite3.connect(path)
+        conn.executescript(BASELINE_SCHEMA)
+        conn.close()
+
+        class BaselineConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            CACHE_TYPE = 'null'
+            TESTING = True
+
+        app = create_app(BaselineConfig)
+        with app.app_context():
+            assignment = db.session.get(Assignment, 1)
+            assert assignment.due_date == datetime(2025, 3, 1, 23, 59, 59, tzinfo=UTC)
+            submission = db.session.get(Submission, 1)
+            assert submission.grade == 91.0
+            assert submission.attempts == 1
+            assert submission.latest_version.content == 'done'
+            assert not db.session.scalar(db.select(Submission.is_late).where(Submission.id == 1))
+            for engine in db.engines.values():
+                engine.dispose()
@@ -0,0 +1,114 @@
+"""
+Tests for eager loading: the template lazy-load guard and per-page query counts
+"""
+import pytest
+from flask import render_template_string
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import joinedload
+
+from app.models import db, User, Course, Enrollment, Assignment, Submission, TAAssignment, Message, Announcement
+
+STUDENTS = 6
+COURSES = 3
+
+
+@pytest.fixture
+def classroom(app, teacher_user, ta_user):
+    """COURSES courses taught by testteacher, each with every student, two assignments and a TA"""
+    with app.app_context():
+        teacher = User.query.filter_by(username='testteacher').first()
+        ta = User.query.filter_by(username='testta').first()
+        students = []
+        for i in range(STUDENTS):
+            student = User(username=f'eager{i}', email=f'eager{i}@test.com', role='student')
+            student.set_password('password123')
+            students.append(student)
+        db.session.add_all(students)
+        db.session.flush()
+        assignment_ids = []
+        for c in range(COURSES):
+            course = Course(title=f'Eager Course {c}', code=f'EG{c}', teacher=teacher.id)
+            db.session.add(course)
+            db.session.flush()
+            db.session.add(TAAssignment(ta_id=ta.id, course_id=course.id))
+            db.session.add(Announcement(course_id=course.id, author_id=teacher.id, title=f'News {c}', content='Hi'))
+            for student in students:
+                db.session.add(Enrollment(student_id=student.id, course_id=course.id))
+            for a in range(2):
+                assignment = Assignment(title=f'HW {c}.{a}', description='Work', due_date='2025-12-31',
+                                        course_id=course.id)
+                db.session.add(assignment)
+                db.session.flush()
+                assignment_ids.append(assignment.id)
+                for student in students:
+                    db.session.add(Submission(assignment_id=assignment.id, student_id=student.id, grade=90.0))
+        for student in students:
+            db.session.add(Message(sender_id=student.id, recipient_id=teacher.id, subject='Q', body='?'))
+            db.session.add(Message(sender_id=teacher.id, recipient_id=student.id, subject='A', body='!'))
+        db.session.commit()
+        return {'course_id': Course.query.filter_by(code='EG0').first().id, 'assignment_id': assignment_ids[0]}
+
+
+def logged_in(app, username):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': username, 'password': 'password123'}, follow_redirects=True)
+    return client
+
+
+class TestTemplateLazyLoadGuard:
+    """RAISE_ON_TEMPLATE_LAZYLOAD turns lazy loads during rendering into errors"""
+
+    def test_lazy_load_in_template_raises(self, app, sample_course):
+        with app.test_request_context():
+            course = Course.query.filter_by(code='CS101').first()
+            with pytest.raises(InvalidRequestError, match='Course.instructor'):
+                render_template_string('{{ course.instructor.username }}', course=course)
+
+    def test_eager_loaded_relationship_renders(self, app, sample_course):
+        with app.test_request_context():
+            course = Course.query.options(joinedload(Course.instructor)).filter_by(code='CS101').first()
+            assert render_template_string('{{ course.instructor.username }}', course=course) == 'testteacher'
+
+    def test_lazy_load_outside_template_allowed(self, app, sample_course):
+        with app.test_request_context():
+            course = Course.query.filter_by(code='CS101').first()
+            assert course.instructor.username == 'testteacher'
+
+    def test_guard_can_be_disabled(self, app, sample_course):
+        app.config['RAISE_ON_TEMPLATE_LAZYLOAD'] = False
+        with app.test_request_context():
+            course = Course.query.filter_by(code='CS101').first()
+            assert render_template_string('{{ course.instructor.username }}', course=course) == 'testteacher'
+
+
+class TestPageQueryCounts:
+    """Pages that list related rows use a fixed number of queries, whatever the row count"""
+
+    @pytest.mark.parametrize('path, max_queries', [
+        ('/classes', 3),
+        ('/grades', 3),
+        ('/teacher_portal', 7),
+        ('/messages', 4),
+        ('/messages/sent', 3),
+        ('/announcements', 5),
+        ('/assignments', 5),  # + submission stamp and grouped submission counts
+    ])
+    def test_teacher_pages(self, app, classroom, query_budget, path, max_queries):
+        query_budget.check(logged_in(app, 'testteacher').get(path), max_queries=max_queries)
+
+    @pytest.mark.parametrize('path, max_queries', [
+        ('/classes', 4),
+        ('/grades', 9),  # weighted grades of every course in three queries (app/gradebook.py)
+        ('/assignments', 7),
+        ('/announcements', 5),
+    ])
+    def test_student_pages(self, app, classroom, query_budget, path, max_queries):
+        query_budget.check(logged_in(app, 'eager0').get(path), max_queries=max_queries)
+
+    def test_view_course(self, app, classroom, query_budget):
+        client = logged_in(app, 'testteacher')
+        query_budget.check(client.get(f"/course/{classroom['course_id']}"), max_queries=6)
+
+    def test_view_submissions(self, app, classroom, query_budget):
+        client = logged_in(app, 'testta')
+        query_budget.check(client.get(f"/view_submissions/{classroom['assignment_id']}"), max_queries=8)  # +1 grading progress, +1 preview stamp
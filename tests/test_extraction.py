@@ -0,0 +1,189 @@
+"""
+Tests for background text extraction of uploads and the PDF extractor
+"""
+import io
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, extraction, pdftext, readmodels, versioning
+from app.config import Config
+from app.models import db, ExtractedText, Submission, SubmissionVersion, User
+
+
+def make_pdf(content, compress=True):
+    """A one-stream PDF around the given content-stream bytes"""
+    data = zlib.compress(content) if compress else content
+    filters = b" /Filter /FlateDecode" if compress else b""
+    return (b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+            b"4 0 obj << /Length " + str(len(data)).encode() + filters + b" >>\nstream\n" + data +
+            b"\nendstream\nendobj\n"
+            b"5 0 obj << /Type /XObject /Subtype /Image /Length 4 >>\nstream\nBT..\nendstream\nendobj\n%%EOF")
+
+
+class TestPdfText:
+    """Text operators of content streams"""
+
+    def test_show_operators(self):
+        pdf = make_pdf(b"BT /F1 12 Tf 72 720 Td (Hello \\(PDF\\)) Tj 0 -14 Td "
+                       b"[(Wor) -20 (ld) -400 (again)] TJ T* <4869> Tj ET")
+        assert pdftext.extract(pdf) == "Hello (PDF)\nWorld again\nHi"
+
+    def test_uncompressed_stream_and_escapes(self):
+        pdf = make_pdf(b"BT (tab\\there \\101) Tj (caf\\351) ' ET", compress=False)
+        assert pdftext.extract(pdf) == "tab here A\ncafé"
+
+    def test_not_a_pdf(self):
+        assert pdftext.extract(b"just bytes") == ""
+
+
+@pytest.fixture
+def uploads(app, tmp_path):
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    return tmp_path
+
+
+def submit(client, assignment_id, name, data, key):
+    return client.post(f'/submit_assignment/{assignment_id}',
+                       data={'content': '', 'idempotency_key': key, 'file': (io.BytesIO(data), name)},
+                       content_type='multipart/form-data')
+
+
+class TestQueue:
+    """A submit queues the blob; the worker pool extracts it once"""
+
+    def test_submit_queues_and_worker_extracts(self, app, authenticated_client, sample_assignment, uploads):
+        submit(authenticated_client, sample_assignment.id, 'main.py', b"print('hi')\n", 'k1')
+        submit(authenticated_client, sample_assignment.id, 'copy.py', b"print('hi')\n", 'k2')  # same blob
+        submit(authenticated_client, sample_assignment.id, 'report.pdf',
+               make_pdf(b"BT (Results) Tj ET"), 'k3')
+        submit(authenticated_client, sample_assignment.id, 'archive.zip', b"PK\x03\x04", 'k4')  # not extracted
+        with app.app_context():
+            assert ExtractedText.query.filter_by(status='pending').count() == 2
+            assert extraction.run_pending(workers=2) == 2
+            texts = {row.file_name: row for row in ExtractedText.query.options(db.undefer(ExtractedText.text))}
+            assert texts['main.py'].text == "print('hi')\n"
+            assert texts['report.pdf'].text == "Results"
+            assert extraction.run_pending(workers=2) == 0
+
+    def test_abandoned_running_files_are_reclaimed(self, app, uploads):
+        """A file a killed worker left running is claimed again once it is stale, and not before"""
+        with app.app_context():
+            db.session.add(ExtractedText(file_sha256='c' * 64, file_path='gone.txt', file_name='gone.txt',
+                                         status='pending'))
+            db.session.commit()
+            claimed_at = datetime(2025, 1, 1)
+            assert extraction.claim(5, now=claimed_at) == ['c' * 64]
+            db.session.commit()
+            assert extraction.claim(5, now=claimed_at + timedelta(minutes=14)) == []
+            assert extraction.claim(5, now=claimed_at + timedelta(minutes=16)) == ['c' * 64]
+            db.session.commit()
+            assert extraction.run_pending(workers=1) == 1
+            assert db.session.get(ExtractedText, 'c' * 64).status == 'error'  # the file is missing
+
+    def test_text_is_capped_and_binary_rejected(self, app, uploads):
+        (uploads / 'big.txt').write_text('x' * 200000)
+        (uploads / 'bin.txt').write_bytes(b'\0\1\2')
+        big = extraction.extract_file({"sha256": "a", "path": str(uploads / 'big.txt'), "kind": "text",
+                                       "max_chars": 1000})
+        assert (len(big["text"]), big["truncated"]) == (1000, True)
+        binary = extraction.extract_file({"sha256": "b", "path": str(uploads / 'bin.txt'), "kind": "text",
+                                          "max_chars": 1000})
+        assert (binary["status"], binary["error"]) == ("error", "binary file")
+
+    def test_pdf_size_cap_and_unexpected_errors(self, app, uploads, monkeypatch):
+        """Oversized PDFs are not read, and any exception fails only its own file"""
+        (uploads / 'report.pdf').write_bytes(make_pdf(b"BT (Results) Tj ET"))
+        spec = {"sha256": "c", "path": str(uploads / 'report.pdf'), "kind": "pdf", "max_chars": 1000,
+                "max_pdf_bytes": 10}
+        assert extraction.extract_file(spec)["status"] == "error"
+
+        def broken(data):
+            raise IndexError("bad xref")
+        monkeypatch.setattr(pdftext, 'extract', broken)
+        result = extraction.extract_file(dict(spec, max_pdf_bytes=1024 * 1024))
+        assert (result["status"], result["error"]) == ("error", "bad xref")
+
+    def test_backfill_queues_existing_blobs(self, app, sample_assignment, student_user):
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            submission = Submission(assignment_id=sample_assignment.id, student_id=student.id)
+            db.session.add(submission)
+            db.session.flush()
+            for number, name in enumerate(['a.java', 'b.docx'], start=1):
+                db.session.add(SubmissionVersion(submission_id=submission.id, number=number, file_path=name,
+                                                 file_name=name, file_sha256=str(number) * 64))
+            db.session.commit()
+            assert extraction.backfill() == 1
+            assert extraction.backfill() == 0
+
+
+class TestPreview:
+    """view_submissions shows extracted text without a download"""
+
+    def test_preview_and_full_text(self, app, authenticated_teacher_client, sample_assignment, student_user, uploads):
+        (uploads / 'main.c').write_text("int main(void) { return 0; }\n")
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            version = versioning.submit(sample_assignment.id, student.id, None, ('main.c', 'c' * 64, 29), 'main.c')
+            extraction.enqueue(version)
+            db.session.commit()
+            (item,) = readmodels.submissions(sample_assignment.id)
+            assert (item.text_status, item.text_preview) == ('pending', None)
+            extraction.run_pending(workers=1)
+            version_id = version.id
+        page = authenticated_teacher_client.get(f'/view_submissions/{sample_assignment.id}').data
+        assert b'int main(void)' in page
+        text = authenticated_teacher_client.get(f'/submission_version/{version_id}/text').data
+        assert b'int main(void) { return 0; }' in text
+
+    def test_finished_extraction_changes_the_etag(self, app, authenticated_teacher_client, sample_assignment,
+                                                  student_user, uploads):
+        """The page is revalidated when a preview becomes ready, though no submission changed"""
+        (uploads / 'main.py').write_text("print('ready')\n")
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            version = versioning.submit(sample_assignment.id, student.id, None, ('main.py', 'd' * 64, 15), 'main.py')
+            extraction.enqueue(version)
+            db.session.commit()
+        url = f'/view_submissions/{sample_assignment.id}'
+        before = authenticated_teacher_client.get(url)
+        assert b'Preview is being prepared.' in before.data
+        with app.app_context():
+            extraction.run_pending(workers=1)
+        after = authenticated_teacher_client.get(url, headers={'If-None-Match': before.headers['ETag']})
+        assert after.status_code == 200
+        assert after.headers['ETag'] != before.headers['ETag']
+        assert b"print(&#39;ready&#39;)" in after.data
+
+
+class TestMigration:
+    """Older databases get claimed_at, and rows a dead worker left running are claimed again"""
+
+    def test_adds_claimed_at_column(self, tmp_path):
+        path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE extracted_text (file_sha256 VARCHAR(64) NOT NULL, file_path VARCHAR(255) NOT NULL,
+                                         file_name VARCHAR(255) NOT NULL, status VARCHAR(16) NOT NULL, text TEXT,
+                                         chars INTEGER, truncated BOOLEAN NOT NULL, error VARCHAR(255),
+                                         created_at DATETIME NOT NULL, extracted_at DATETIME,
+                                         PRIMARY KEY (file_sha256));
+            INSERT INTO extracted_text (file_sha256, file_path, file_name, status, truncated, created_at)
+                VALUES ('abc', 'a.txt', 'a.txt', 'running', 0, '2025-03-01 12:00:00.000000');
+        """)
+        conn.close()
+
+        class LegacyConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            CACHE_TYPE = 'null'
+            TESTING = True
+
+        app = create_app(LegacyConfig)
+        with app.app_context():
+            assert db.session.get(ExtractedText, 'abc').claimed_at is None
+            assert extraction.claim(5) == ['abc']
+            for engine in db.engines.values():
+                engine.dispose()
@@ -0,0 +1,148 @@
+"""
+Tests for weighted course grades: category weights, drop-lowest rules and letter grades
+"""
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app import gradebook
+from app.models import db, Assignment, Course, Enrollment, GradeCategory, Submission, User
+
+nan = np.nan
+
+
+class TestMatrix:
+    """Whole-class computation on the students x assignments array"""
+
+    def test_drop_lowest_keeps_one_grade(self):
+        grades = np.array([[50.0, 100.0, 80.0], [nan, 70.0, nan], [nan, nan, nan]])
+        means = gradebook.category_means(grades, drop_lowest=1)
+        assert means[:2].tolist() == [90.0, 70.0] and np.isnan(means[2])
+
+    def test_weights_renormalize_over_graded_categories(self):
+        means = np.array([[80.0, 90.0, 100.0], [80.0, nan, nan]])
+        final = gradebook.weighted(means, np.array([20.0, 30.0, 50.0]))
+        assert final.tolist() == pytest.approx([93.0, 80.0])
+
+    def test_letters(self, app):
+        with app.app_context():
+            assert gradebook.letters(np.array([93.0, 92.99, 59.9, nan, 100.0])) == ['A', 'A-', 'F', None, 'A']
+
+
+@pytest.fixture
+def course(app, teacher_user):
+    """Homework 60/100/40, quiz 90 and an ungraded exam for one student; another course with a 0 grade"""
+    with app.app_context():
+        teacher = User.query.filter_by(username='testteacher').first()
+        student = User(username='weighted', email='weighted@test.com', role='student')
+        student.set_password('password123')
+        db.session.add(student)
+        courses = [Course(title='Weighted', code='WG1', teacher=teacher.id),
+                   Course(title='Other', code='OT1', teacher=teacher.id)]
+        db.session.add_all(courses)
+        db.session.flush()
+        grades = [('homework', 60.0), ('homework', 100.0), ('homework', 40.0), ('quiz', 90.0), ('exam', None)]
+        for n, (assignment_type, grade) in enumerate(grades):
+            assignment = Assignment(title=f'W{n}', due_date=datetime(2025, 1, 1 + n), assignment_type=assignment_type,
+                                    course_id=courses[0].id)
+            db.session.add(assignment)
+            db.session.flush()
+            db.session.add(Submission(assignment_id=assignment.id, student_id=student.id, grade=grade))
+        other = Assignment(title='Elsewhere', due_date=datetime(2025, 1, 1), course_id=courses[1].id)
+        db.session.add(other)
+        db.session.flush()
+        db.session.add(Submission(assignment_id=other.id, student_id=student.id, grade=0.0))
+        db.session.add_all([Enrollment(student_id=student.id, course_id=c.id) for c in courses])
+        db.session.commit()
+        return {'course_id': courses[0].id, 'other_id': courses[1].id, 'student_id': student.id}
+
+
+class TestCourseGrades:
+    """Grades are loaded per course and weighted by the course's categories"""
+
+    def test_unweighted_course_uses_plain_mean_of_its_own_work(self, app, course):
+        with app.app_context():
+            result = gradebook.course_grades([course['course_id'], course['other_id']])
+            assert result[course['course_id']].final.tolist() == [72.5]
+            assert result[course['other_id']].final.tolist() == [0.0]
+            assert result[course['other_id']].letters == ['F']
+
+    def test_weights_and_drops(self, app, course):
+        with app.app_context():
+            gradebook.save_policy(course['course_id'], {'homework': (40, 1), 'quiz': (20, 0), 'exam': (40, 0)})
+            db.session.commit()
+            result = gradebook.course_grades([course['course_id']], [course['student_id']])[course['course_id']]
+            # homework 80 (40 dropped), quiz 90, exam not graded yet: (40*80 + 20*90) / 60
+            assert result.final[0] == pytest.approx(83.333, abs=1e-3)
+            assert result.letters == ['B']
+            assert np.isnan(result.category_means[0, 2])
+
+    def test_zero_weights_restore_plain_mean(self, app, course):
+        with app.app_context():
+            gradebook.save_policy(course['course_id'], {'homework': (0, 0), 'quiz': (0, 0), 'exam': (0, 0)})
+            db.session.commit()
+            assert GradeCategory.query.count() == 0
+            assert gradebook.course_grades([course['course_id']])[course['course_id']].categories == [
+                (gradebook.UNWEIGHTED, 1.0, 0)]
+
+
+class TestPages:
+    """Students see their course grade; instructors set the weights"""
+
+    def test_student_course_grade_counts_only_that_course(self, app, client, course):
+        client.post('/auth/login', data={'username': 'weighted', 'password': 'password123'})
+        page = client.get(f"/{course['course_id']}/grades").data
+        assert b'72.5% (C-)' in page and b'4 / 5' in page
+        page = client.get('/grades').data
+        assert b'72.5%' in page and b'0.0%' in page
+
+    def test_instructor_saves_weights(self, app, authenticated_teacher_client, course):
+        url = f"/course/{course['course_id']}/gradebook"
+        page = authenticated_teacher_client.get(url).data
+        assert b'weighted' in page and b'72.5' in page
+        page = authenticated_teacher_client.post(url, data={
+            'homework_weight': '40', 'homework_drop': '1', 'quiz_weight': '20', 'quiz_drop': '0',
+            'exam_weight': '40', 'exam_drop': '0'}, follow_redirects=True).data
+        assert b'Grade weights saved.' in page and b'83.3' in page and b'(drop 1)' in page
+        with app.app_context():
+            assert GradeCategory.query.filter_by(course_id=course['course_id']).count() == 3
+
+    def test_other_instructors_are_refused(self, app, authenticated_client, course):
+        response = authenticated_client.get(f"/course/{course['course_id']}/gradebook")
+        assert response.status_code == 302
+
+
+class TestDistribution:
+    """The instructor's report: histograms, percentiles and standings from the grade grid"""
+
+    def test_histograms_and_stats(self):
+        grades = np.array([[100.0, nan], [95.0, nan], [40.0, 0.0], [9.9, nan]])
+        histograms = gradebook.histograms(grades)
+        assert histograms[0].tolist() == [1, 0, 0, 0, 1, 0, 0, 0, 0, 2]
+        assert histograms[1].tolist() == [1] + [0] * 9
+        first, second = gradebook.column_stats(grades)
+        assert first['graded'] == 4 and first['median'] == 67.5 and first['max'] == 100.0
+        assert second['std'] == 0.0 and second['p90'] == 0.0
+        assert gradebook.column_stats(np.full((2, 1), nan))[0]['mean'] is None
+
+    def test_standing_shares_ranks_on_ties(self):
+        rank, percentile = gradebook.standing(np.array([90.0, 70.0, 90.0, nan, 50.0]))
+        assert rank[[0, 1, 2, 4]].tolist() == [1, 3, 1, 4]
+        assert percentile[[0, 1, 2, 4]].tolist() == [75.0, 37.5, 75.0, 12.5]
+
+    def test_report_is_cached_until_a_grade_is_written(self, app, authenticated_teacher_client, course):
+        url = f"/course/{course['course_id']}/grade_report"
+        page = authenticated_teacher_client.get(url).data
+        assert b'Grade Report for Weighted' in page and b'mean 72.5' in page
+        with app.app_context():
+            submission_id = Submission.query.join(Assignment).filter(Assignment.title == 'W4').one().id
+            db.session.execute(db.update(Submission).where(Submission.id == submission_id).values(grade=100.0))
+            db.session.commit()
+        assert b'mean 72.5' in authenticated_teacher_client.get(url).data  # written behind the app's back
+        authenticated_teacher_client.post(f'/grade_submission/{submission_id}', data={'grade': '100'})
+        assert b'mean 78.0' in authenticated_teacher_client.get(url).data
+
+    def test_students_are_refused(self, app, authenticated_client, course):
+        response = authenticated_client.get(f"/course/{course['course_id']}/grade_report")
+        assert response.status_code == 302
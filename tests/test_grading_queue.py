@@ -0,0 +1,171 @@
+"""
+Tests for the leased grading queue
+"""
+import re
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import grading
+from app.models import db, User, Submission, TAAssignment
+
+SUBMISSIONS = 5
+
+
+@pytest.fixture
+def queue(app, sample_assignment, ta_user):
+    """SUBMISSIONS ungraded hand-ins, oldest first, and testta assisting the course"""
+    with app.app_context():
+        ta = User.query.filter_by(username='testta').first()
+        db.session.add(TAAssignment(ta_id=ta.id, course_id=sample_assignment.course_id))
+        start = datetime(2025, 12, 1)
+        for i in range(SUBMISSIONS):
+            student = User(username=f'queue{i}', email=f'queue{i}@test.com', role='student')
+            student.set_password('password123')
+            db.session.add(student)
+            db.session.flush()
+            db.session.add(Submission(assignment_id=sample_assignment.id, student_id=student.id,
+                                      submitted_at=start + timedelta(hours=i)))
+        db.session.commit()
+        return {'assignment_id': sample_assignment.id, 'ta_id': ta.id}
+
+
+def grader_ids(count):
+    return [1000 + n for n in range(count)]  # claimed_by is not checked against user rows by SQLite
+
+
+class TestClaimNext:
+    """Each grader is leased a different submission"""
+
+    def test_graders_get_different_submissions(self, app, queue):
+        with app.app_context():
+            claims = [grading.claim_next(queue['assignment_id'], grader) for grader in grader_ids(3)]
+            db.session.commit()
+            assert len(set(claims)) == 3
+            oldest = Submission.query.order_by(Submission.submitted_at).first()
+            assert claims[0] == oldest.id
+
+    def test_same_grader_keeps_claim(self, app, queue):
+        with app.app_context():
+            first = grading.claim_next(queue['assignment_id'], 7)
+            assert grading.claim_next(queue['assignment_id'], 7) == first
+
+    def test_expired_lease_is_reclaimed(self, app, queue):
+        with app.app_context():
+            first = grading.claim_next(queue['assignment_id'], 7, lease_minutes=10)
+            later = datetime.utcnow() + timedelta(minutes=11)
+            assert grading.claim_next(queue['assignment_id'], 8, now=later) == first
+
+    def test_graded_and_exhausted(self, app, queue):
+        with app.app_context():
+            Submission.query.filter_by(assignment_id=queue['assignment_id']).update({'grade': 80.0})
+            Submission.query.order_by(Submission.id.desc()).first().grade = None
+            db.session.commit()
+            assert grading.claim_next(queue['assignment_id'], 7) is not None
+            assert grading.claim_next(queue['assignment_id'], 8) is None
+
+    def test_release(self, app, queue):
+        with app.app_context():
+            first = grading.claim_next(queue['assignment_id'], 7)
+            grading.release(first, 7)
+            assert grading.claim_next(queue['assignment_id'], 8) == first
+
+    def test_concurrent_claims_never_collide(self, app, queue):
+        claims, errors = [], []
+        graders = grader_ids(SUBMISSIONS + 2)
+        barrier = threading.Barrier(len(graders))
+
+        def claim(grader):
+            try:
+                with app.app_context():
+                    barrier.wait()
+                    claims.append(grading.claim_next(queue['assignment_id'], grader))
+                    db.session.commit()
+            except Exception as exc:  # surfaced in the main thread below
+                errors.append(exc)
+
+        threads = [threading.Thread(target=claim, args=(grader,)) for grader in graders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        granted = [c for c in claims if c is not None]
+        assert len(granted) == SUBMISSIONS and len(set(granted)) == SUBMISSIONS
+        assert claims.count(None) == 2
+
+
+class TestProgress:
+    """Graded, claimed and remaining come from one aggregate"""
+
+    def test_counts(self, app, queue):
+        with app.app_context():
+            grading.claim_next(queue['assignment_id'], 7)
+            grading.claim_next(queue['assignment_id'], 8)
+            Submission.query.order_by(Submission.id.desc()).first().grade = 95.0
+            db.session.commit()
+            assert grading.progress(queue['assignment_id']) == {
+                'total': SUBMISSIONS, 'graded': 1, 'claimed': 2, 'remaining': SUBMISSIONS - 3,
+            }
+
+
+class TestGradeNextPage:
+    """TAs grade one submission after another"""
+
+    def test_grade_and_continue(self, app, client, queue):
+        client.post('/auth/login', data={'username': 'testta', 'password': 'password123'})
+        response = client.post(f"/assignment/{queue['assignment_id']}/grade_next/claim")
+        assert response.headers['Location'].endswith(f"/assignment/{queue['assignment_id']}/grade_next")
+        page = client.get(f"/assignment/{queue['assignment_id']}/grade_next")
+        assert page.status_code == 200
+        assert b'queue0' in page.data
+        with app.app_context():
+            claimed = Submission.query.filter_by(claimed_by=queue['ta_id']).one()
+        response = client.post(f'/grade_submission/{claimed.id}', data={'grade': '88', 'next': 'queue'})
+        assert response.headers['Location'].endswith(f"/assignment/{queue['assignment_id']}/grade_next")
+        with app.app_context():
+            graded = db.session.get(Submission, claimed.id)
+            assert (graded.grade, graded.claimed_by, graded.lease_expires_at) == (88.0, None, None)
+        assert b'queue1' in client.get(f"/assignment/{queue['assignment_id']}/grade_next").data
+
+    def test_page_does_not_claim(self, app, client, queue):
+        """Loading the page only shows the grader's lease; reloading it keeps the same one"""
+        client.post('/auth/login', data={'username': 'testta', 'password': 'password123'})
+        page = client.get(f"/assignment/{queue['assignment_id']}/grade_next")
+        assert b'grade_next/claim' in page.data
+        with app.app_context():
+            assert Submission.query.filter(Submission.claimed_by.isnot(None)).count() == 0
+
+        client.post(f"/assignment/{queue['assignment_id']}/grade_next/claim")
+        with app.app_context():
+            lease = db.session.execute(db.select(Submission.id, Submission.lease_expires_at)
+                                       .where(Submission.claimed_by == queue['ta_id'])).one()
+        for _ in range(2):
+            assert b'queue0' in client.get(f"/assignment/{queue['assignment_id']}/grade_next").data
+        with app.app_context():
+            assert db.session.execute(db.select(Submission.id, Submission.lease_expires_at)
+                                      .where(Submission.claimed_by == queue['ta_id'])).one() == lease
+
+    def test_release_needs_csrf_token(self, app, client, queue):
+        """A cross-site POST without the form's token cannot hand back a grader's lease"""
+        client.post('/auth/login', data={'username': 'testta', 'password': 'password123'})
+        client.post(f"/assignment/{queue['assignment_id']}/grade_next/claim")
+        with app.app_context():
+            claimed = Submission.query.filter_by(claimed_by=queue['ta_id']).one()
+        app.config['WTF_CSRF_ENABLED'] = True
+        assert client.post(f'/submission/{claimed.id}/release').status_code == 400
+        with app.app_context():
+            assert db.session.get(Submission, claimed.id).claimed_by == queue['ta_id']
+
+        page = client.get(f"/assignment/{queue['assignment_id']}/grade_next").get_data(as_text=True)
+        token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
+        assert client.post(f'/submission/{claimed.id}/release', data={'csrf_token': token}).status_code == 302
+        with app.app_context():
+            assert db.session.get(Submission, claimed.id).claimed_by is None
+
+    def test_student_is_redirected(self, authenticated_client, queue):
+        response = authenticated_client.get(f"/assignment/{queue['assignment_id']}/grade_next")
+        assert response.status_code == 302
+        response = authenticated_client.post(f"/assignment/{queue['assignment_id']}/grade_next/claim")
+        assert response.status_code == 302
@@ -689,3 +689,60 @@ class TestTemplateRendering:
         response = authenticated_teacher_client.get('/create_assignment')
         assert response.status_code == 200
         assert b'<form' in response.data or b'<Form' in response.data
+
+
+class TestBroadcastMessaging:
+    """Integration tests for messaging every student in a course"""
+    
+    def _enroll_students(self, app, count):
+        with app.app_context():
+            course = Course.query.filter_by(code='CS101').first()
+            for i in range(count):
+                student = User(username=f'bcast{i}', email=f'bcast{i}@test.com', role='student')
+                student.password_hash = 'not-a-real-hash'
+                db.session.add(student)
+                db.session.flush()
+                db.session.add(Enrollment(student_id=student.id, course_id=course.id))
+            db.session.commit()
+            return course.id
+    
+    def test_instructor_broadcasts_to_every_enrolled_student(self, authenticated_teacher_client, app, sample_course):
+        """Test that one broadcast creates one unread message per enrolled student"""
+        course_id = self._enroll_students(app, 3)
+        
+        response = authenticated_teacher_client.post('/messages/broadcast', data={
+            'course_id': course_id,
+            'subject': 'Exam moved',
+            'body': 'The exam is now on Friday.'
+        }, follow_redirects=True)
+        
+        assert response.status_code == 200
+        assert b'Message sent to 3 student(s)' in response.data
+        with app.app_context():
+            messages = Message.query.filter_by(subject='Exam moved').all()
+            assert len(messages) == 3
+            assert len({m.recipient_id for m in messages}) == 3
+            assert all(m.read is False for m in messages)
+            assert len({m.timestamp for m in messages}) == 1
+    
+    def test_broadcast_read_state_is_per_recipient(self, authenticated_teacher_client, app, sample_course):
+        """Test that reading one copy does not mark the other copies as read"""
+        course_id = self._enroll_students(app, 2)
+        authenticated_teacher_client.post('/messages/broadcast', data={
+            'course_id': course_id,
+            'subject': 'Reminder',
+            'body': 'Homework due tonight.'
+        })
+        
+        with app.app_context():
+            first, second = Message.query.filter_by(subject='Reminder').order_by(Message.id).all()
+            first.read = True
+            db.session.commit()
+            assert Message.query.filter_by(recipient_id=first.recipient_id, read=False).count() == 0
+            assert Message.query.filter_by(recipient_id=second.recipient_id, read=False).count() == 1
+    
+    def test_student_cannot_broadcast(self, authenticated_client):
+        """Test that students cannot open the broadcast form"""
+        response = authenticated_client.get('/messages/broadcast', follow_redirects=True)
+        assert response.status_code == 200
+        assert b'Only instructors and TAs' in response.data
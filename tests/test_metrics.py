@@ -0,0 +1,79 @@
+"""
+Tests for request metrics and the /metrics endpoint
+"""
+import threading
+import pytest
+from app.metrics import Histogram, MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Unit tests for histograms and the registry"""
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that bucket counts accumulate and values on a bound fall inside it"""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        
+        assert list(histogram.cumulative()) == [(0.1, 2), (1.0, 3), (float('inf'), 4)]
+        assert histogram.count == 4
+        assert histogram.sum == pytest.approx(3.65)
+    
+    def test_registry_is_thread_safe(self):
+        """Test that concurrent observations are never lost"""
+        registry = MetricsRegistry()
+        
+        def worker():
+            for _ in range(500):
+                registry.observe_request('main.index', 'GET', 200, 0.01, 0.001, 0.002, 1000)
+        
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        
+        text = registry.render()
+        assert 'lms_http_requests_total{endpoint="main.index",method="GET",status="200"} 4000' in text
+        assert 'lms_http_request_duration_seconds_count{endpoint="main.index"} 4000' in text
+
+
+class TestMetricsEndpoint:
+    """Integration tests for /metrics"""
+    
+    @pytest.fixture(autouse=True)
+    def enable_metrics(self, app):
+        app.config['METRICS_ENABLED'] = True
+    
+    def test_metrics_exposes_per_endpoint_histograms(self, authenticated_teacher_client):
+        """Test that visited endpoints show up with latency, DB, render and size series"""
+        authenticated_teacher_client.get('/teacher_portal')
+        authenticated_teacher_client.get('/analytics')
+        
+        response = authenticated_teacher_client.get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+        text = response.get_data(as_text=True)
+        assert '# TYPE lms_http_request_duration_seconds histogram' in text
+        assert 'lms_http_requests_total{endpoint="main.teacher_portal",method="GET",status="200"} 1' in text
+        assert 'lms_http_request_duration_seconds_bucket{endpoint="main.analytics",le="+Inf"} 1' in text
+        assert 'lms_db_duration_seconds_count{endpoint="main.teacher_portal"} 1' in text
+        assert 'lms_template_render_seconds_count{endpoint="main.analytics"} 1' in text
+        assert 'lms_http_response_size_bytes_count{endpoint="main.analytics"} 1' in text
+    
+    def test_unmatched_routes_are_grouped(self, client):
+        """Test that 404s for unknown URLs do not create one series per URL"""
+        client.get('/no-such-page-1')
+        client.get('/no-such-page-2')
+        text = client.get('/metrics').get_data(as_text=True)
+        assert 'lms_http_requests_total{endpoint="unmatched",method="GET",status="404"} 2' in text
+    
+    def test_metrics_can_be_disabled(self, client, app):
+        """Test that METRICS_ENABLED turns both collection and the endpoint off"""
+        app.config['METRICS_ENABLED'] = False
+        assert client.get('/metrics').status_code == 404
+    
+    def test_metrics_are_off_by_default(self):
+        """Test that the unauthenticated endpoint has to be switched on explicitly"""
+        from app.config import Config
+        assert Config.METRICS_ENABLED is False
@@ -64,3 +64,39 @@ class TestCourseModel:
             assert found_course is not None
             assert found_course.title == 'Test Course'
             assert found_course.instructor.id == teacher.id
+
+
+class TestUpdatedAtTracking:
+    """Test updated_at timestamps used for conditional GET"""
+    
+    def test_updated_at_moves_on_update(self, app, sample_assignment):
+        """Test that updated_at is set on insert and refreshed on update"""
+        with app.app_context():
+            from app.models import db
+            assignment = Assignment.query.get(sample_assignment.id)
+            created = assignment.updated_at
+            assert created is not None
+            
+            assignment.title = 'Renamed Assignment'
+            db.session.commit()
+            assert assignment.updated_at >= created
+
+
+class TestCountProperties:
+    """Test SQL-side submission counts"""
+    
+    def test_grouped_counts_include_empty_rows(self, app, sample_assignment, student_user):
+        """Test that grouped counts cover every requested id, including ones with no rows"""
+        with app.app_context():
+            from app.models import db, Submission
+            student = User.query.filter_by(username='teststudent').first()
+            assignment = Assignment.query.get(sample_assignment.id)
+            empty = Assignment(title='Empty', description='None yet', due_date='2025-12-31',
+                               course_id=assignment.course_id)
+            db.session.add(empty)
+            db.session.add(Submission(assignment_id=assignment.id, student_id=student.id, grade=88.0))
+            db.session.commit()
+            
+            counts = Assignment.submission_counts([assignment.id, empty.id])
+            assert counts[assignment.id] == {'submitted': 1, 'graded': 1, 'late': 1}  # submitted now, due in 2025
+            assert counts[empty.id] == {'submitted': 0, 'graded': 0, 'late': 0}
@@ -0,0 +1,63 @@
+"""
+Tests for the per-request SQL profiler and N+1 detector
+"""
+import json
+import logging
+import pytest
+from app.profiler import QueryProfile
+
+
+class TestQueryProfile:
+    """Unit tests for statement grouping and N+1 detection"""
+    
+    def test_repeated_shape_with_different_params_is_n_plus_one(self):
+        """Test that one statement run for many ids is flagged"""
+        profile = QueryProfile()
+        for i in range(6):
+            profile.record("SELECT * FROM submission\n WHERE id = ?", (i,), 0.001)
+        profile.record("SELECT * FROM course", (), 0.001)
+        
+        summary = profile.summary(threshold=5)
+        assert summary['queries'] == 7
+        assert len(summary['n_plus_one']) == 1
+        assert summary['n_plus_one'][0]['count'] == 6
+    
+    def test_identical_params_are_duplicates_not_n_plus_one(self):
+        """Test that re-running the exact same query is reported only as a duplicate"""
+        profile = QueryProfile()
+        for _ in range(10):
+            profile.record("SELECT * FROM user WHERE id = ?", (1,), 0.001)
+        
+        summary = profile.summary(threshold=5)
+        assert summary['duplicates'][0]['count'] == 10
+        assert summary['n_plus_one'] == []
+
+
+class TestProfilerIntegration:
+    """Integration tests for headers, panel and log line"""
+    
+    def test_profiler_is_off_by_default(self, authenticated_client):
+        """Test that no profiling output is produced unless enabled"""
+        response = authenticated_client.get('/classes')
+        assert 'X-SQL-Query-Count' not in response.headers
+        assert b'sql-profile-panel' not in response.data
+    
+    def test_headers_panel_and_log_line(self, authenticated_client, app, caplog):
+        """Test that an enabled profiler reports through all three surfaces"""
+        app.config['SQL_PROFILER_ENABLED'] = True
+        with caplog.at_level(logging.INFO, logger='app.sql_profile'):
+            response = authenticated_client.get('/classes')
+        
+        assert int(response.headers['X-SQL-Query-Count']) > 0
+        assert 'X-SQL-Query-Time-Ms' in response.headers
+        assert b'class="sql-profile-panel' in response.data
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['endpoint'] == 'main.classes'
+        assert record['queries'] == int(response.headers['X-SQL-Query-Count'])
+    
+    def test_query_budget_fixture(self, authenticated_client, query_budget):
+        """Test that routes can be held to a query budget"""
+        count = query_budget.check(authenticated_client.get('/classes'), max_queries=10)
+        assert count > 0
+        with pytest.raises(AssertionError):
+            query_budget.check(authenticated_client.get('/announcements'), max_queries=0)
@@ -0,0 +1,168 @@
+"""
+Tests for the quiz engine: vectorized scoring, timed attempts and re-scoring
+"""
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app import quizzes
+from app.cache import bump_version, grades_scope, user_scope
+from app.models import db, Assignment, Enrollment, QuizAttempt, QuizQuestion, Submission, User
+
+
+class TestScoring:
+    """Whole-class scoring is array arithmetic"""
+
+    def test_score_matrix(self):
+        answer = np.array([1.0, 3.14, np.nan, 0.0])  # position 2 was deleted
+        tolerance = np.array([0.0, 0.01, 0.0, 0.0])
+        points = np.array([1.0, 2.0, 0.0, 1.0])
+        responses = np.array([
+            [1.0, 3.141, 5.0, 0.0],       # all correct
+            [2.0, 3.2, np.nan, np.nan],   # wrong, out of tolerance, blank
+            [1.0, np.nan, np.nan, 0.0],   # blank numeric
+        ])
+        assert quizzes.score_matrix(responses, answer, tolerance, points).tolist() == [100.0, 0.0, 50.0]
+
+    def test_pack_and_pad(self):
+        blob = quizzes.pack_responses({0: 2.0, 2: 7.5}, 3)
+        assert len(blob) == 24
+        matrix = quizzes.response_matrix([blob, None, blob[:8]], 4)
+        assert matrix.shape == (3, 4)
+        assert matrix[0, 2] == 7.5 and np.isnan(matrix[0, 1]) and np.isnan(matrix[0, 3])
+        assert np.isnan(matrix[1]).all() and matrix[2, 0] == 2.0
+
+
+@pytest.fixture
+def quiz(app, sample_assignment):
+    """Two questions (choice answer 2 of 3 worth 1, numeric 9.81 ± 0.05 worth 3) and five enrolled students"""
+    with app.app_context():
+        assignment = db.session.get(Assignment, sample_assignment.id)
+        assignment.assignment_type = 'quiz'
+        db.session.add_all([
+            QuizQuestion(assignment_id=assignment.id, position=0, kind='choice', prompt='Pick B',
+                         choices='A\nB\nC', answer=1, points=1),
+            QuizQuestion(assignment_id=assignment.id, position=1, kind='numeric', prompt='g?',
+                         answer=9.81, tolerance=0.05, points=3),
+        ])
+        students = []
+        for i in range(5):
+            student = User(username=f'quizzer{i}', email=f'quizzer{i}@test.com', role='student')
+            student.set_password('password123')
+            db.session.add(student)
+            db.session.flush()
+            db.session.add(Enrollment(student_id=student.id, course_id=assignment.course_id))
+            students.append(student.id)
+        db.session.commit()
+        return {'assignment_id': assignment.id, 'students': students}
+
+
+def take(assignment_id, student_id, values, now=None):
+    assignment = db.session.get(Assignment, assignment_id)
+    attempt = quizzes.start(assignment, student_id, now=now)
+    scopes = quizzes.submit(attempt, values)
+    db.session.commit()
+    bump_version(*scopes)
+    return attempt.id
+
+
+class TestAttempts:
+    """Attempts are scored on submit and written to the submission"""
+
+    def test_submit_scores_and_grades(self, app, quiz):
+        with app.app_context():
+            student = quiz['students'][0]
+            take(quiz['assignment_id'], student, {0: 1.0, 1: 9.8})
+            submission = Submission.query.filter_by(student_id=student).one()
+            assert submission.grade == 100.0
+            take(quiz['assignment_id'], quiz['students'][1], {0: 0.0, 1: 9.8})
+            assert Submission.query.filter_by(student_id=quiz['students'][1]).one().grade == 75.0
+
+    def test_one_attempt_only(self, app, quiz):
+        with app.app_context():
+            student = quiz['students'][0]
+            take(quiz['assignment_id'], student, {0: 0.0})
+            attempt = quizzes.attempt_for(quiz['assignment_id'], student)
+            assert quizzes.submit(attempt, {0: 1.0, 1: 9.81}) is None
+            assert db.session.get(QuizAttempt, attempt.id).score == 0.0
+
+    def test_late_answers_are_not_accepted(self, app, quiz):
+        with app.app_context():
+            db.session.get(Assignment, quiz['assignment_id']).time_limit_minutes = 10
+            db.session.commit()
+            student = quiz['students'][0]
+            take(quiz['assignment_id'], student, {0: 1.0, 1: 9.81}, now=datetime.utcnow() - timedelta(minutes=11))
+            attempt = quizzes.attempt_for(quiz['assignment_id'], student)
+            assert attempt.score == 0.0
+            assert np.isnan(quizzes.unpack_responses(attempt.responses)).all()
+
+    def test_key_correction_rescores_class(self, app, quiz):
+        with app.app_context():
+            for student, choice in zip(quiz['students'], [0.0, 1.0, 2.0, 0.0, 1.0]):
+                take(quiz['assignment_id'], student, {0: choice, 1: 9.81})
+            question = QuizQuestion.query.filter_by(assignment_id=quiz['assignment_id'], position=0).one()
+            question.answer = 0.0  # the key said B, the right answer is A
+            db.session.flush()
+            rescored, scopes = quizzes.rescore(quiz['assignment_id'])
+            assert rescored == 5
+            assert grades_scope(db.session.get(Assignment, quiz['assignment_id']).course_id) in scopes
+            assert {user_scope(student) for student in quiz['students']} <= scopes
+            db.session.commit()
+            grades = [Submission.query.filter_by(student_id=s).one().grade for s in quiz['students']]
+            assert grades == [100.0, 75.0, 75.0, 100.0, 75.0]
+
+
+class TestPages:
+    """Instructor edits the bank; students take the quiz"""
+
+    def test_instructor_adds_and_corrects_question(self, app, authenticated_teacher_client, quiz):
+        url = f"/assignment/{quiz['assignment_id']}/quiz/edit"
+        response = authenticated_teacher_client.post(url, data={
+            'kind': 'numeric', 'prompt': 'Pi?', 'answer': '3.14', 'tolerance': '0.01', 'points': '1'},
+            follow_redirects=True)
+        assert b'Question added.' in response.data and b'Pi?' in response.data
+        response = authenticated_teacher_client.post(url, data={
+            'kind': 'choice', 'prompt': 'Bad', 'choices': 'only one', 'answer': '1', 'points': '1'})
+        assert b'Give at least two choices' in response.data
+        with app.app_context():
+            take(quiz['assignment_id'], quiz['students'][0], {0: 1.0, 1: 9.81, 2: 3.0})
+            question = QuizQuestion.query.filter_by(assignment_id=quiz['assignment_id'], position=2).one()
+            assert db.session.get(QuizAttempt, 1).score == 80.0
+        response = authenticated_teacher_client.post(f'/quiz_question/{question.id}/edit', data={
+            'kind': 'numeric', 'prompt': 'Pi?', 'answer': '3.0', 'tolerance': '0', 'points': '1'},
+            follow_redirects=True)
+        assert b'1 attempts re-scored' in response.data
+        with app.app_context():
+            assert db.session.get(QuizAttempt, 1).score == 100.0
+
+    def test_remove_question_needs_csrf_token(self, app, authenticated_teacher_client, quiz):
+        """A POST without the editor's token cannot delete a question and rescore the class"""
+        with app.app_context():
+            question_id = QuizQuestion.query.filter_by(assignment_id=quiz['assignment_id'], position=0).one().id
+        app.config['WTF_CSRF_ENABLED'] = True
+        assert authenticated_teacher_client.post(f'/quiz_question/{question_id}/delete').status_code == 400
+        with app.app_context():
+            assert db.session.get(QuizQuestion, question_id) is not None
+
+        page = authenticated_teacher_client.get(f"/assignment/{quiz['assignment_id']}/quiz/edit").get_data(as_text=True)
+        token = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
+        response = authenticated_teacher_client.post(f'/quiz_question/{question_id}/delete', data={'csrf_token': token})
+        assert response.status_code == 302
+        with app.app_context():
+            assert db.session.get(QuizQuestion, question_id) is None
+
+    def test_student_takes_quiz(self, app, authenticated_client, quiz, student_user):
+        app.config['TIMEZONE'] = 'America/New_York'
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            db.session.add(Enrollment(student_id=student.id, course_id=Assignment.query.get(quiz['assignment_id']).course_id))
+            db.session.commit()
+        url = f"/assignment/{quiz['assignment_id']}/quiz"
+        assert b'Start Quiz' in authenticated_client.get(url).data
+        page = authenticated_client.post(f'{url}/start', follow_redirects=True).data
+        assert b'name="q0"' in page and b'9.81' not in page  # no answers in the page
+        page = authenticated_client.post(f'{url}/submit', data={'q0': '2', 'q1': '9.8'}, follow_redirects=True).data
+        assert b'Quiz submitted!' in page and b'100.0' in page
+        assert b'EST' in page or b'EDT' in page  # submitted time in the app's timezone
@@ -0,0 +1,81 @@
+"""
+Tests for token-bucket rate limiting of auth and messaging posts
+"""
+import pytest
+
+from app.ratelimit import MemoryBuckets, SQLiteBuckets, validate
+
+
+def stores(tmp_path):
+    return [MemoryBuckets(), SQLiteBuckets(str(tmp_path / 'limits.db'))]
+
+
+class TestBuckets:
+    """Both stores refill continuously and never hold more than the burst"""
+
+    @pytest.mark.parametrize('store', [0, 1])
+    def test_burst_then_refill(self, tmp_path, store):
+        buckets = stores(tmp_path)[store]
+        results = [buckets.take('k', 3, 0.5, now=100.0)[0] for _ in range(4)]
+        assert results == [True, True, True, False]
+        assert buckets.take('k', 3, 0.5, now=101.0)[0] is False  # half a token back
+        assert buckets.take('k', 3, 0.5, now=102.0)[0] is True
+        assert buckets.take('other', 3, 0.5, now=102.0)[0] is True
+        allowed, tokens = buckets.take('k', 3, 0.5, now=1000.0)
+        assert allowed and tokens == pytest.approx(2.0)
+
+    def test_sqlite_buckets_are_shared_between_processes(self, tmp_path):
+        first, second = SQLiteBuckets(str(tmp_path / 'limits.db')), SQLiteBuckets(str(tmp_path / 'limits.db'))
+        assert first.take('k', 2, 1.0, now=10.0)[0] and second.take('k', 2, 1.0, now=10.0)[0]
+        assert first.take('k', 2, 1.0, now=10.0)[0] is False
+        assert second.prune(60, now=100.0) == 1
+
+    def test_memory_buckets_evict_least_recently_used(self):
+        buckets = MemoryBuckets(max_entries=2)
+        buckets.take('a', 1, 0.001, now=0.0)
+        buckets.take('b', 1, 0.001, now=0.0)
+        buckets.take('c', 1, 0.001, now=0.0)
+        assert buckets.take('a', 1, 0.001, now=0.0)[0] is True  # evicted, so full again
+        assert buckets.take('c', 1, 0.001, now=0.0)[0] is False
+
+
+def login(client, username, ip):
+    return client.post('/auth/login', data={'username': username, 'password': 'wrong'},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+class TestLimits:
+    """Posts to limited endpoints get 429 with Retry-After once a bucket is empty"""
+
+    def test_login_limited_per_username_across_addresses(self, client, student_user):
+        for n in range(10):
+            assert login(client, 'teststudent', f'10.0.0.{n}').status_code == 200
+        response = login(client, 'TestStudent', '10.0.1.1')
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '30'  # 2 per minute
+        assert login(client, 'someoneelse', '10.0.1.1').status_code == 200
+
+    def test_login_limited_per_address_across_usernames(self, client):
+        for n in range(20):
+            assert login(client, f'user{n}', '10.0.0.1').status_code == 200
+        assert login(client, 'user99', '10.0.0.1').status_code == 429
+        assert login(client, 'user99', '10.0.0.2').status_code == 200
+        assert client.get('/auth/login', environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code == 200
+
+    def test_messages_limited_per_user(self, authenticated_client):
+        for _ in range(10):
+            assert authenticated_client.post('/messages/compose', data={}).status_code == 200
+        response = authenticated_client.post('/messages/compose', data={})
+        assert response.status_code == 429 and int(response.headers['Retry-After']) == 12
+
+    def test_rules_that_never_refill_are_rejected(self, app):
+        """per_minute 0 would divide by zero in Retry-After, so the app refuses to start with it"""
+        validate(app.config['RATELIMITS'])
+        for rule in ({"by": "ip", "burst": 5, "per_minute": 0}, {"by": "ip", "burst": 0, "per_minute": 1}):
+            with pytest.raises(ValueError):
+                validate({"auth.login": [rule]})
+    
+    def test_can_be_disabled(self, app, client):
+        app.config['RATELIMIT_ENABLED'] = False
+        for _ in range(25):
+            assert login(client, 'teststudent', '10.0.0.1').status_code == 200
@@ -0,0 +1,88 @@
+"""
+Tests for the list-page read models
+"""
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import readmodels
+from app.models import db, User, Enrollment, Submission, Message
+
+
+@pytest.fixture
+def statements(app):
+    """SQL statements run while the test body executes"""
+    captured = []
+    record = lambda conn, cursor, statement, *args: captured.append(statement)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+        yield captured
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+class TestReadModels:
+    """Column projections into named tuples, never the large text columns"""
+
+    def test_inbox_skips_bodies(self, app, student_user, teacher_user, statements):
+        student = User.query.filter_by(username='teststudent').first()
+        teacher = User.query.filter_by(username='testteacher').first()
+        db.session.add(Message(sender_id=student.id, recipient_id=teacher.id, subject='Question', body='long body'))
+        db.session.commit()
+        statements.clear()
+        (item,) = readmodels.inbox(teacher.id)
+        assert isinstance(item, readmodels.MessageItem)
+        assert (item.subject, item.correspondent, item.read) == ('Question', 'teststudent', False)
+        assert not any('body' in statement for statement in statements)
+        assert readmodels.sent(student.id)[0].correspondent == 'testteacher'
+
+    def test_submission_notes_are_previewed(self, app, sample_assignment, student_user, statements):
+        student = User.query.filter_by(username='teststudent').first()
+        db.session.add(Submission(assignment_id=sample_assignment.id, student_id=student.id,
+                                  content='n' * (readmodels.PREVIEW_CHARS + 50)))
+        db.session.commit()
+        (item,) = readmodels.submissions(sample_assignment.id)
+        assert item.student_username == 'teststudent'
+        assert len(item.content_preview) == readmodels.PREVIEW_CHARS
+        assert (item.content_truncated, item.is_late, item.claimed) == (True, True, False)  # due 2025-12-31
+        selected = [re.sub(r'(substr|length)\(submission\.content', '', statement) for statement in statements]
+        assert not any('submission.content' in statement for statement in selected)
+
+    def test_student_assignments_only_enrolled(self, app, sample_assignment, student_user):
+        student = User.query.filter_by(username='teststudent').first()
+        assert readmodels.assignments(student.id) == []
+        db.session.add(Enrollment(student_id=student.id, course_id=sample_assignment.course_id))
+        db.session.commit()
+        (item,) = readmodels.assignments(student.id, sort='due_date')
+        assert (item.title, item.course_title) == ('Test Assignment', 'Test Course')
+
+    def test_taught_courses(self, app, sample_course, student_user):
+        student = User.query.filter_by(username='teststudent').first()
+        db.session.add(Enrollment(student_id=student.id, course_id=sample_course.id))
+        db.session.commit()
+        (course,) = readmodels.taught_courses(sample_course.teacher)
+        assert course.enrollment_count == 1
+        assert course.students == (readmodels.StudentItem(student.id, 'teststudent', 'student@test.com'),)
+
+    def test_rows_are_not_tracked(self, app, sample_assignment, student_user):
+        student = User.query.filter_by(username='teststudent').first()
+        db.session.add(Submission(assignment_id=sample_assignment.id, student_id=student.id))
+        db.session.commit()
+        db.session.expunge_all()
+        readmodels.submissions(sample_assignment.id)
+        assert len(db.session.identity_map) == 0
+
+
+class TestListPages:
+    """Pages render from the read models"""
+
+    def test_view_submissions(self, app, authenticated_teacher_client, sample_assignment, student_user):
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            db.session.add(Submission(assignment_id=sample_assignment.id, student_id=student.id,
+                                      content='see attached'))
+            db.session.commit()
+        page = authenticated_teacher_client.get(f'/view_submissions/{sample_assignment.id}').data
+        assert b'teststudent (student@test.com)' in page
+        assert b'see attached' in page
+        assert b'Late' in page  # submitted after the 2025-12-31 deadline
@@ -0,0 +1,160 @@
+"""
+Tests for read/write session routing against two SQLite files
+
+The "replica" is a second database file that only changes when a test copies
+the primary over it, so every page shows which engine served it.
+"""
+import sqlite3
+
+import pytest
+
+from app import create_app
+from app.config import Config
+from app.models import db, User, Course, Message
+from app.replica import read_url
+
+
+@pytest.fixture
+def routed(tmp_path):
+    """App whose GET requests read from replica.db; returns (app, replicate, replica_path)"""
+    primary = tmp_path / "primary.db"
+    replica = tmp_path / "replica.db"
+
+    class RoutedConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{primary}"
+        DB_READ_URL = f"sqlite:///{replica}"
+        CACHE_TYPE = "null"
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+
+    app = create_app(RoutedConfig)
+    with app.app_context():
+        teacher = User(username="routeteacher", email="routeteacher@test.com", role="instructor")
+        teacher.set_password("password123")
+        student = User(username="routestudent", email="routestudent@test.com", role="student")
+        student.set_password("password123")
+        db.session.add_all([teacher, student])
+        db.session.flush()
+        db.session.add(Course(title="Replica Course", code="RT101", teacher=teacher.id))
+        db.session.add(Message(sender_id=teacher.id, recipient_id=student.id, subject="Hello", body="Hi"))
+        db.session.commit()
+
+    def replicate():
+        """Copy the primary onto the replica, like a replication cycle"""
+        source, target = sqlite3.connect(primary), sqlite3.connect(replica)
+        source.backup(target)
+        source.close()
+        target.close()
+
+    replicate()
+    yield app, replicate, replica
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def login(client, username):
+    client.post("/auth/login", data={"username": username, "password": "password123"})
+
+
+def replica_rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+class TestReadWriteRouting:
+    """GET views read from the replica, writes go to the primary"""
+
+    def test_get_reads_from_replica(self, routed):
+        app, _, _ = routed
+        with app.app_context():
+            Course.query.filter_by(code="RT101").first().title = "Primary Course"
+            db.session.commit()
+        client = app.test_client()
+        login(client, "routeteacher")
+        response = client.get("/classes")
+        assert b"Replica Course" in response.data
+        assert b"Primary Course" not in response.data
+
+    def test_post_writes_primary_and_reads_own_writes(self, routed):
+        app, _, replica = routed
+        client = app.test_client()
+        login(client, "routeteacher")
+        response = client.post("/create_course", data={
+            "name": "Sticky Course", "code": "RT202", "description": "Created after replication",
+        })
+        assert response.status_code == 302
+        assert replica_rows(replica, "SELECT id FROM course WHERE code = 'RT202'") == []
+        # The replica has not caught up, but this user is pinned to the primary
+        assert b"Sticky Course" in client.get("/classes").data
+
+    def test_stickiness_expires(self, routed):
+        app, replicate, _ = routed
+        app.config["DB_READ_STICKY_SECONDS"] = 0
+        client = app.test_client()
+        login(client, "routeteacher")
+        client.post("/create_course", data={"name": "Lagging Course", "code": "RT303", "description": "New"})
+        assert b"Lagging Course" not in client.get("/classes").data
+        replicate()
+        assert b"Lagging Course" in client.get("/classes").data
+
+    def test_other_sessions_are_not_pinned(self, routed):
+        app, _, _ = routed
+        writer, other = app.test_client(), app.test_client()
+        login(writer, "routeteacher")
+        login(other, "routeteacher")
+        writer.post("/create_course", data={"name": "Pinned Course", "code": "RT404", "description": "New"})
+        assert b"Pinned Course" in writer.get("/classes").data
+        assert b"Pinned Course" not in other.get("/classes").data  # still served by the replica
+
+    def test_write_inside_get_goes_to_primary(self, routed):
+        app, _, replica = routed
+        client = app.test_client()
+        login(client, "routestudent")
+        with app.app_context():
+            message_id = Message.query.filter_by(subject="Hello").first().id
+        response = client.get(f"/messages/{message_id}")
+        assert response.status_code == 200
+        with app.app_context():
+            assert db.session.get(Message, message_id).read is True
+        assert replica_rows(replica, f"SELECT read FROM message WHERE id = {message_id}") == [(0,)]
+
+
+class TestReadOnlyPool:
+    """DB_READ_ONLY_POOL opens the primary SQLite file read-only for GET requests"""
+
+    def test_read_url_derived_from_sqlite_file(self):
+        url = read_url({"SQLALCHEMY_DATABASE_URI": "sqlite:///app.db", "DB_READ_ONLY_POOL": True})
+        assert url == "sqlite:///file:app.db?mode=ro&uri=true"
+
+    def test_routing_off_by_default_and_for_memory(self):
+        assert read_url({"SQLALCHEMY_DATABASE_URI": "sqlite:///app.db"}) is None
+        assert read_url({"SQLALCHEMY_DATABASE_URI": "sqlite://", "DB_READ_ONLY_POOL": True}) is None
+        assert read_url({"SQLALCHEMY_DATABASE_URI": "sqlite:///app.db", "DB_READ_URL": "sqlite:///r.db"}) == "sqlite:///r.db"
+
+    def test_pages_and_writes_work_with_read_only_pool(self, tmp_path):
+        """Any write routed to the read engine would fail with 'readonly database'"""
+        class ReadOnlyPoolConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+            DB_READ_ONLY_POOL = True
+            CACHE_TYPE = "null"
+            TESTING = True
+            WTF_CSRF_ENABLED = False
+
+        app = create_app(ReadOnlyPoolConfig)
+        app.config["DB_READ_STICKY_SECONDS"] = 0  # so the GET below really uses the read-only pool
+        client = app.test_client()
+        client.post("/auth/register", data={
+            "username": "poolteacher", "email": "poolteacher@test.com", "password": "password123",
+            "password_confirm": "password123", "role": "instructor",
+        })
+        assert client.post("/create_course", data={
+            "name": "Pool Course", "code": "RO101", "description": "Written through the primary",
+        }).status_code == 302
+        assert b"Pool Course" in client.get("/classes").data
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
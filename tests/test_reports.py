@@ -0,0 +1,99 @@
+"""
+Tests for the instructor deadline report
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app import reports
+from app.models import db, User, Assignment, Submission
+
+DUE = datetime(2025, 12, 31, 23, 59, 59)  # sample_assignment's deadline in UTC
+
+
+@pytest.fixture
+def timed_submissions(app, sample_assignment):
+    """Five students submitting at known offsets from the deadline"""
+    offsets = {  # hours before the deadline; negative is late
+        'early': 100, 'day': 30, 'rush': 0.5, 'slightly_late': -0.5, 'very_late': -48,
+    }
+    with app.app_context():
+        for name, hours in offsets.items():
+            student = User(username=f'report_{name}', email=f'{name}@test.com', role='student')
+            student.set_password('password123')
+            db.session.add(student)
+            db.session.flush()
+            db.session.add(Submission(assignment_id=sample_assignment.id, student_id=student.id,
+                                      submitted_at=DUE - timedelta(hours=hours),
+                                      attempts=3 if name == 'rush' else 1))
+        db.session.commit()
+    return sample_assignment
+
+
+class TestDeadlineReport:
+    """Counts and histogram buckets come from SQL aggregates"""
+
+    def test_counts_and_resubmissions(self, app, timed_submissions):
+        with app.app_context():
+            report = reports.deadline_report(timed_submissions.course_id)
+        (row,) = report['assignments']
+        assert (row['submitted'], row['on_time'], row['late']) == (5, 3, 2)
+        assert (row['resubmissions'], row['resubmitted_students']) == (2, 1)
+        assert report['totals']['late'] == 2
+
+    def test_histogram_buckets(self, app, timed_submissions):
+        with app.app_context():
+            report = reports.deadline_report(timed_submissions.course_id)
+        histogram = dict(zip(report['buckets'], report['histogram']))
+        assert histogram == {
+            '> 7 days early': 0, '3-7 days early': 1, '1-3 days early': 1, '6-24 hours early': 0,
+            '1-6 hours early': 0, 'last hour': 1, '< 1 hour late': 1, '1-24 hours late': 0, '> 1 day late': 1,
+        }
+
+    def test_empty_assignment_listed(self, app, sample_assignment):
+        with app.app_context():
+            report = reports.deadline_report(sample_assignment.course_id)
+        assert report['assignments'][0]['submitted'] == 0
+        assert sum(report['histogram']) == 0
+
+    def test_query_count_is_independent_of_rows(self, app, timed_submissions):
+        with app.app_context():
+            statements = []
+            record = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                reports.deadline_report(timed_submissions.course_id)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+        assert len(statements) == 2
+
+
+class TestDeadlineReportPage:
+    """Only the course instructor can open the report"""
+
+    def test_instructor_sees_report(self, authenticated_teacher_client, timed_submissions):
+        response = authenticated_teacher_client.get(f'/course/{timed_submissions.course_id}/deadline_report')
+        assert response.status_code == 200
+        assert b'Deadline Report' in response.data
+        assert b'Test Assignment' in response.data
+
+    def test_student_is_redirected(self, authenticated_client, timed_submissions):
+        response = authenticated_client.get(f'/course/{timed_submissions.course_id}/deadline_report')
+        assert response.status_code == 302
+
+    def test_resubmission_increments_attempts(self, app, authenticated_client, sample_assignment):
+        url = f'/submit_assignment/{sample_assignment.id}'
+        authenticated_client.post(url, data={'content': 'first'})
+        authenticated_client.post(url, data={'content': 'second'})
+        with app.app_context():
+            assert Submission.query.filter_by(assignment_id=sample_assignment.id).one().attempts == 2
+
+    @pytest.mark.parametrize('dialect, function', [
+        ('sqlite', 'julianday'), ('postgresql', 'EXTRACT(epoch'), ('mysql', 'timestampdiff(SECOND'),
+    ])
+    def test_hours_compile_per_dialect(self, dialect, function):
+        """The deadline arithmetic is not tied to SQLite"""
+        from sqlalchemy.dialects import mysql, postgresql, sqlite
+        module = {'sqlite': sqlite, 'postgresql': postgresql, 'mysql': mysql}[dialect]
+        assert function in str(reports.hours_before_due(dialect).compile(dialect=module.dialect()))
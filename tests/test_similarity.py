@@ -0,0 +1,118 @@
+"""
+Tests for MinHash LSH near-duplicate detection
+"""
+import io
+import random
+
+from app import extraction, similarity
+from app.models import db, SimilarityBucket, Submission, SubmissionSignature, User
+
+WORDS = [f"word{n}" for n in range(500)]
+
+
+def essay(seed, length=400):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def add_submissions(assignment_id, texts):
+    """One student and submission per text, indexed as on submit; returns submission ids"""
+    ids = []
+    for i, text in enumerate(texts):
+        student = User(username=f'writer{i}', email=f'writer{i}@test.com', role='student')
+        student.set_password('password123')
+        db.session.add(student)
+        db.session.flush()
+        submission = Submission(assignment_id=assignment_id, student_id=student.id, content=text)
+        db.session.add(submission)
+        db.session.flush()
+        similarity.index(submission.id, assignment_id, text)
+        ids.append(submission.id)
+    db.session.commit()
+    return ids
+
+
+class TestSignatures:
+    """Signatures estimate Jaccard similarity and pack into a BLOB"""
+
+    def test_estimate_tracks_jaccard(self):
+        first, second = essay(1), essay(1)[:1500] + " " + essay(2)[:1500]
+        a, b = similarity.shingles(first), similarity.shingles(second)
+        jaccard = len(a & b) / len(a | b)
+        estimated = similarity.estimate(similarity.minhash(a), similarity.minhash(b))
+        assert abs(estimated - jaccard) < 0.15
+
+    def test_formatting_does_not_matter(self):
+        code = "def add(a, b):\n    return a + b\n"
+        assert similarity.shingles(code) == similarity.shingles("DEF add( a,b ):  return a+b")
+
+    def test_pack_round_trip(self):
+        signature = similarity.minhash(similarity.shingles(essay(3)))
+        blob = similarity.pack(signature)
+        assert len(blob) == 4 * 128
+        assert list(similarity.unpack(blob)) == signature
+        assert len(similarity.buckets(blob, 32)) == 32
+
+
+class TestReport:
+    """Only copied pairs are reported, from the LSH buckets"""
+
+    def test_finds_copied_pair(self, app, sample_assignment):
+        with app.app_context():
+            copied = essay(10)
+            ids = add_submissions(sample_assignment.id,
+                                  [copied, essay(11), copied.replace("word1 ", "word2 ") + " extra", essay(12)])
+            (pair,) = similarity.suspicious_pairs(sample_assignment.id)
+            assert (pair.first_id, pair.second_id) == (ids[0], ids[2])
+            assert (pair.first_username, pair.second_username) == ('writer0', 'writer2')
+            assert pair.similarity > 0.8
+
+    def test_unrelated_pairs_are_not_candidates(self, app, sample_assignment):
+        with app.app_context():
+            add_submissions(sample_assignment.id, [essay(seed) for seed in range(20)])
+            assert similarity.candidates(sample_assignment.id) == []
+
+    def test_reindex_replaces_buckets(self, app, sample_assignment):
+        with app.app_context():
+            first, second = add_submissions(sample_assignment.id, [essay(20), essay(20)])
+            similarity.index(second, sample_assignment.id, essay(21))
+            db.session.commit()
+            assert similarity.suspicious_pairs(sample_assignment.id) == []
+            assert SimilarityBucket.query.filter_by(submission_id=second).count() == 32
+            similarity.index(second, sample_assignment.id, "")
+            assert db.session.get(SubmissionSignature, second) is None
+
+    def test_backfill(self, app, sample_assignment, student_user):
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            db.session.add(Submission(assignment_id=sample_assignment.id, student_id=student.id, content=essay(30)))
+            db.session.commit()
+            assert similarity.reindex() == 1
+            assert similarity.reindex() == 0
+
+
+class TestPages:
+    """Submitting indexes the hand-in; graders see the report"""
+
+    def test_submit_indexes_file_once_extracted(self, app, authenticated_client, sample_assignment, tmp_path):
+        app.config['UPLOAD_FOLDER'] = str(tmp_path)
+        authenticated_client.post(
+            f'/submit_assignment/{sample_assignment.id}',
+            data={'content': 'my essay', 'idempotency_key': 'k1',
+                  'file': (io.BytesIO(essay(40).encode()), 'essay.txt')},
+            content_type='multipart/form-data')
+        with app.app_context():
+            assert SubmissionSignature.query.one().shingle_count == 1  # notes only until the file is read
+            extraction.run_pending(workers=1)
+            signature = SubmissionSignature.query.one()
+            assert signature.shingle_count == len(similarity.shingles('my essay\n' + essay(40)))
+
+    def test_report_page(self, app, authenticated_teacher_client, sample_assignment):
+        with app.app_context():
+            add_submissions(sample_assignment.id, [essay(50), essay(50)])
+        response = authenticated_teacher_client.get(f'/assignment/{sample_assignment.id}/similarity')
+        assert b'writer0' in response.data and b'100%' in response.data
+
+    def test_students_are_refused(self, app, authenticated_client, sample_assignment):
+        response = authenticated_client.get(f'/assignment/{sample_assignment.id}/similarity', follow_redirects=True)
+        assert b'You can only check submissions' in response.data
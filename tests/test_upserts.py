@@ -0,0 +1,158 @@
+"""
+Tests for unique keys, ON CONFLICT upserts and idempotency keys on create forms
+"""
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+
+from app import create_app
+from app.config import Config
+from app.models import db, User, Enrollment, Submission, SubmissionVersion, TAAssignment, IdempotencyKey
+
+
+def user_id(username='teststudent'):
+    return User.query.filter_by(username=username).first().id
+
+
+class TestUniqueKeys:
+    """The database refuses a second row for the same pair"""
+
+    @pytest.mark.parametrize('model, columns', [
+        (Enrollment, ('student_id', 'course_id')),
+        (TAAssignment, ('ta_id', 'course_id')),
+        (Submission, ('student_id', 'assignment_id')),
+    ])
+    def test_duplicate_rejected(self, app, sample_assignment, student_user, model, columns):
+        with app.app_context():
+            values = dict(zip(columns, (user_id(), sample_assignment.course_id)))
+            if model is Submission:
+                values['assignment_id'] = sample_assignment.id
+            db.session.add(model(**values))
+            db.session.commit()
+            db.session.add(model(**values))
+            with pytest.raises(IntegrityError):
+                db.session.commit()
+            db.session.rollback()
+
+
+class TestIdempotentPosts:
+    """Posting the same form twice does the work once"""
+
+    def test_repeated_submission_is_noop(self, app, authenticated_client, sample_assignment):
+        url = f'/submit_assignment/{sample_assignment.id}'
+        data = {'content': 'final answer', 'idempotency_key': 'click-1'}
+        authenticated_client.post(url, data=data)
+        response = authenticated_client.post(url, data=data, follow_redirects=True)
+        assert b'already received' in response.data
+        with app.app_context():
+            submission = Submission.query.filter_by(assignment_id=sample_assignment.id).one()
+            assert submission.attempts == 1
+            assert SubmissionVersion.query.filter_by(submission_id=submission.id).count() == 1
+
+    def test_new_key_resubmits(self, app, authenticated_client, sample_assignment):
+        url = f'/submit_assignment/{sample_assignment.id}'
+        authenticated_client.post(url, data={'content': 'draft', 'idempotency_key': 'page-1'})
+        authenticated_client.post(url, data={'content': 'final', 'idempotency_key': 'page-2'})
+        with app.app_context():
+            submission = Submission.query.filter_by(assignment_id=sample_assignment.id).one()
+            assert (submission.attempts, submission.content) == (2, 'final')
+
+    def test_form_renders_key(self, authenticated_client, sample_assignment):
+        page = authenticated_client.get(f'/submit_assignment/{sample_assignment.id}').data
+        assert b'name="idempotency_key"' in page
+
+    def test_enroll_twice(self, app, authenticated_teacher_client, sample_course, student_user):
+        url = f'/course/{sample_course.id}/enroll'
+        data = {'student_identifier': 'teststudent', 'idempotency_key': 'enroll-1'}
+        authenticated_teacher_client.post(url, data=data)
+        response = authenticated_teacher_client.post(url, data=data, follow_redirects=True)
+        assert b'already enrolled' in response.data
+        with app.app_context():
+            assert Enrollment.query.filter_by(course_id=sample_course.id).count() == 1
+
+    def test_same_key_different_target_is_processed(self, app, authenticated_teacher_client, sample_course,
+                                                     student_user, ta_user):
+        # A cached course page hands one key to every enroll post made from it
+        url = f'/course/{sample_course.id}/enroll'
+        for identifier in ('teststudent', 'testta'):
+            authenticated_teacher_client.post(url, data={'student_identifier': identifier,
+                                                         'idempotency_key': 'cached-page'})
+        with app.app_context():
+            assert Enrollment.query.filter_by(course_id=sample_course.id).count() == 2
+            assert IdempotencyKey.query.count() == 2
+
+    def test_assign_ta_twice(self, app, authenticated_teacher_client, sample_course, ta_user):
+        url = f'/course/{sample_course.id}/manage_tas'
+        with app.app_context():
+            data = {'ta_id': user_id('testta'), 'course_id': sample_course.id}
+        authenticated_teacher_client.post(url, data={**data, 'idempotency_key': 'ta-1'})
+        response = authenticated_teacher_client.post(url, data={**data, 'idempotency_key': 'ta-2'},
+                                                     follow_redirects=True)
+        assert b'already assigned' in response.data
+        with app.app_context():
+            assert TAAssignment.query.filter_by(course_id=sample_course.id).count() == 1
+
+
+class TestConcurrentSubmissions:
+    """Simultaneous hand-ins from one student end up as one row with every version"""
+
+    def test_concurrent_posts(self, app, sample_assignment, student_user):
+        threads_count = 8
+        barrier = threading.Barrier(threads_count)
+        errors = []
+
+        def hand_in(n):
+            try:
+                client = app.test_client()
+                client.post('/auth/login', data={'username': 'teststudent', 'password': 'password123'})
+                barrier.wait()
+                response = client.post(f'/submit_assignment/{sample_assignment.id}',
+                                       data={'content': f'attempt {n}', 'idempotency_key': f'tab-{n}'})
+                assert response.status_code == 302
+            except Exception as exc:  # surfaced in the main thread below
+                errors.append(exc)
+
+        threads = [threading.Thread(target=hand_in, args=(n,)) for n in range(threads_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+
+        with app.app_context():
+            db.session.expire_all()
+            submission = Submission.query.filter_by(assignment_id=sample_assignment.id).one()
+            numbers = [v.number for v in SubmissionVersion.query.filter_by(submission_id=submission.id)]
+            assert submission.attempts == threads_count
+            assert sorted(numbers) == list(range(1, threads_count + 1))
+            assert submission.latest_version.number == threads_count
+
+
+class TestUniqueKeyMigration:
+    """Duplicate rows in an older database are collapsed before the unique index is added"""
+
+    def test_duplicates_removed(self, tmp_path):
+        path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE enrollment (id INTEGER NOT NULL, student_id INTEGER NOT NULL,
+                                     course_id INTEGER NOT NULL, PRIMARY KEY (id));
+            INSERT INTO enrollment (id, student_id, course_id) VALUES (1, 5, 1), (2, 5, 1), (3, 6, 1);
+        """)
+        conn.close()
+
+        class LegacyConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            CACHE_TYPE = 'null'
+            TESTING = True
+
+        app = create_app(LegacyConfig)
+        with app.app_context():
+            assert [e.id for e in Enrollment.query.order_by(Enrollment.id)] == [1, 3]
+            indexes = {ix['name']: ix for ix in inspect(db.engine).get_indexes('enrollment')}
+            assert indexes['uq_enrollment_student_course']['unique']
+            for engine in db.engines.values():
+                engine.dispose()
@@ -0,0 +1,170 @@
+"""
+Tests for append-only submission history and its retention policy
+"""
+import io
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app, versioning
+from app.config import Config
+from app.models import db, User, Submission, SubmissionVersion
+
+
+@pytest.fixture
+def uploads(app, tmp_path):
+    """Point UPLOAD_FOLDER at a scratch directory"""
+    previous = app.config['UPLOAD_FOLDER']
+    app.config['UPLOAD_FOLDER'] = str(tmp_path)
+    yield tmp_path
+    app.config['UPLOAD_FOLDER'] = previous
+
+
+def submit(client, assignment_id, content, data=None, name='answer.txt'):
+    form = {'content': content}
+    if data is not None:
+        form['file'] = (io.BytesIO(data), name)
+    return client.post(f'/submit_assignment/{assignment_id}', data=form, content_type='multipart/form-data')
+
+
+def versions_of(assignment_id):
+    submission = Submission.query.filter_by(assignment_id=assignment_id).one()
+    return submission, (SubmissionVersion.query.filter_by(submission_id=submission.id)
+                        .order_by(SubmissionVersion.number).all())
+
+
+class TestSubmissionVersions:
+    """Each hand-in appends a version and older files stay downloadable"""
+
+    def test_resubmission_appends_version(self, app, authenticated_client, sample_assignment, uploads):
+        submit(authenticated_client, sample_assignment.id, 'first', b'draft one')
+        submit(authenticated_client, sample_assignment.id, 'second', b'draft two')
+        with app.app_context():
+            submission, versions = versions_of(sample_assignment.id)
+            assert [(v.number, v.content) for v in versions] == [(1, 'first'), (2, 'second')]
+            assert submission.latest_version_id == versions[-1].id
+            assert (submission.content, submission.attempts) == ('second', 2)
+            assert submission.file_path == versions[-1].file_path
+            assert versions[0].file_path != versions[1].file_path
+            assert all(os.path.exists(uploads / v.file_path) for v in versions)
+
+    def test_identical_upload_is_stored_once(self, app, authenticated_client, sample_assignment, uploads):
+        submit(authenticated_client, sample_assignment.id, 'first', b'same bytes')
+        submit(authenticated_client, sample_assignment.id, 'second', b'same bytes', name='renamed.txt')
+        with app.app_context():
+            _, versions = versions_of(sample_assignment.id)
+            assert versions[0].file_path == versions[1].file_path
+            assert [v.file_name for v in versions] == ['answer.txt', 'renamed.txt']
+        assert len(list((uploads / 'blobs').rglob('*'))) == 2  # one shard directory, one blob
+
+    def test_text_only_resubmission_keeps_file(self, app, authenticated_client, sample_assignment, uploads):
+        submit(authenticated_client, sample_assignment.id, 'first', b'attached')
+        submit(authenticated_client, sample_assignment.id, 'second')
+        with app.app_context():
+            _, versions = versions_of(sample_assignment.id)
+            assert versions[1].file_path == versions[0].file_path
+            assert versions[1].file_name == 'answer.txt'
+
+    def test_old_version_download(self, app, authenticated_client, sample_assignment, uploads):
+        submit(authenticated_client, sample_assignment.id, 'first', b'draft one')
+        submit(authenticated_client, sample_assignment.id, 'second', b'draft two')
+        with app.app_context():
+            first_id = versions_of(sample_assignment.id)[1][0].id
+        response = authenticated_client.get(f'/submission_version/{first_id}/download')
+        assert response.data == b'draft one'
+        assert 'answer.txt' in response.headers['Content-Disposition']
+
+
+class TestSubmissionHistoryPage:
+    """History is paginated and limited to people who can see the submission"""
+
+    def test_history_pages(self, app, authenticated_client, sample_assignment, uploads):
+        app.config['SUBMISSION_HISTORY_PER_PAGE'] = 2
+        for n in range(3):
+            submit(authenticated_client, sample_assignment.id, f'attempt {n + 1}')
+        with app.app_context():
+            submission_id = Submission.query.filter_by(assignment_id=sample_assignment.id).one().id
+        first = authenticated_client.get(f'/submission/{submission_id}/history')
+        assert b'attempt 3' in first.data and b'attempt 1' not in first.data
+        second = authenticated_client.get(f'/submission/{submission_id}/history?page=2')
+        assert b'attempt 1' in second.data and b'attempt 3' not in second.data
+
+    def test_other_student_is_redirected(self, app, authenticated_client, sample_assignment):
+        with app.app_context():
+            other = User(username='otherstudent', email='other@test.com', role='student')
+            other.set_password('password123')
+            db.session.add(other)
+            db.session.flush()
+            version = versioning.submit(sample_assignment.id, other.id, 'not yours')
+            db.session.commit()
+            submission_id, version_id = version.submission_id, version.id
+        assert authenticated_client.get(f'/submission/{submission_id}/history').status_code == 302
+        assert authenticated_client.get(f'/submission_version/{version_id}/download').status_code == 404
+
+
+class TestRetention:
+    """prune() keeps the newest versions and removes blobs nothing references"""
+
+    def test_keep_newest(self, app, authenticated_client, sample_assignment, uploads):
+        app.config['SUBMISSION_VERSIONS_KEEP'] = None
+        for n in range(4):
+            submit(authenticated_client, sample_assignment.id, f'attempt {n + 1}', f'file {n}'.encode())
+        with app.app_context():
+            _, versions = versions_of(sample_assignment.id)
+            dropped = [uploads / v.file_path for v in versions[:2]]
+            assert versioning.prune(keep=2) == 2
+            submission, versions = versions_of(sample_assignment.id)
+            assert [v.number for v in versions] == [3, 4]
+            assert submission.attempts == 4
+        assert not any(path.exists() for path in dropped)
+
+    def test_max_age_never_drops_latest(self, app, sample_assignment, student_user):
+        app.config['SUBMISSION_VERSIONS_KEEP'] = None
+        with app.app_context():
+            student = User.query.filter_by(username='teststudent').first()
+            for n in range(2):
+                versioning.submit(sample_assignment.id, student.id, f'attempt {n + 1}')
+            db.session.commit()
+            later = datetime.utcnow() + timedelta(days=30)
+            assert versioning.prune(max_age_days=7, now=later) == 1
+            assert [v.number for v in versions_of(sample_assignment.id)[1]] == [2]
+
+    def test_submit_applies_configured_limit(self, app, authenticated_client, sample_assignment, uploads):
+        app.config['SUBMISSION_VERSIONS_KEEP'] = 2
+        for n in range(3):
+            submit(authenticated_client, sample_assignment.id, f'attempt {n + 1}')
+        with app.app_context():
+            assert [v.number for v in versions_of(sample_assignment.id)[1]] == [2, 3]
+
+
+class TestVersionBackfill:
+    """A database from before versioning gets version 1 of every submission at startup"""
+
+    def test_backfill(self, tmp_path):
+        path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE submission (id INTEGER NOT NULL, content TEXT, file_path VARCHAR(255),
+                                     submitted_at DATETIME, grade FLOAT, feedback TEXT, assignment_id INTEGER,
+                                     student_id INTEGER, updated_at DATETIME, attempts INTEGER NOT NULL DEFAULT 1,
+                                     PRIMARY KEY (id));
+            INSERT INTO submission (id, content, file_path, submitted_at, assignment_id, student_id, attempts)
+                VALUES (1, 'legacy', 'old.pdf', '2025-03-01 12:00:00.000000', 1, 1, 3);
+        """)
+        conn.close()
+
+        class LegacyConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+            CACHE_TYPE = 'null'
+            TESTING = True
+
+        app = create_app(LegacyConfig)
+        with app.app_context():
+            submission = db.session.get(Submission, 1)
+            version = submission.latest_version
+            assert (version.number, version.content, version.file_path) == (1, 'legacy', 'old.pdf')
+            assert submission.attempts == 1
+            for engine in db.engines.values():
+                engine.dispose()